@@ -1,6 +1,7 @@
 import os
 import sys
 import time
+import json
 import logging
 from datetime import datetime
 from selenium import webdriver
@@ -8,6 +9,8 @@ from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 
+from app.number_index import lookup
+
 # --- Logging diário + consola ---
 HOJE = datetime.now().strftime("%Y-%m-%d")
 LOG_FILE = f"robot_bupi_{HOJE}.log"
@@ -27,6 +30,7 @@ LOGIN_URL = "https://bo.bupi.gov.pt"
 USERNAME = os.getenv("BUPI_USER")      # Ou define: 'meu_utilizador'
 PASSWORD = os.getenv("BUPI_PASS")      # Ou define: 'minha_senha'
 PDF_FOLDER = r"C:\CAMINHO\PARA\PDFs"   # Ex: r"C:\bupi\pdfs"
+OUTPUTS_ROOT = "outputs"               # outputs do processador (índice de nºs de todos os jobs)
 PROCESS_LIST = ["4196746"]             # Lista de processos a submeter
 
 def human_delay(a=0.8, b=2.5):
@@ -88,10 +92,27 @@ def pesquisar_processo(driver, num_processo, timeout=10):
         driver.save_screenshot(f"erro_pesq_{num_processo}.png")
         sys.exit(f"Erro crítico ao pesquisar processo {num_processo}. Robot interrompido.")
 
+def localizar_pdf(pdf_folder, num_processo):
+    """
+    Caminho do PDF do processo: o mais recente no índice de nºs dos jobs,
+    senão o manifest.json de pdf_folder se existir, senão <num>.pdf.
+    """
+    for match in lookup(str(num_processo), OUTPUTS_ROOT):
+        if os.path.exists(match["path"]):
+            return match["path"]
+    manifest_path = os.path.join(pdf_folder, "manifest.json")
+    if os.path.exists(manifest_path):
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        for entry in manifest.get("files", []):
+            if entry["name"] == str(num_processo):
+                return os.path.join(pdf_folder, entry["file"])
+    sanitized = str(num_processo).replace("/", "_")
+    return os.path.join(pdf_folder, f"{sanitized}.pdf")
+
 def upload_e_submeter(driver, num_processo, pdf_folder, timeout=15):
     try:
-        sanitized = str(num_processo).replace("/", "_")
-        pdf_path = os.path.join(pdf_folder, f"{sanitized}.pdf")
+        pdf_path = localizar_pdf(pdf_folder, num_processo)
         if not os.path.exists(pdf_path):
             logging.error(f"{num_processo}: PDF não encontrado: {pdf_path}")
             raise FileNotFoundError(f"PDF não encontrado: {pdf_path}")
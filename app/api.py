@@ -0,0 +1,334 @@
+import os
+import re
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional, Tuple
+from uuid import UUID
+
+import anyio
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import (
+    HTMLResponse,
+    JSONResponse,
+    PlainTextResponse,
+    RedirectResponse,
+    Response,
+    StreamingResponse,
+)
+from fastapi.templating import Jinja2Templates
+from multipart.multipart import MultipartParser, parse_options_header
+
+try:
+    from .jobs import (
+        STATUS_DONE,
+        UploadSpool,
+        UploadTooLarge,
+        create_job,
+        discard_job,
+        enqueue_job,
+        load_job,
+        resolve_duplicate,
+        start_workers,
+        touch_job,
+    )
+    from .job_zip import ensure_job_zip
+    from .metrics import collect, render_prometheus
+    from .number_index import lookup
+    from .retention import start_sweeper
+    from .process_pdf import configure_storage, load_manifest
+except ImportError:  # executado a partir de app/
+    from jobs import (
+        STATUS_DONE,
+        UploadSpool,
+        UploadTooLarge,
+        create_job,
+        discard_job,
+        enqueue_job,
+        load_job,
+        resolve_duplicate,
+        start_workers,
+        touch_job,
+    )
+    from job_zip import ensure_job_zip
+    from metrics import collect, render_prometheus
+    from number_index import lookup
+    from retention import start_sweeper
+    from process_pdf import configure_storage, load_manifest
+
+UPLOADS_ROOT = "uploads"
+OUTPUTS_ROOT = "outputs"
+MAX_MB = int(os.getenv("MAX_UPLOAD_MB", "500"))
+# Processos worker da fila (jobs.start_workers) arrancados por cada worker do
+# uvicorn; 0 = só workers externos (python jobs.py --workers N)
+API_JOB_WORKERS = int(os.getenv("API_JOB_WORKERS", "2"))
+CHUNK_SIZE = 1024 * 1024
+# Margem para os cabeçalhos multipart na verificação do Content-Length
+_MULTIPART_OVERHEAD = 64 * 1024
+
+_RANGE_RE = re.compile(r"bytes=(\d*)-(\d*)$")
+
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    # os jobs da API passam pela fila em disco, como os do Streamlit: um job
+    # interrompido volta à fila e retoma; à saída os workers acabam o job em
+    # curso e os que estão na fila ficam para o próximo arranque
+    configure_storage(OUTPUTS_ROOT)  # cache de OCR e métricas (/metrics) em outputs/
+    if API_JOB_WORKERS > 0:
+        start_workers(API_JOB_WORKERS, UPLOADS_ROOT, OUTPUTS_ROOT)
+    sweeper = start_sweeper(UPLOADS_ROOT, OUTPUTS_ROOT)
+    yield
+    if sweeper is not None:
+        sweeper.set()
+
+
+app = FastAPI(title="Processador de PDFs", lifespan=lifespan)
+templates = Jinja2Templates(directory=os.path.join(os.path.dirname(__file__), "templates"))
+
+
+def _job_dir(jobid: str) -> str:
+    """outputs/<jobid>, validando o jobid (UUID) para evitar path traversal."""
+    try:
+        UUID(jobid)
+    except ValueError:
+        raise HTTPException(status_code=404, detail="Job não encontrado.")
+    out_dir = os.path.join(OUTPUTS_ROOT, jobid)
+    if not os.path.isdir(out_dir):
+        raise HTTPException(status_code=404, detail="Job não encontrado.")
+    touch_job(jobid, OUTPUTS_ROOT)  # acesso aos resultados (retenção LRU)
+    return out_dir
+
+
+class _BadUpload(Exception):
+    """Pedido de upload inválido (400)."""
+
+
+class _MultipartUpload:
+    """
+    Corpo multipart/form-data do /upload, recebido por blocos: o campo "file"
+    é gravado diretamente em dest_path (UploadSpool) à medida que chega, sem
+    o ficheiro temporário do Starlette (o PDF não é escrito duas vezes) e
+    com o limite de tamanho aplicado durante a receção. Os outros campos
+    são ignorados.
+    """
+
+    def __init__(self, boundary: bytes, dest_path: str, max_bytes: int):
+        self.dest_path = dest_path
+        self.max_bytes = max_bytes
+        self._spool: Optional[UploadSpool] = None
+        self._writing = False
+        self._done = False
+        self._header_name = b""
+        self._header_value = b""
+        self._disposition = b""
+        self._parser = MultipartParser(boundary, {
+            "on_part_begin": self._on_part_begin,
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end,
+        })
+
+    def write(self, chunk: bytes) -> None:
+        self._parser.write(chunk)
+
+    def finish(self) -> Tuple[int, str]:
+        """Fim do corpo; devolve (bytes, sha256) do PDF."""
+        self._parser.finalize()
+        if self._spool is None or not self._done:
+            raise _BadUpload("Falta o ficheiro PDF.")
+        return self._spool.close()
+
+    def close(self) -> None:
+        if self._spool is not None:
+            self._spool.close()
+
+    def _on_part_begin(self) -> None:
+        self._disposition = b""
+
+    def _on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._header_name += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._header_value += data[start:end]
+
+    def _on_header_end(self) -> None:
+        if self._header_name.lower() == b"content-disposition":
+            self._disposition = self._header_value
+        self._header_name = self._header_value = b""
+
+    def _on_headers_finished(self) -> None:
+        _disposition, params = parse_options_header(self._disposition)
+        if params.get(b"name") != b"file" or self._spool is not None:
+            return
+        filename = params.get(b"filename", b"").decode("utf-8", "replace")
+        if not filename.lower().endswith(".pdf"):
+            raise _BadUpload("Apenas PDFs são aceites.")
+        self._spool = UploadSpool(self.dest_path, self.max_bytes)
+        self._writing = True
+
+    def _on_part_data(self, data: bytes, start: int, end: int) -> None:
+        if self._writing:
+            self._spool.write(data[start:end])
+
+    def _on_part_end(self) -> None:
+        if self._writing:
+            self._writing, self._done = False, True
+
+
+def _job_files(out_dir: str) -> list[dict]:
+    manifest = load_manifest(out_dir) or {"files": []}
+    return [
+        {"logical_name": f["name"], "fs_name": f["file"], "size": f["size"], "pages": f["pages"]}
+        for f in manifest["files"]
+    ]
+
+
+async def _file_chunks(path: str, start: int, length: int) -> AsyncIterator[bytes]:
+    with open(path, "rb") as f:
+        f.seek(start)
+        while length > 0:
+            chunk = await anyio.to_thread.run_sync(f.read, min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def stream_file(request: Request, path: str, media_type: str, filename: str) -> Response:
+    """
+    Resposta em streaming do ficheiro, com suporte a Range de um intervalo;
+    outros Range (vários intervalos, mal formados) são ignorados e o ficheiro
+    vai inteiro, como manda o RFC 7233.
+    """
+    size = os.path.getsize(path)
+    headers = {
+        "Accept-Ranges": "bytes",
+        "Content-Disposition": f'attachment; filename="{filename}"',
+    }
+    start, end, status = 0, size - 1, 200
+
+    m = _RANGE_RE.match(request.headers.get("range", "").strip())
+    if m and (m.group(1) or m.group(2)) and not (m.group(1) and m.group(2) and int(m.group(1)) > int(m.group(2))):
+        if m.group(1):
+            start = int(m.group(1))
+            end = min(int(m.group(2)), size - 1) if m.group(2) else size - 1
+        else:  # sufixo: últimos N bytes
+            start = max(size - int(m.group(2)), 0)
+        if start > end or start >= size:  # intervalo fora do ficheiro (ou sufixo de 0 bytes)
+            return Response(status_code=416, headers={"Content-Range": f"bytes */{size}"})
+        status = 206
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+
+    headers["Content-Length"] = str(end - start + 1)
+    return StreamingResponse(
+        _file_chunks(path, start, end - start + 1), status_code=status, media_type=media_type, headers=headers
+    )
+
+
+@app.get("/", response_class=HTMLResponse)
+async def index(request: Request):
+    return templates.TemplateResponse(request, "index.html")
+
+
+@app.post("/upload")
+async def upload(request: Request):
+    max_bytes = MAX_MB * 1024 * 1024
+    too_large = HTTPException(status_code=413, detail=f"Ficheiro demasiado grande (máx. {MAX_MB} MB).")
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or not params.get(b"boundary"):
+        raise HTTPException(status_code=400, detail="Esperado um formulário multipart/form-data.")
+    # recusa logo, sem receber o corpo, se o cliente declarar um tamanho acima do limite
+    length = request.headers.get("content-length", "")
+    if length.isdigit() and int(length) > max_bytes + _MULTIPART_OVERHEAD:
+        raise too_large
+
+    jobid, input_path = create_job(uploads_root=UPLOADS_ROOT, outputs_root=OUTPUTS_ROOT)
+    receiver = _MultipartUpload(params[b"boundary"], input_path, max_bytes)
+    try:
+        # grava por blocos, à medida que chegam, e calcula o sha256 ao mesmo tempo
+        async for chunk in request.stream():
+            await anyio.to_thread.run_sync(receiver.write, chunk)
+        _size, digest = await anyio.to_thread.run_sync(receiver.finish)
+    except UploadTooLarge:
+        discard_job(jobid, UPLOADS_ROOT, OUTPUTS_ROOT)
+        raise too_large
+    except _BadUpload as e:
+        discard_job(jobid, UPLOADS_ROOT, OUTPUTS_ROOT)
+        raise HTTPException(status_code=400, detail=str(e))
+    except ValueError:  # multipart mal formado (python-multipart)
+        discard_job(jobid, UPLOADS_ROOT, OUTPUTS_ROOT)
+        raise HTTPException(status_code=400, detail="Formulário multipart inválido.")
+    except BaseException:  # ex.: cliente desligou a meio
+        discard_job(jobid, UPLOADS_ROOT, OUTPUTS_ROOT)
+        raise
+    finally:
+        receiver.close()
+
+    # upload idêntico a um anterior: reutiliza o job em curso ou os resultados
+    jobid, needs_processing = await anyio.to_thread.run_sync(
+        resolve_duplicate, jobid, digest, UPLOADS_ROOT, OUTPUTS_ROOT
+    )
+    if needs_processing:
+        # processado pelos workers da fila; a página do job faz polling
+        enqueue_job(jobid, UPLOADS_ROOT)
+    return RedirectResponse(url=f"/job/{jobid}", status_code=303)
+
+
+@app.get("/job/{jobid}", response_class=HTMLResponse)
+async def job_page(request: Request, jobid: str):
+    out_dir = _job_dir(jobid)
+    record = load_job(jobid, OUTPUTS_ROOT) or {}
+    return templates.TemplateResponse(
+        request,
+        "job.html",
+        {"jobid": jobid, "status": record.get("status"), "error": record.get("error"), "files": _job_files(out_dir)},
+    )
+
+
+@app.get("/api/jobs/{jobid}")
+async def job_json(jobid: str):
+    out_dir = _job_dir(jobid)
+    record = load_job(jobid, OUTPUTS_ROOT) or {"jobid": jobid}
+    record.pop("traceback", None)
+    return JSONResponse({**record, "files": _job_files(out_dir)})
+
+
+@app.get("/api/numbers")
+async def find_number(q: str, prefix: bool = False, limit: int = Query(100, ge=1, le=1000)):
+    """PDFs com o nº de processo q em todos os jobs (índice number_index), mais recentes primeiro."""
+    matches = await anyio.to_thread.run_sync(lambda: lookup(q, OUTPUTS_ROOT, prefix=prefix, limit=limit))
+    for match in matches:
+        match.pop("path")
+        match["url"] = f"/download/{match['jobid']}/{match['file']}"
+    return JSONResponse({"query": q, "matches": matches})
+
+
+@app.get("/download/{jobid}/{fs_name}")
+async def download(request: Request, jobid: str, fs_name: str):
+    out_dir = _job_dir(jobid)
+    fs_name = os.path.basename(fs_name)
+    path = os.path.join(out_dir, fs_name)
+    if not fs_name.endswith(".pdf") or not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail="Ficheiro não encontrado.")
+    return stream_file(request, path, "application/pdf", fs_name)
+
+
+@app.get("/download_zip/{jobid}")
+async def download_zip(request: Request, jobid: str):
+    out_dir = _job_dir(jobid)
+    record = load_job(jobid, OUTPUTS_ROOT) or {"status": STATUS_DONE}
+    if record.get("status") != STATUS_DONE:
+        raise HTTPException(status_code=409, detail="Job ainda não concluído.")
+    zip_path = await anyio.to_thread.run_sync(ensure_job_zip, out_dir)
+    if zip_path is None:
+        raise HTTPException(status_code=404, detail="Nenhum PDF gerado.")
+    return stream_file(request, zip_path, "application/zip", f"{jobid}.zip")
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    """Tempos por etapa e contadores de todos os processos (formato Prometheus)."""
+    text = await anyio.to_thread.run_sync(lambda: render_prometheus(collect()))
+    return PlainTextResponse(text, media_type="text/plain; version=0.0.4")
@@ -0,0 +1,254 @@
+"""
+Lotes de PDFs (vários uploads ou um ZIP): cada documento é processado num
+processo à parte e os resultados são juntados num só job, com nomes únicos
+em todo o lote, um manifesto combinado e um só ZIP.
+"""
+import os
+import shutil
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from typing import Iterator, List, Optional, Tuple, Union
+
+from pypdf import PdfReader
+
+try:
+    from .checkpoint import Journal
+    from .job_zip import JobZipWriter
+    from . import metrics
+    from .process_pdf import (
+        discard_partial_outputs,
+        journal_options,
+        load_manifest,
+        process_pdf_iter,
+        sanitize_filename,
+        unique_fs_name,
+        write_manifest,
+    )
+except ImportError:  # executado a partir de app/ (ex.: streamlit run)
+    from checkpoint import Journal
+    from job_zip import JobZipWriter
+    import metrics
+    from process_pdf import (
+        discard_partial_outputs,
+        journal_options,
+        load_manifest,
+        process_pdf_iter,
+        sanitize_filename,
+        unique_fs_name,
+        write_manifest,
+    )
+
+# Nº de documentos do lote processados em paralelo (um processo cada)
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", str(os.cpu_count() or 1)))
+# Nº máximo de PDFs aceites dentro de um ZIP
+MAX_ZIP_MEMBERS = 500
+
+_PARTS_DIR = ".parts"
+# Diário do lote: um registo por documento já juntado ao job (para retomar)
+BATCH_JOURNAL_NAME = ".documents.jsonl"
+_COPY_CHUNK = 1024 * 1024
+
+
+class ZipTooLarge(Exception):
+    """O ZIP tem PDFs a mais ou excede o tamanho máximo descomprimido."""
+
+
+def extract_zip_pdfs(
+    zip_path: str, dest_dir: str, prefix: str, max_bytes: Optional[int] = None
+) -> List[Tuple[str, str]]:
+    """
+    Extrai os PDFs de um ZIP para dest_dir, com nomes gerados (prefix + nº),
+    ignorando pastas e outros ficheiros. Devolve [(nome no ZIP, caminho)].
+    max_bytes: limite do total descomprimido (ZipTooLarge se excedido).
+    """
+    extracted: List[Tuple[str, str]] = []
+    written = 0
+    with zipfile.ZipFile(zip_path) as zf:
+        members = [m for m in zf.infolist() if not m.is_dir() and m.filename.lower().endswith(".pdf")]
+        if len(members) > MAX_ZIP_MEMBERS:
+            raise ZipTooLarge(f"{len(members)} PDFs (máx. {MAX_ZIP_MEMBERS})")
+        for k, member in enumerate(sorted(members, key=lambda m: m.filename)):
+            path = os.path.join(dest_dir, f"{prefix}{k:03d}.pdf")
+            # não confia no file_size declarado: conta o que é de facto descomprimido
+            with zf.open(member) as src, open(path, "wb") as dst:
+                while chunk := src.read(_COPY_CHUNK):
+                    written += len(chunk)
+                    if max_bytes is not None and written > max_bytes:
+                        raise ZipTooLarge(f"mais de {max_bytes} bytes descomprimidos")
+                    dst.write(chunk)
+            extracted.append((os.path.basename(member.filename), path))
+    return extracted
+
+
+def _count_pages(pdf_path: str) -> int:
+    try:
+        with open(pdf_path, "rb") as f:
+            return len(PdfReader(f).pages)
+    except Exception:
+        return 0
+
+
+def _process_document(input_path: str, part_dir: str, options: dict, resume: bool = False) -> dict:
+    """Processa um documento do lote para part_dir; devolve o seu manifesto."""
+    os.makedirs(part_dir, exist_ok=True)
+    for _event in process_pdf_iter(input_path, part_dir, resume=resume, **options):
+        pass
+    return load_manifest(part_dir)
+
+
+def process_batch_iter(
+    inputs: List[Tuple[str, str]],
+    outputs_dir: str,
+    workers: Optional[int] = None,
+    build_zip: bool = False,
+    resume: bool = False,
+    **options,
+) -> Iterator[dict]:
+    """
+    Processa um lote de PDFs [(nome original, caminho), ...] para
+    outputs_dir. Produz eventos como process_pdf_iter:
+        {"event": "file", "result": (nome_logico, caminho, tamanho), "pages": [...],
+         "source": nome original}
+        {"event": "document", "page": páginas concluídas, "total": páginas do lote,
+         "source": nome original, "error": mensagem ou None}
+            - um por documento concluído (pela ordem do lote).
+    Os documentos correm em paralelo (workers processos, por omissão
+    BATCH_WORKERS); os nomes dos ficheiros são atribuídos pela ordem do lote,
+    únicos em todo o lote. Um documento com erro não interrompe o lote (fica
+    registado no manifesto). No fim grava o manifesto combinado.
+
+    resume: retoma um lote interrompido (mesmos documentos e opções): os
+        documentos já juntados são repetidos a partir do diário
+        BATCH_JOURNAL_NAME (eventos com "resumed": True) e os restantes
+        retomam as suas páginas (process_pdf_iter(resume=True)).
+    options: argumentos de process_pdf_iter (group_pages, ocr_workers, ...).
+    """
+    if workers is None:
+        workers = BATCH_WORKERS
+    workers = max(1, min(workers, len(inputs)))
+    if workers > 1:
+        # o paralelismo é por documento: OCR de cada um em série, sem pools aninhados
+        options.setdefault("ocr_workers", 1)
+
+    parts_root = os.path.join(outputs_dir, _PARTS_DIR)
+    page_counts = [_count_pages(path) for _name, path in inputs]
+    manifest = {
+        "total_pages": sum(page_counts),
+        "documents": [],
+        "files": [],
+        "output": {"optimized": bool(options.get("optimize_output")), "bytes_before": 0, "bytes_after": 0},
+        "page_stats": [],
+        "validation": {"cnj_rejected": 0, "pages_escalated": 0, "escalations_resolved": 0},
+    }
+    batch_metrics = metrics.Metrics()
+    names_seen: dict[str, int] = {}
+    pages_done = 0
+
+    journal = Journal(
+        os.path.join(outputs_dir, BATCH_JOURNAL_NAME),
+        {
+            "inputs": [[name, os.path.getsize(path)] for name, path in inputs],
+            "options": journal_options(
+                bool(options.get("group_pages")),
+                bool(options.get("inherit_number")),
+                bool(options.get("optimize_output")),
+            ),
+        },
+        resume,
+    )
+    if resume:
+        discard_partial_outputs(outputs_dir, [])
+    if not journal.resumed:
+        # lote novo (ou diário de outro lote): nada a aproveitar
+        for record in journal.stale:
+            for name in record.get("files", []):
+                try:
+                    os.remove(os.path.join(outputs_dir, name))
+                except OSError:
+                    pass
+        shutil.rmtree(parts_root, ignore_errors=True)
+    merged = journal.records
+    journal.start(merged)
+
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    zip_writer: Union[JobZipWriter, nullcontext] = JobZipWriter(outputs_dir) if build_zip else nullcontext()
+    try:
+        with journal, zip_writer:
+            futures = [
+                executor.submit(_process_document, path, os.path.join(parts_root, str(k)), dict(options), resume)
+                if executor is not None and k >= len(merged)
+                else None
+                for k, (_name, path) in enumerate(inputs)
+            ]
+            for k, (source, path) in enumerate(inputs):
+                part_dir = os.path.join(parts_root, str(k))
+                resumed = k < len(merged)
+                error = None
+                try:
+                    if resumed:
+                        doc_manifest, error = merged[k]["manifest"], merged[k]["error"]
+                    elif futures[k] is not None:
+                        doc_manifest = futures[k].result()
+                    else:
+                        doc_manifest = _process_document(path, part_dir, dict(options), resume)
+                except Exception as e:
+                    doc_manifest = None
+                    error = f"{type(e).__name__}: {e}"
+
+                doc_entry = {"source": source, "total_pages": page_counts[k], "files": 0, "error": error}
+                doc_files: List[str] = []
+                for entry in (doc_manifest or {}).get("files", []):
+                    fs_name = unique_fs_name(sanitize_filename(entry["name"]), names_seen)
+                    outfile = os.path.join(outputs_dir, f"{fs_name}.pdf")
+                    part_file = os.path.join(part_dir, entry["file"])
+                    # numa retoma a meio da junção, parte dos PDFs já foi movida
+                    if not resumed and os.path.exists(part_file):
+                        os.replace(part_file, outfile)
+                    manifest["files"].append({**entry, "file": os.path.basename(outfile), "source": source})
+                    doc_entry["files"] += 1
+                    doc_files.append(os.path.basename(outfile))
+                    if build_zip:
+                        zip_writer.add(outfile)
+                    yield {
+                        "event": "file",
+                        "result": (entry["name"], outfile, entry["size"]),
+                        "pages": entry["pages"],
+                        "source": source,
+                        **({"resumed": True} if resumed else {}),
+                    }
+                if doc_manifest is not None:
+                    for key in ("bytes_before", "bytes_after"):
+                        manifest["output"][key] += doc_manifest["output"][key]
+                    for key, value in doc_manifest["validation"].items():
+                        manifest["validation"][key] += value
+                    manifest["page_stats"].extend({**stats, "document": k} for stats in doc_manifest["page_stats"])
+                    batch_metrics.merge(doc_manifest["metrics"])
+                manifest["documents"].append(doc_entry)
+                if not resumed:
+                    journal.append({
+                        "type": "document",
+                        "source": source,
+                        "error": error,
+                        "manifest": doc_manifest,
+                        "files": doc_files,
+                    })
+                shutil.rmtree(part_dir, ignore_errors=True)
+
+                pages_done += page_counts[k]
+                yield {
+                    "event": "document",
+                    "page": pages_done,
+                    "total": manifest["total_pages"],
+                    "source": source,
+                    "error": error,
+                    **({"resumed": True} if resumed else {}),
+                }
+            if build_zip:
+                manifest["zip"] = os.path.basename(zip_writer.path)
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+        shutil.rmtree(parts_root, ignore_errors=True)
+    manifest["metrics"] = batch_metrics.snapshot()
+    write_manifest(outputs_dir, manifest)
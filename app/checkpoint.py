@@ -0,0 +1,87 @@
+"""
+Diário (journal) append-only de um job, para o retomar depois de uma
+interrupção (crash, OOM, deploy) sem refazer o que já ficou gravado: uma
+linha JSON por registo, escrita só depois de o resultado correspondente
+estar em disco. A primeira linha descreve o trabalho (entrada e opções): o
+diário de outro trabalho não é retomado.
+"""
+import json
+import os
+from typing import Iterable, List
+
+
+def _line(record: dict) -> str:
+    return json.dumps(record, ensure_ascii=False) + "\n"
+
+
+def read_records(path: str) -> List[dict]:
+    """Linhas do diário em path (cabeçalho incluído); [] se não existir."""
+    lines: List[dict] = []
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    lines.append(json.loads(line))
+                except ValueError:
+                    break  # última linha incompleta (interrompido a meio da escrita)
+    except FileNotFoundError:
+        pass
+    return lines
+
+
+class Journal:
+    """
+    Diário em path para o trabalho descrito por header. Com resume, records
+    recebe os registos de um diário anterior do mesmo trabalho e stale os de
+    um diário de outro trabalho (para apagar o que ele gravou). start()
+    reescreve o diário só com os registos a manter e abre-o para append.
+    """
+
+    def __init__(self, path: str, header: dict, resume: bool = False):
+        self.path = path
+        # normalizado como fica no ficheiro (ex.: tuplos passam a listas)
+        self.header = json.loads(json.dumps(header))
+        self.records: List[dict] = []
+        self.stale: List[dict] = []
+        self.resumed = False
+        self._file = None
+        if resume:
+            self._load()
+
+    def _load(self) -> None:
+        lines = read_records(self.path)
+        if not lines:
+            return
+        if lines and lines[0] == self.header:
+            self.records, self.resumed = lines[1:], True
+        else:
+            self.stale = lines[1:]
+
+    def __enter__(self) -> "Journal":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def start(self, records: Iterable[dict] = ()) -> None:
+        """Reescreve o diário (cabeçalho + records) de forma atómica e abre-o para append."""
+        self.records = list(records)
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.writelines(_line(record) for record in [self.header, *self.records])
+        os.replace(tmp, self.path)
+        self._file = open(self.path, "a", encoding="utf-8")
+
+    def append(self, record: dict, flush: bool = True) -> None:
+        """
+        Acrescenta um registo. flush: envia-o (e os anteriores) já ao sistema
+        operativo, para sobreviver à morte do processo.
+        """
+        self._file.write(_line(record))
+        if flush:
+            self._file.flush()
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -0,0 +1,246 @@
+"""
+Linha de comandos (python -m app): processa uma pasta ou glob de PDFs sem
+passar pelo Streamlit, um PDF por processo. Cada PDF gera
+<output>/<nome do PDF>/ (PDFs + manifest.json); no fim é escrito um índice
+de todo o lote em <output>/index.json e <output>/index.csv.
+
+PDFs cujos resultados já estão atualizados (mesmo ficheiro de entrada e
+mesmas opções) são saltados, para as execuções diárias só processarem o
+que mudou.
+"""
+import argparse
+import csv
+import glob
+import hashlib
+import json
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, Optional
+
+try:
+    from .metrics import write_prometheus
+    from .process_pdf import (
+        OCR_DPI,
+        OCR_PREPROCESS,
+        PAGE_JOURNAL_NAME,
+        configure_ocr,
+        configure_storage,
+        load_manifest,
+        process_pdf_iter,
+        sanitize_filename,
+    )
+except ImportError:  # executado a partir de app/
+    from metrics import write_prometheus
+    from process_pdf import (
+        OCR_DPI,
+        OCR_PREPROCESS,
+        PAGE_JOURNAL_NAME,
+        configure_ocr,
+        configure_storage,
+        load_manifest,
+        process_pdf_iter,
+        sanitize_filename,
+    )
+
+# fora de outputs/ (jobs da UI/API), onde a retenção apagaria os resultados
+OUTPUT_ROOT = "resultados"
+# marca dos resultados de um PDF: entrada (tamanho, mtime) e opções usadas
+STAMP_FILE = ".cli_stamp.json"
+INDEX_NAME = "index"
+
+
+def find_inputs(patterns: List[str]) -> List[str]:
+    """PDFs de pastas (não recursivo), ficheiros ou globs, sem repetidos e ordenados."""
+    found = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            matches = glob.glob(os.path.join(pattern, "*"))
+        else:
+            matches = glob.glob(pattern, recursive=True)
+        found.update(os.path.abspath(m) for m in matches if m.lower().endswith(".pdf") and os.path.isfile(m))
+    return sorted(found)
+
+
+def output_dirs(inputs: List[str], output_root: str) -> dict:
+    """
+    Pasta de resultados de cada PDF: o nome do ficheiro; se dois PDFs de
+    pastas diferentes tiverem o mesmo nome, leva um hash do caminho (o mesmo
+    em todas as execuções com esses PDFs).
+    """
+    stems: dict[str, int] = {}
+    for path in inputs:
+        stem = sanitize_filename(os.path.splitext(os.path.basename(path))[0])
+        stems[stem] = stems.get(stem, 0) + 1
+    dirs = {}
+    for path in inputs:
+        stem = sanitize_filename(os.path.splitext(os.path.basename(path))[0])
+        if stems[stem] > 1:
+            stem = f"{stem}-{hashlib.sha1(path.encode()).hexdigest()[:8]}"
+        dirs[path] = os.path.join(output_root, stem)
+    return dirs
+
+
+def _stamp(input_path: str, options: dict) -> dict:
+    st = os.stat(input_path)
+    return {"input": input_path, "size": st.st_size, "mtime_ns": st.st_mtime_ns, "options": options}
+
+
+def is_up_to_date(input_path: str, out_dir: str, options: dict) -> bool:
+    """Resultados completos (com manifesto) do mesmo ficheiro de entrada, com as mesmas opções."""
+    try:
+        with open(os.path.join(out_dir, STAMP_FILE), "r", encoding="utf-8") as f:
+            stamp = json.load(f)
+    except (OSError, ValueError):
+        return False
+    return stamp == _stamp(input_path, options) and load_manifest(out_dir) is not None
+
+
+def process_one(
+    input_path: str, out_dir: str, options: dict, ocr_workers: Optional[int] = None, force: bool = False
+) -> dict:
+    """
+    Processa um PDF para out_dir; devolve o seu manifesto. Uma execução
+    interrompida é retomada a partir das páginas já gravadas (diário
+    PAGE_JOURNAL_NAME); sem diário, ou com force, out_dir é limpo antes.
+    options: opções de process_pdf_iter, ocr_dpi e ocr_preprocess, gravadas na marca.
+    """
+    if force or not os.path.exists(os.path.join(out_dir, PAGE_JOURNAL_NAME)):
+        shutil.rmtree(out_dir, ignore_errors=True)
+    os.makedirs(out_dir, exist_ok=True)
+    try:
+        os.remove(os.path.join(out_dir, STAMP_FILE))
+    except FileNotFoundError:
+        pass
+    pdf_options = {k: v for k, v in options.items() if k not in ("ocr_dpi", "ocr_preprocess")}
+    for _event in process_pdf_iter(input_path, out_dir, ocr_workers=ocr_workers, resume=True, **pdf_options):
+        pass
+    # a marca só é escrita no fim: uma execução interrompida não está atualizada
+    with open(os.path.join(out_dir, STAMP_FILE), "w", encoding="utf-8") as f:
+        json.dump(_stamp(input_path, options), f)
+    return load_manifest(out_dir)
+
+
+def run(
+    inputs: List[str],
+    output_root: str,
+    options: dict,
+    workers: int = 1,
+    ocr_dpi: int = OCR_DPI,
+    force: bool = False,
+) -> Iterator[dict]:
+    """
+    Processa os PDFs (workers em paralelo) e produz um resultado por PDF, pela
+    ordem de inputs: {"input", "output_dir", "status": "processed" | "skipped"
+    | "failed", "error", "files": [...], "seconds"}.
+    options: argumentos de process_pdf_iter que mudam os resultados
+        (group_pages, ...); com o DPI e o pré-processamento do OCR, fazem
+        parte da marca.
+    """
+    dirs = output_dirs(inputs, output_root)
+    options = dict(options)
+    stamp_options = {**options, "ocr_dpi": ocr_dpi, "ocr_preprocess": OCR_PREPROCESS}
+    todo = [path for path in inputs if force or not is_up_to_date(path, dirs[path], stamp_options)]
+    # processos do OCR de cada PDF (spawn) leem o DPI do ambiente
+    os.environ["OCR_DPI"] = str(ocr_dpi)
+    configure_ocr(ocr_dpi)
+    # com vários PDFs em paralelo, o OCR de cada um corre em série
+    ocr_workers = 1 if workers > 1 else None
+
+    executor = None
+    if workers > 1 and len(todo) > 1:
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=configure_ocr, initargs=(ocr_dpi,))
+    try:
+        started = {}
+        futures = {}
+        for path in todo:
+            started[path] = time.monotonic()
+            if executor is not None:
+                futures[path] = executor.submit(process_one, path, dirs[path], stamp_options, ocr_workers, force)
+        for path in inputs:
+            result = {"input": path, "output_dir": dirs[path], "status": "skipped", "error": None}
+            if path in started:
+                try:
+                    if executor is not None:
+                        manifest = futures[path].result()
+                    else:
+                        manifest = process_one(path, dirs[path], stamp_options, ocr_workers, force)
+                    result["status"] = "processed"
+                except Exception as e:
+                    manifest = None
+                    result.update(status="failed", error=f"{type(e).__name__}: {e}")
+                result["seconds"] = round(time.monotonic() - started[path], 3)
+            else:
+                manifest = load_manifest(dirs[path])
+            result["files"] = (manifest or {}).get("files", [])
+            yield result
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+
+def write_index(output_root: str, results: List[dict]) -> None:
+    """Índice do lote em JSON (por PDF de entrada) e CSV (um ficheiro gerado por linha)."""
+    with open(os.path.join(output_root, f"{INDEX_NAME}.json"), "w", encoding="utf-8") as f:
+        json.dump({"generated_at": time.time(), "inputs": results}, f, ensure_ascii=False, indent=1)
+    with open(os.path.join(output_root, f"{INDEX_NAME}.csv"), "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["input", "status", "process_number", "file", "first_page", "last_page", "size"])
+        for result in results:
+            if not result["files"]:
+                writer.writerow([result["input"], result["status"], "", "", "", "", ""])
+            for entry in result["files"]:
+                writer.writerow([
+                    result["input"],
+                    result["status"],
+                    entry["name"],
+                    os.path.join(result["output_dir"], entry["file"]),
+                    entry["pages"][0],
+                    entry["pages"][1],
+                    entry["size"],
+                ])
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m app", description="Divide PDFs por nº de processo (pastas, ficheiros ou globs)."
+    )
+    parser.add_argument("inputs", nargs="+", help="pastas, ficheiros PDF ou globs (ex.: 'entrada/**/*.pdf')")
+    parser.add_argument("--output", default=OUTPUT_ROOT, help=f"pasta de resultados (por omissão {OUTPUT_ROOT})")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="PDFs processados em paralelo")
+    parser.add_argument("--ocr-dpi", type=int, default=OCR_DPI, help=f"DPI do OCR (por omissão {OCR_DPI})")
+    parser.add_argument("--group-pages", action="store_true", help="junta páginas consecutivas do mesmo processo")
+    parser.add_argument("--inherit-number", action="store_true", help="páginas sem nº herdam o da anterior")
+    parser.add_argument("--optimize-output", action="store_true", help="otimiza os PDFs gerados")
+    parser.add_argument("--force", action="store_true", help="reprocessa do início, mesmo os PDFs já atualizados ou interrompidos")
+    parser.add_argument("--metrics-file", help="grava no fim os tempos e contadores (formato Prometheus)")
+    args = parser.parse_args(argv)
+
+    inputs = find_inputs(args.inputs)
+    if not inputs:
+        print("Nenhum PDF encontrado.", file=sys.stderr)
+        return 1
+    os.makedirs(args.output, exist_ok=True)
+    configure_storage(args.output)  # antes do pool, cujos processos herdam o ambiente
+    options = {
+        "group_pages": args.group_pages,
+        "inherit_number": args.group_pages and args.inherit_number,
+        "optimize_output": args.optimize_output,
+    }
+    results = []
+    for result in run(inputs, args.output, options, args.workers, args.ocr_dpi, args.force):
+        results.append(result)
+        detail = result["error"] if result["status"] == "failed" else f"{len(result['files'])} PDFs"
+        print(f"[{result['status']}] {result['input']} -> {result['output_dir']} ({detail})")
+    write_index(args.output, results)
+    if args.metrics_file:
+        write_prometheus(args.metrics_file)
+
+    failed = sum(r["status"] == "failed" for r in results)
+    print(
+        f"{len(results)} PDFs: {sum(r['status'] == 'processed' for r in results)} processados, "
+        f"{sum(r['status'] == 'skipped' for r in results)} já atualizados, {failed} com erro."
+    )
+    return 1 if failed else 0
@@ -0,0 +1,73 @@
+import os
+import zipfile
+from typing import Optional
+
+# ZIP do job, gravado dentro de outputs/<jobid>
+ZIP_NAME = "all.zip"
+# Os PDFs já vêm comprimidos: por omissão guarda-os sem recomprimir (STORED)
+ZIP_COMPRESSION = zipfile.ZIP_STORED
+ZIP_COMPRESSLEVEL: Optional[int] = None
+
+
+def job_zip_path(outputs_dir: str) -> str:
+    return os.path.join(outputs_dir, ZIP_NAME)
+
+
+class JobZipWriter:
+    """
+    ZIP do job escrito em disco à medida que os PDFs são gerados. Escreve
+    para um ficheiro .part e só o renomeia no fim, pelo que quem lê nunca vê
+    um ZIP incompleto; em caso de erro o .part é apagado.
+    """
+
+    def __init__(
+        self,
+        outputs_dir: str,
+        compression: int = ZIP_COMPRESSION,
+        compresslevel: Optional[int] = ZIP_COMPRESSLEVEL,
+    ):
+        self.path = job_zip_path(outputs_dir)
+        self._tmp_path = f"{self.path}.{os.getpid()}.part"
+        self._zf = zipfile.ZipFile(self._tmp_path, "w", compression=compression, compresslevel=compresslevel)
+
+    def __enter__(self) -> "JobZipWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def add(self, file_path: str, arcname: Optional[str] = None) -> None:
+        self._zf.write(file_path, arcname=arcname or os.path.basename(file_path))
+
+    def close(self) -> str:
+        self._zf.close()
+        os.replace(self._tmp_path, self.path)
+        return self.path
+
+    def abort(self) -> None:
+        self._zf.close()
+        try:
+            os.remove(self._tmp_path)
+        except OSError:
+            pass
+
+
+def ensure_job_zip(outputs_dir: str) -> Optional[str]:
+    """
+    Caminho do ZIP do job; se ainda não existir (jobs anteriores ao ZIP
+    incremental) constrói-o uma vez a partir dos PDFs em disco. None se o
+    job não tiver PDFs.
+    """
+    path = job_zip_path(outputs_dir)
+    if os.path.exists(path):
+        return path
+    pdfs = [name for name in sorted(os.listdir(outputs_dir)) if name.endswith(".pdf")]
+    if not pdfs:
+        return None
+    with JobZipWriter(outputs_dir) as zip_writer:
+        for name in pdfs:
+            zip_writer.add(os.path.join(outputs_dir, name), arcname=name)
+    return path
@@ -0,0 +1,730 @@
+"""
+Fila local de jobs, independente da sessão do Streamlit.
+
+Cada job usa as pastas de make_job_dirs e tem um registo
+outputs/<jobid>/job.json (queued → running → done | failed). A fila são
+marcadores em uploads/.queue; um worker reclama um job renomeando o marcador
+para uploads/.running (atómico), por isso vários processos podem partilhar
+a mesma fila.
+
+Os uploads são endereçados pelo conteúdo: outputs/.index/<sha256>-<opções>
+aponta para o job que processou (ou está a processar) esse PDF com essas
+opções. Um upload idêntico reutiliza o job em curso, ou recebe hard links
+dos resultados de um job concluído, em vez de ser processado outra vez.
+
+Cada job concluído é acrescentado ao índice de nºs de processo
+(number_index), para se encontrar o PDF de um nº sem percorrer os jobs.
+"""
+import argparse
+import atexit
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+from typing import BinaryIO, Iterator, List, Optional, Tuple, Union
+
+try:
+    from .batch import BATCH_JOURNAL_NAME, ZipTooLarge, extract_zip_pdfs, process_batch_iter
+    from .checkpoint import read_records
+    from .number_index import index_job, remove_job
+    from .process_pdf import PAGE_JOURNAL_NAME, configure_storage, make_job_dirs, process_pdf_iter
+except ImportError:  # executado a partir de app/ (ex.: streamlit run)
+    from batch import BATCH_JOURNAL_NAME, ZipTooLarge, extract_zip_pdfs, process_batch_iter
+    from checkpoint import read_records
+    from number_index import index_job, remove_job
+    from process_pdf import PAGE_JOURNAL_NAME, configure_storage, make_job_dirs, process_pdf_iter
+
+UPLOADS_ROOT = "uploads"
+OUTPUTS_ROOT = "outputs"
+INPUT_NAME = "input.pdf"
+JOB_FILE = "job.json"
+# marca do último acesso aos resultados (mtime), para a retenção LRU (retention.py)
+ACCESS_FILE = ".last_access"
+
+# Nº de processos worker e intervalo de polling da fila (segundos)
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+POLL_INTERVAL = 1.0
+# Intervalo (segundos) com que o supervisor substitui workers mortos e devolve à fila os seus jobs
+SUPERVISE_INTERVAL = float(os.getenv("JOB_SUPERVISE_SECONDS", "10"))
+# Vezes que um job interrompido volta à fila antes de falhar (ex.: worker morto por falta de memória)
+JOB_MAX_REQUEUES = int(os.getenv("JOB_MAX_REQUEUES", "3"))
+# job reclamado há menos do que isto e ainda "queued" está a arrancar num worker
+_CLAIM_GRACE = 60.0
+# intervalo mínimo entre gravações do progresso no registo do job
+_PROGRESS_INTERVAL = 1.0
+
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+_COPY_CHUNK = 1024 * 1024
+
+# Reutilização de resultados de uploads idênticos (UPLOAD_DEDUP=0 desliga)
+UPLOAD_DEDUP = os.getenv("UPLOAD_DEDUP", "1") != "0"
+# lock do índice mais antigo do que isto é de um processo que morreu
+_INDEX_LOCK_STALE = 30.0
+# Mantém os PDFs de entrada depois de o job terminar (KEEP_INPUTS=1)
+KEEP_INPUTS = os.getenv("KEEP_INPUTS", "0") == "1"
+
+
+class UploadTooLarge(Exception):
+    """O upload excede o tamanho máximo."""
+
+
+def _queue_dir(uploads_root: str) -> str:
+    return os.path.join(uploads_root, ".queue")
+
+
+def _running_dir(uploads_root: str) -> str:
+    return os.path.join(uploads_root, ".running")
+
+
+def _index_dir(outputs_root: str) -> str:
+    return os.path.join(outputs_root, ".index")
+
+
+def load_job(jobid: str, outputs_root: str = OUTPUTS_ROOT) -> Optional[dict]:
+    """Registo do job, ou None se não existir."""
+    try:
+        with open(os.path.join(outputs_root, jobid, JOB_FILE), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _save_job(record: dict, outputs_root: str) -> None:
+    path = os.path.join(outputs_root, record["jobid"], JOB_FILE)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(record, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def touch_job(jobid: str, outputs_root: str = OUTPUTS_ROOT) -> None:
+    """Regista um acesso aos resultados do job (mtime de ACCESS_FILE)."""
+    path = os.path.join(outputs_root, jobid, ACCESS_FILE)
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        try:
+            open(path, "a").close()
+        except OSError:
+            pass  # job apagado entretanto
+    except OSError:
+        pass
+
+
+def last_access(jobid: str, outputs_root: str = OUTPUTS_ROOT, record: Optional[dict] = None) -> float:
+    """Último acesso aos resultados (ou o fim do job, ou a criação da pasta)."""
+    try:
+        return os.path.getmtime(os.path.join(outputs_root, jobid, ACCESS_FILE))
+    except OSError:
+        pass
+    record = record if record is not None else load_job(jobid, outputs_root) or {}
+    if record.get("finished_at") or record.get("created_at"):
+        return record.get("finished_at") or record["created_at"]
+    try:
+        return os.path.getmtime(os.path.join(outputs_root, jobid))
+    except OSError:
+        return 0.0
+
+
+def _update_job(jobid: str, outputs_root: str, **changes) -> dict:
+    record = load_job(jobid, outputs_root) or {"jobid": jobid}
+    record.update(changes)
+    _save_job(record, outputs_root)
+    return record
+
+
+def create_job(
+    options: Optional[dict] = None, uploads_root: str = UPLOADS_ROOT, outputs_root: str = OUTPUTS_ROOT
+) -> Tuple[str, str]:
+    """
+    Cria o job (make_job_dirs + registo "queued"), sem o pôr na fila.
+    Devolve (jobid, caminho onde gravar o PDF de entrada).
+    options: argumentos extra para process_pdf_iter (group_pages, ...).
+    """
+    jobid, up_dir, _out_dir = make_job_dirs(uploads_root, outputs_root)
+    _save_job(
+        {"jobid": jobid, "status": STATUS_QUEUED, "options": options or {}, "created_at": time.time(), "progress": None},
+        outputs_root,
+    )
+    return jobid, os.path.join(up_dir, INPUT_NAME)
+
+
+def enqueue_job(jobid: str, uploads_root: str = UPLOADS_ROOT) -> None:
+    """Põe na fila um job criado com create_job (o PDF de entrada já deve estar gravado)."""
+    os.makedirs(_queue_dir(uploads_root), exist_ok=True)
+    # nome do marcador ordenável por data de submissão (FIFO)
+    open(os.path.join(_queue_dir(uploads_root), f"{time.time():017.6f}-{jobid}"), "w").close()
+
+
+class UploadSpool:
+    """
+    Gravação incremental de um upload em dest_path, à medida que os blocos
+    chegam, com o sha256 calculado ao mesmo tempo; UploadTooLarge assim que
+    se exceder max_bytes.
+    """
+
+    def __init__(self, dest_path: str, max_bytes: Optional[int] = None):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._hash = hashlib.sha256()
+        self._file = open(dest_path, "wb")
+
+    def write(self, chunk: bytes) -> None:
+        self.size += len(chunk)
+        if self.max_bytes is not None and self.size > self.max_bytes:
+            raise UploadTooLarge(self.size)
+        self._hash.update(chunk)
+        self._file.write(chunk)
+
+    def close(self) -> Tuple[int, str]:
+        """Fecha o ficheiro; devolve (bytes, sha256 em hex)."""
+        self._file.close()
+        return self.size, self._hash.hexdigest()
+
+
+def spool_upload(data: Union[bytes, BinaryIO], dest_path: str, max_bytes: Optional[int] = None) -> Tuple[int, str]:
+    """
+    Grava o upload em dest_path, por blocos, calculando o sha256 ao mesmo
+    tempo. Devolve (bytes, sha256 em hex); UploadTooLarge se exceder max_bytes.
+    """
+    if isinstance(data, (bytes, bytearray)):
+        data = io.BytesIO(data)
+    spool = UploadSpool(dest_path, max_bytes)
+    try:
+        while chunk := data.read(_COPY_CHUNK):
+            spool.write(chunk)
+    except BaseException:
+        spool.close()
+        raise
+    return spool.close()
+
+
+@contextmanager
+def _index_lock(entry_path: str) -> Iterator[None]:
+    """Lock (ficheiro criado com O_EXCL) de uma entrada do índice."""
+    lock_path = f"{entry_path}.lock"
+    while True:
+        try:
+            os.close(os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            break
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(lock_path) > _INDEX_LOCK_STALE:
+                    os.remove(lock_path)
+                    continue
+            except OSError:
+                continue
+            time.sleep(0.01)
+    try:
+        yield
+    finally:
+        try:
+            os.remove(lock_path)
+        except OSError:
+            pass
+
+
+def _index_key(digest: str, options: dict) -> str:
+    # as opções mudam os resultados: fazem parte da chave
+    opts = hashlib.sha256(json.dumps(options, sort_keys=True).encode()).hexdigest()[:16]
+    return f"{digest}-{opts}"
+
+
+def _link_outputs(src_dir: str, dst_dir: str) -> None:
+    """Hard links dos resultados de src_dir em dst_dir (cópia se o FS não suportar)."""
+    for name in os.listdir(src_dir):
+        src = os.path.join(src_dir, name)
+        if name == JOB_FILE or name.startswith(".") or not os.path.isfile(src):
+            continue
+        try:
+            os.link(src, os.path.join(dst_dir, name))
+        except OSError:
+            shutil.copy2(src, os.path.join(dst_dir, name))
+
+
+def discard_job(jobid: str, uploads_root: str = UPLOADS_ROOT, outputs_root: str = OUTPUTS_ROOT) -> None:
+    """Apaga as pastas de um job (ex.: upload rejeitado ou duplicado)."""
+    shutil.rmtree(os.path.join(uploads_root, jobid), ignore_errors=True)
+    shutil.rmtree(os.path.join(outputs_root, jobid), ignore_errors=True)
+
+
+def resolve_duplicate(
+    jobid: str, digest: str, uploads_root: str = UPLOADS_ROOT, outputs_root: str = OUTPUTS_ROOT
+) -> Tuple[str, bool]:
+    """
+    Consulta/atualiza o índice para um job acabado de criar com o PDF de
+    sha256 digest. Devolve (jobid a mostrar, é preciso processar):
+      - (jobid, True): primeiro upload deste conteúdo; fica registado no índice;
+      - (outro_jobid, False): o mesmo PDF já está na fila ou a ser processado;
+        o job novo é apagado e fica-se à espera do existente;
+      - (jobid, False): já há um job concluído; os resultados são ligados
+        (hard links) ao job novo, que fica logo "done".
+    Com o lock da entrada, só um dos uploads simultâneos é processado.
+    """
+    record = load_job(jobid, outputs_root) or {}
+    _update_job(jobid, outputs_root, input_sha256=digest)
+    if not UPLOAD_DEDUP:
+        return jobid, True
+
+    os.makedirs(_index_dir(outputs_root), exist_ok=True)
+    entry_path = os.path.join(_index_dir(outputs_root), _index_key(digest, record.get("options", {})))
+    with _index_lock(entry_path):
+        try:
+            with open(entry_path, "r", encoding="utf-8") as f:
+                existing = f.read().strip()
+        except OSError:
+            existing = ""
+        existing_record = load_job(existing, outputs_root) if existing else None
+        status = existing_record.get("status") if existing_record else None
+
+        if status in (STATUS_QUEUED, STATUS_RUNNING):
+            discard_job(jobid, uploads_root, outputs_root)
+            return existing, False
+        if status == STATUS_DONE:
+            touch_job(existing, outputs_root)
+            _link_outputs(os.path.join(outputs_root, existing), os.path.join(outputs_root, jobid))
+            shutil.rmtree(os.path.join(uploads_root, jobid), ignore_errors=True)
+            _update_job(
+                jobid,
+                outputs_root,
+                status=STATUS_DONE,
+                finished_at=time.time(),
+                files=existing_record.get("files"),
+                reused_from=existing,
+            )
+            _index_numbers(jobid, outputs_root)
+            return jobid, False
+
+        # sem entrada, ou o job indexado falhou/foi apagado: este passa a ser o indexado
+        tmp = f"{entry_path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(jobid)
+        os.replace(tmp, entry_path)
+        return jobid, True
+
+
+def _index_entries(outputs_root: str) -> Iterator[Tuple[str, str]]:
+    """(caminho, jobid) das entradas do índice de uploads."""
+    index_dir = _index_dir(outputs_root)
+    try:
+        names = os.listdir(index_dir)
+    except FileNotFoundError:
+        return
+    for name in names:
+        if name.endswith((".lock", ".tmp")):
+            continue
+        path = os.path.join(index_dir, name)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                yield path, f.read().strip()
+        except OSError:
+            continue
+
+
+def _remove_index_entry(entry_path: str, jobid: str) -> bool:
+    """Apaga a entrada se ainda apontar para jobid (com o lock, como resolve_duplicate)."""
+    with _index_lock(entry_path):
+        try:
+            with open(entry_path, "r", encoding="utf-8") as f:
+                if f.read().strip() != jobid:
+                    return False
+            os.remove(entry_path)
+            return True
+        except OSError:
+            return False
+
+
+def prune_upload_index(outputs_root: str = OUTPUTS_ROOT) -> int:
+    """
+    Apaga as entradas do índice de uploads de jobs que já não existem ou
+    falharam, e ficheiros temporários abandonados; devolve quantas apagou.
+    """
+    pruned = 0
+    for entry_path, jobid in list(_index_entries(outputs_root)):
+        record = load_job(jobid, outputs_root) if jobid else None
+        if record is None or record.get("status") == STATUS_FAILED:
+            pruned += _remove_index_entry(entry_path, jobid)
+    index_dir = _index_dir(outputs_root)
+    if os.path.isdir(index_dir):
+        for name in os.listdir(index_dir):
+            path = os.path.join(index_dir, name)
+            try:
+                if name.endswith(".tmp") and time.time() - os.path.getmtime(path) > _INDEX_LOCK_STALE:
+                    os.remove(path)
+                    pruned += 1
+            except OSError:
+                continue
+    return pruned
+
+
+def delete_job(jobid: str, uploads_root: str = UPLOADS_ROOT, outputs_root: str = OUTPUTS_ROOT) -> None:
+    """
+    Apaga um job terminado e tudo o que o referencia: entradas do índice de
+    uploads (um upload idêntico passa a ser processado de novo), índice de
+    nºs e pastas. Não verifica o estado: ver retention.sweep.
+    """
+    for entry_path, indexed in list(_index_entries(outputs_root)):
+        if indexed == jobid:
+            _remove_index_entry(entry_path, jobid)
+    try:
+        remove_job(jobid, outputs_root)
+    except sqlite3.Error:
+        pass  # entradas órfãs são limpas por "python -m app.number_index --rebuild"
+    discard_job(jobid, uploads_root, outputs_root)
+
+
+def submit_job(
+    data: Union[bytes, BinaryIO],
+    options: Optional[dict] = None,
+    uploads_root: str = UPLOADS_ROOT,
+    outputs_root: str = OUTPUTS_ROOT,
+) -> str:
+    """
+    Cria o job, grava o PDF de entrada e põe-no na fila (ou reutiliza o job
+    de um upload idêntico, ver resolve_duplicate). Devolve o jobid a seguir.
+    data: conteúdo do PDF (bytes ou ficheiro aberto, copiado por blocos).
+    """
+    jobid, input_path = create_job(options, uploads_root, outputs_root)
+    _size, digest = spool_upload(data, input_path)
+    jobid, needs_processing = resolve_duplicate(jobid, digest, uploads_root, outputs_root)
+    if needs_processing:
+        enqueue_job(jobid, uploads_root)
+    return jobid
+
+
+def submit_batch(
+    uploads: List[Tuple[str, Union[bytes, BinaryIO]]],
+    options: Optional[dict] = None,
+    uploads_root: str = UPLOADS_ROOT,
+    outputs_root: str = OUTPUTS_ROOT,
+    max_bytes: Optional[int] = None,
+) -> str:
+    """
+    Cria um job de lote com vários PDFs e/ou ZIPs de PDFs [(nome, conteúdo)]
+    e põe-no na fila; é processado por batch.process_batch_iter. Devolve o
+    jobid a seguir (reutiliza o de um lote idêntico, ver resolve_duplicate).
+    max_bytes: limite do total gravado, incluindo o conteúdo dos ZIPs
+    (UploadTooLarge se excedido).
+    """
+    jobid, input_path = create_job(options, uploads_root, outputs_root)
+    up_dir = os.path.dirname(input_path)
+    inputs: List[dict] = []
+    total = 0
+    digests = hashlib.sha256()
+    try:
+        for k, (name, data) in enumerate(uploads):
+            is_zip = name.lower().endswith(".zip")
+            path = os.path.join(up_dir, f"input_{k:03d}.zip" if is_zip else f"input_{k:03d}.pdf")
+            remaining = None if max_bytes is None else max_bytes - total
+            size, digest = spool_upload(data, path, remaining)
+            total += size
+            if not is_zip:
+                inputs.append({"name": os.path.basename(name), "file": os.path.basename(path)})
+                digests.update(digest.encode())
+                continue
+            # ZIP: os PDFs lá dentro entram no lote pela ordem dos nomes
+            remaining = None if max_bytes is None else max_bytes - total
+            for member_name, member_path in extract_zip_pdfs(path, up_dir, f"input_{k:03d}_", remaining):
+                inputs.append({"name": member_name, "file": os.path.basename(member_path)})
+                total += os.path.getsize(member_path)
+            os.remove(path)
+            digests.update(digest.encode())
+    except ZipTooLarge as e:
+        discard_job(jobid, uploads_root, outputs_root)
+        raise UploadTooLarge(str(e))
+    except Exception:
+        discard_job(jobid, uploads_root, outputs_root)
+        raise
+
+    _update_job(jobid, outputs_root, inputs=inputs)
+    jobid, needs_processing = resolve_duplicate(jobid, digests.hexdigest(), uploads_root, outputs_root)
+    if needs_processing:
+        enqueue_job(jobid, uploads_root)
+    return jobid
+
+
+def claim_next_job(uploads_root: str = UPLOADS_ROOT) -> Optional[str]:
+    """Reclama o job mais antigo da fila (None se vazia)."""
+    queue_dir = _queue_dir(uploads_root)
+    running_dir = _running_dir(uploads_root)
+    os.makedirs(running_dir, exist_ok=True)
+    try:
+        markers = sorted(os.listdir(queue_dir))
+    except FileNotFoundError:
+        return None
+    for marker in markers:
+        try:
+            os.rename(os.path.join(queue_dir, marker), os.path.join(running_dir, marker))
+        except OSError:
+            continue  # outro worker foi mais rápido
+        try:
+            os.utime(os.path.join(running_dir, marker))  # hora da reclamação (requeue_stale_jobs)
+        except OSError:
+            pass
+        return marker.split("-", 1)[1]
+    return None
+
+
+def _release_marker(jobid: str, uploads_root: str) -> None:
+    running_dir = _running_dir(uploads_root)
+    if not os.path.isdir(running_dir):
+        return
+    for marker in os.listdir(running_dir):
+        if marker.endswith(jobid):
+            try:
+                os.remove(os.path.join(running_dir, marker))
+            except OSError:
+                pass
+
+
+def run_job(jobid: str, uploads_root: str = UPLOADS_ROOT, outputs_root: str = OUTPUTS_ROOT) -> dict:
+    """
+    Processa um job já reclamado e atualiza o seu registo. Um job
+    interrompido (worker morto, ver requeue_stale_jobs) retoma a partir das
+    páginas já gravadas.
+    """
+    up_dir = os.path.join(uploads_root, jobid)
+    out_dir = os.path.join(outputs_root, jobid)
+    record = _update_job(
+        jobid, outputs_root, status=STATUS_RUNNING, started_at=time.time(), worker_pid=os.getpid()
+    )
+    try:
+        last_save = 0.0
+        n_files = 0
+        if record.get("inputs") is not None:
+            inputs = [(entry["name"], os.path.join(up_dir, entry["file"])) for entry in record["inputs"]]
+            events = process_batch_iter(inputs, out_dir, build_zip=True, resume=True, **record["options"])
+        else:
+            events = process_pdf_iter(
+                os.path.join(up_dir, INPUT_NAME), out_dir, build_zip=True, resume=True, **record["options"]
+            )
+        for event in events:
+            if event["event"] == "file":
+                n_files += 1
+                continue
+            if time.monotonic() - last_save >= _PROGRESS_INTERVAL:
+                last_save = time.monotonic()
+                _update_job(
+                    jobid, outputs_root, progress={"page": event["page"], "total": event["total"], "files": n_files}
+                )
+        record = _update_job(jobid, outputs_root, status=STATUS_DONE, finished_at=time.time(), files=n_files)
+        _index_numbers(jobid, outputs_root)
+        if not KEEP_INPUTS:
+            # resultados gravados: a entrada já não é precisa (uploads idênticos usam os resultados)
+            shutil.rmtree(up_dir, ignore_errors=True)
+        return record
+    except Exception as e:
+        # limpeza semelhante ao FastAPI: remove input e outputs parciais, mantém o registo
+        shutil.rmtree(up_dir, ignore_errors=True)
+        for name in os.listdir(out_dir):
+            if name != JOB_FILE:
+                path = os.path.join(out_dir, name)
+                if os.path.isdir(path):
+                    shutil.rmtree(path, ignore_errors=True)
+                else:
+                    os.remove(path)
+        return _update_job(
+            jobid,
+            outputs_root,
+            status=STATUS_FAILED,
+            finished_at=time.time(),
+            error=f"{type(e).__name__}: {e}",
+            traceback=traceback.format_exc(),
+        )
+    except BaseException:
+        # interrompido ao desligar (KeyboardInterrupt, SystemExit): volta já à
+        # fila e retoma no próximo worker; se falhar, o marcador fica e o job
+        # é devolvido à fila por requeue_stale_jobs
+        _return_to_queue(jobid, uploads_root, outputs_root)
+        raise
+    finally:
+        if (load_job(jobid, outputs_root) or {}).get("status") in (STATUS_DONE, STATUS_FAILED):
+            _release_marker(jobid, uploads_root)
+
+
+def _return_to_queue(jobid: str, uploads_root: str, outputs_root: str) -> None:
+    """Devolve à fila um job reclamado (marcador de .running para .queue, estado "queued")."""
+    running_dir = _running_dir(uploads_root)
+    for marker in os.listdir(running_dir):
+        if marker.endswith(jobid):
+            try:
+                os.rename(os.path.join(running_dir, marker), os.path.join(_queue_dir(uploads_root), marker))
+            except OSError:
+                return
+            _update_job(jobid, outputs_root, status=STATUS_QUEUED, progress=None)
+
+
+def _index_numbers(jobid: str, outputs_root: str) -> None:
+    """Acrescenta o job ao índice de nºs; uma falha do índice não falha o job."""
+    try:
+        index_job(jobid, outputs_root)
+    except sqlite3.Error:
+        # fica de fora até ao próximo "python -m app.number_index --rebuild"
+        pass
+
+
+def _pid_alive(pid: Optional[int]) -> bool:
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def committed_files(jobid: str, outputs_root: str = OUTPUTS_ROOT) -> List[dict]:
+    """
+    PDFs já gravados de um job em curso [{name, file, size, pages[, source]}],
+    lidos do diário (o manifesto só é escrito no fim), para os mostrar e
+    descarregar antes de o job terminar.
+    """
+    out_dir = os.path.join(outputs_root, jobid)
+    files = []
+    for record in read_records(os.path.join(out_dir, PAGE_JOURNAL_NAME))[1:]:
+        if record.get("type") == "file":
+            files.append({key: record[key] for key in ("name", "file", "size", "pages")})
+    # lote: PDFs dos documentos já juntados ao job
+    for record in read_records(os.path.join(out_dir, BATCH_JOURNAL_NAME))[1:]:
+        entries = (record.get("manifest") or {}).get("files", [])
+        for entry, fs_name in zip(entries, record.get("files", [])):
+            files.append({**entry, "file": fs_name, "source": record["source"]})
+    return [entry for entry in files if os.path.exists(os.path.join(out_dir, entry["file"]))]
+
+
+def requeue_stale_jobs(uploads_root: str = UPLOADS_ROOT, outputs_root: str = OUTPUTS_ROOT) -> List[str]:
+    """
+    Volta a pôr na fila jobs "running" cujo worker já não existe (crash,
+    deploy); retomam a partir das páginas já gravadas (run_job). Um job
+    interrompido mais de JOB_MAX_REQUEUES vezes falha, para não matar
+    workers sem fim.
+    """
+    running_dir = _running_dir(uploads_root)
+    requeued = []
+    try:
+        markers = os.listdir(running_dir)
+    except FileNotFoundError:
+        return requeued
+    for marker in markers:
+        jobid = marker.split("-", 1)[1]
+        record = load_job(jobid, outputs_root) or {}
+        if record.get("status") == STATUS_RUNNING and _pid_alive(record.get("worker_pid")):
+            continue
+        if record.get("status") not in (STATUS_QUEUED, STATUS_RUNNING):
+            continue  # marcador por limpar de um job já terminado
+        if record.get("status") == STATUS_QUEUED:
+            try:
+                if time.time() - os.path.getmtime(os.path.join(running_dir, marker)) < _CLAIM_GRACE:
+                    continue  # acabado de reclamar: run_job ainda não o marcou como "running"
+            except OSError:
+                continue
+        requeues = record.get("requeues", 0) + 1
+        if requeues > JOB_MAX_REQUEUES:
+            try:
+                os.remove(os.path.join(running_dir, marker))
+            except OSError:
+                continue  # outro supervisor tratou dele
+            _update_job(
+                jobid,
+                outputs_root,
+                status=STATUS_FAILED,
+                finished_at=time.time(),
+                error=f"Job interrompido {requeues} vezes (worker morto).",
+            )
+            continue
+        try:
+            os.rename(os.path.join(running_dir, marker), os.path.join(_queue_dir(uploads_root), marker))
+        except OSError:
+            continue
+        _update_job(jobid, outputs_root, status=STATUS_QUEUED, progress=None, requeues=requeues)
+        requeued.append(jobid)
+    return requeued
+
+
+def worker_loop(
+    uploads_root: str = UPLOADS_ROOT,
+    outputs_root: str = OUTPUTS_ROOT,
+    stop_event=None,
+    poll_interval: float = POLL_INTERVAL,
+) -> None:
+    """Consome a fila até stop_event ser ativado."""
+    while stop_event is None or not stop_event.is_set():
+        jobid = claim_next_job(uploads_root)
+        if jobid is None:
+            time.sleep(poll_interval)
+            continue
+        run_job(jobid, uploads_root, outputs_root)
+
+
+def start_workers(
+    n_workers: int = JOB_WORKERS, uploads_root: str = UPLOADS_ROOT, outputs_root: str = OUTPUTS_ROOT
+) -> List[multiprocessing.Process]:
+    """
+    Arranca n_workers processos a consumir a fila. Não são daemon (cada job
+    pode abrir o seu próprio pool de OCR); param ao terminar o processo pai.
+    Uma thread supervisora (_supervise) substitui os workers que morram (ex.:
+    falta de memória) e devolve os seus jobs à fila; a lista devolvida é
+    atualizada no lugar.
+    """
+    requeue_stale_jobs(uploads_root, outputs_root)
+    ctx = multiprocessing.get_context("spawn")
+    stop_event = ctx.Event()
+
+    def spawn(n: int) -> multiprocessing.Process:
+        worker = ctx.Process(target=worker_loop, args=(uploads_root, outputs_root, stop_event), name=f"pdf-worker-{n}")
+        worker.start()
+        return worker
+
+    workers = [spawn(n) for n in range(n_workers)]
+    # corre antes do join dos processos filhos feito pelo multiprocessing
+    atexit.register(stop_event.set)
+    threading.Thread(
+        target=_supervise,
+        args=(workers, spawn, stop_event, uploads_root, outputs_root),
+        name="pdf-worker-supervisor",
+        daemon=True,
+    ).start()
+    return workers
+
+
+def _supervise(workers: list, spawn, stop_event, uploads_root: str, outputs_root: str) -> None:
+    """A cada SUPERVISE_INTERVAL: jobs de workers mortos de volta à fila e workers mortos substituídos."""
+    while not stop_event.wait(SUPERVISE_INTERVAL):
+        requeue_stale_jobs(uploads_root, outputs_root)
+        for n, worker in enumerate(workers):
+            if not worker.is_alive() and not stop_event.is_set():
+                worker.join()
+                workers[n] = spawn(n)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Workers da fila de processamento de PDFs.")
+    parser.add_argument("--workers", type=int, default=JOB_WORKERS)
+    parser.add_argument("--uploads", default=UPLOADS_ROOT)
+    parser.add_argument("--outputs", default=OUTPUTS_ROOT)
+    args = parser.parse_args(argv)
+    configure_storage(args.outputs)
+    start_workers(args.workers, args.uploads, args.outputs)
+    # os workers ficam a cargo do supervisor (que substitui os que morrem)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -1,50 +1,147 @@
 import os
-import shutil
-import zipfile
-from io import BytesIO
+import time
 from pathlib import Path
+from typing import Optional
+from uuid import UUID
 
 import streamlit as st
 
-# -------------------------------------------------------------------
-# IMPORTANTE:
-# Ajusta este import conforme a tua estrutura:
-# - Se tens process_pdf.py no mesmo diretório:      from process_pdf import make_job_dirs, process_pdf
-# - Se está em app/process_pdf.py (módulo app):     from app.process_pdf import make_job_dirs, process_pdf
-# -------------------------------------------------------------------
-from process_pdf import make_job_dirs, process_pdf  # <-- ajusta se necessário
-
+try:
+    from .process_pdf import configure_storage, load_manifest
+    from .job_zip import ensure_job_zip
+    from .number_index import lookup
+    from .jobs import (
+        JOB_WORKERS,
+        STATUS_DONE,
+        STATUS_FAILED,
+        STATUS_QUEUED,
+        STATUS_RUNNING,
+        UploadTooLarge,
+        committed_files,
+        load_job,
+        start_workers,
+        submit_batch,
+        submit_job,
+        touch_job,
+    )
+    from .retention import start_sweeper
+    from .utils import human_size
+except ImportError:  # executado a partir de app/ (ex.: streamlit run app/main.py)
+    from process_pdf import configure_storage, load_manifest
+    from job_zip import ensure_job_zip
+    from number_index import lookup
+    from jobs import (
+        JOB_WORKERS,
+        STATUS_DONE,
+        STATUS_FAILED,
+        STATUS_QUEUED,
+        STATUS_RUNNING,
+        UploadTooLarge,
+        committed_files,
+        load_job,
+        start_workers,
+        submit_batch,
+        submit_job,
+        touch_job,
+    )
+    from retention import start_sweeper
+    from utils import human_size
 
 UPLOADS_ROOT = "uploads"
 OUTPUTS_ROOT = "outputs"
-MAX_MB = 20
+# Limite do upload; o Streamlit tem o seu (server.maxUploadSize em .streamlit/config.toml)
+MAX_MB = int(os.getenv("MAX_UPLOAD_MB", "500"))
+RESULTS_PAGE_SIZE = 50
+JOB_POLL_SECONDS = 1.0
 
 
 def allowed_file(filename: str) -> bool:
     return filename.lower().endswith(".pdf")
 
 
+def allowed_upload(filename: str) -> bool:
+    # PDFs soltos ou ZIPs de PDFs (processados em lote)
+    return allowed_file(filename) or filename.lower().endswith(".zip")
+
+
 def sanitize_filename(filename: str) -> str:
     return os.path.basename(filename)
 
 
-def human_size(n: int) -> str:
-    # simples e suficiente para UI
-    for unit in ["B", "KB", "MB", "GB"]:
-        if n < 1024 or unit == "GB":
-            return f"{n:.0f} {unit}" if unit == "B" else f"{n/ (1024 if unit=='KB' else 1):.2f} {unit}"
-        n /= 1024
-    return f"{n:.2f} GB"
+def parse_jobid(jobid: str) -> Optional[str]:
+    """jobid (UUID) normalizado, ou None se inválido: vem do URL e não pode sair de outputs/."""
+    try:
+        return str(UUID(jobid))
+    except (TypeError, ValueError):
+        return None
 
 
-def build_zip_bytes(out_dir: str) -> bytes:
-    buf = BytesIO()
-    with zipfile.ZipFile(buf, "w", compression=zipfile.ZIP_DEFLATED) as zf:
-        for name in sorted(os.listdir(out_dir)):
-            if name.endswith(".pdf"):
-                zf.write(os.path.join(out_dir, name), arcname=name)
-    buf.seek(0)
-    return buf.read()
+@st.cache_data(show_spinner=False)
+def job_files(jobid: str) -> list[dict]:
+    """
+    PDFs do job [{name, file, size, pages}], lidos do manifesto (uma vez por
+    jobid); jobs sem manifesto são listados a partir do diretório.
+    """
+    out_dir = os.path.join(OUTPUTS_ROOT, jobid)
+    manifest = load_manifest(out_dir)
+    if manifest is not None:
+        return manifest["files"]
+    files = []
+    for fs_name in sorted(os.listdir(out_dir)):
+        if fs_name.endswith(".pdf"):
+            files.append({
+                "name": fs_name.replace("_", "/").replace(".pdf", ""),
+                "file": fs_name,
+                "size": os.path.getsize(os.path.join(out_dir, fs_name)),
+                "pages": None,
+            })
+    return files
+
+
+@st.cache_resource
+def job_workers():
+    """Workers da fila, arrancados uma vez por servidor (JOB_WORKERS=0 usa workers externos)."""
+    return start_workers(JOB_WORKERS, UPLOADS_ROOT, OUTPUTS_ROOT) if JOB_WORKERS > 0 else []
+
+
+@st.cache_resource
+def retention_sweeper():
+    """Varrimento da retenção (retention.py), arrancado uma vez por servidor."""
+    return start_sweeper(UPLOADS_ROOT, OUTPUTS_ROOT)
+
+
+def show_files(jobid: str, out_dir: str, files: list[dict]) -> None:
+    """Lista paginada dos PDFs do job, cada um com o seu download."""
+    st.markdown(f"### PDFs gerados ({len(files)})")
+    n_pages = -(-len(files) // RESULTS_PAGE_SIZE)
+    page = 1
+    if n_pages > 1:
+        page = st.number_input("Página de resultados", min_value=1, max_value=n_pages, value=1)
+    start = (page - 1) * RESULTS_PAGE_SIZE
+
+    for entry in files[start:start + RESULTS_PAGE_SIZE]:
+        fs_name = entry["file"]
+        col1, col2 = st.columns([3, 2])
+        with col1:
+            st.write(f"**{entry['name']}**")
+            source = f" • {entry['source']}" if entry.get("source") else ""
+            st.caption(f"{fs_name} • {entry['size'] / 1024:.1f} KB{source}")
+
+        with col2:
+            # só lê o ficheiro do PDF escolhido
+            if st.session_state.get("dl_file") == (jobid, fs_name):
+                with open(os.path.join(out_dir, sanitize_filename(fs_name)), "rb") as f:
+                    st.download_button(
+                        "Descarregar",
+                        data=f,
+                        file_name=fs_name,
+                        mime="application/pdf",
+                        key=f"dl_{jobid}_{fs_name}",
+                        use_container_width=True,
+                    )
+            elif st.button("Preparar download", key=f"prep_{jobid}_{fs_name}", use_container_width=True):
+                st.session_state["dl_file"] = (jobid, fs_name)
+                st.rerun()
 
 
 st.set_page_config(page_title="Processador de PDFs", layout="centered")
@@ -54,61 +151,104 @@ st.caption("Upload de PDF → processamento → downloads (PDFs e ZIP).")
 # 👇 CONTEXTO / INSTRUÇÕES AQUI
 with st.expander("ℹ️ Informações e instruções", expanded=True):
     st.markdown("""
-    - Faz upload de um ficheiro PDF.
+    - Faz upload de um ou mais ficheiros PDF (ou de um ZIP com PDFs).
     - O sistema divide o PDF por páginas.
     - Cada página é analisada para identificar o número de processo.
     - No final podes descarregar os PDFs individuais ou um ZIP.
 
     **Nota:** PDFs digitalizados podem demorar mais tempo devido ao OCR.
     """)
-uploaded = st.file_uploader("Escolhe um ficheiro PDF", type=["pdf"])
+# cache de OCR e métricas em outputs/ (antes de arrancar os workers, que herdam o ambiente)
+configure_storage(OUTPUTS_ROOT)
+job_workers()
+retention_sweeper()
+
+# pesquisa de um nº em todos os jobs já processados (number_index)
+with st.expander("🔎 Procurar nº de processo"):
+    query = st.text_input("Nº de processo", placeholder="ex.: 0001234-56.2023.8.26.0100 ou 1234/23.0T8LSB")
+    prefix = st.checkbox("Todos os nºs que começam por este")
+    if query.strip():
+        matches = lookup(query, OUTPUTS_ROOT, prefix=prefix)
+        if not matches:
+            st.info("Nenhum PDF encontrado.")
+        for k, match in enumerate(matches):
+            col1, col2 = st.columns([3, 2])
+            with col1:
+                st.write(f"**{match['name']}**")
+                st.caption(
+                    f"{match['file']} • páginas {match['pages'][0]}-{match['pages'][1]} • "
+                    f"{human_size(match['size'])} • {time.strftime('%Y-%m-%d %H:%M', time.localtime(match['indexed_at']))}"
+                )
+            with col2:
+                if st.button("Abrir job", key=f"find_{k}_{match['jobid']}", use_container_width=True):
+                    st.session_state["last_jobid"] = match["jobid"]
+                    st.query_params["job"] = match["jobid"]
+                    st.rerun()
+
+uploaded_files = st.file_uploader(
+    "Escolhe ficheiros PDF (ou um ZIP com PDFs)", type=["pdf", "zip"], accept_multiple_files=True
+)
 
-if uploaded is not None:
+if uploaded_files:
     # validações equivalentes às do FastAPI
-    if not allowed_file(uploaded.name):
-        st.error("Apenas PDFs são aceites.")
+    if not all(allowed_upload(uploaded.name) for uploaded in uploaded_files):
+        st.error("Apenas PDFs (ou ZIPs de PDFs) são aceites.")
         st.stop()
 
-    data = uploaded.getvalue()
-    size = len(data)
+    # sem getvalue(): evita uma segunda cópia do PDF em memória; os ficheiros
+    # são copiados por blocos para o disco em submit_job/submit_batch
+    size = sum(uploaded.size for uploaded in uploaded_files)
     if size > MAX_MB * 1024 * 1024:
         st.error(f"Ficheiro demasiado grande (máx. {MAX_MB} MB).")
         st.stop()
 
-    st.write(f"**Ficheiro:** {uploaded.name}")
+    if len(uploaded_files) == 1:
+        st.write(f"**Ficheiro:** {uploaded_files[0].name}")
+    else:
+        st.write(f"**Ficheiros:** {len(uploaded_files)} (processados em lote)")
     st.write(f"**Tamanho:** {size / (1024*1024):.2f} MB")
 
-    if st.button("Processar", type="primary"):
-        with st.spinner("A processar..."):
-            jobid, up_dir, out_dir = make_job_dirs(UPLOADS_ROOT, OUTPUTS_ROOT)
-            pdf_path = os.path.join(up_dir, "input.pdf")
-            os.makedirs(up_dir, exist_ok=True)
-            os.makedirs(out_dir, exist_ok=True)
+    group_pages = st.checkbox("Agrupar páginas consecutivas do mesmo processo num só PDF")
+    inherit_number = st.checkbox(
+        "Páginas sem número herdam o número da página anterior", disabled=not group_pages
+    )
+    optimize_output = st.checkbox("Otimizar PDFs gerados (remove recursos não usados e comprime)")
 
+    if st.button("Processar", type="primary"):
+        # o processamento corre nos workers da fila (jobs.py), fora desta sessão
+        options = {
+            "group_pages": group_pages,
+            "inherit_number": group_pages and inherit_number,
+            "optimize_output": optimize_output,
+        }
+        for uploaded in uploaded_files:
+            uploaded.seek(0)
+        if len(uploaded_files) == 1 and allowed_file(uploaded_files[0].name):
+            jobid = submit_job(uploaded_files[0], options=options, uploads_root=UPLOADS_ROOT, outputs_root=OUTPUTS_ROOT)
+        else:
+            # vários PDFs e/ou ZIP: um só job, documentos processados em paralelo
             try:
-                with open(pdf_path, "wb") as f:
-                    f.write(data)
-
-                # mantém a tua lógica existente
-                process_pdf(pdf_path, out_dir)
-
-            except Exception as e:
-                # limpeza semelhante ao teu FastAPI
-                try:
-                    shutil.rmtree(up_dir, ignore_errors=True)
-                    shutil.rmtree(out_dir, ignore_errors=True)
-                except Exception:
-                    pass
-                st.error("Processamento falhou.")
-                st.exception(e)
+                jobid = submit_batch(
+                    [(uploaded.name, uploaded) for uploaded in uploaded_files],
+                    options=options,
+                    uploads_root=UPLOADS_ROOT,
+                    outputs_root=OUTPUTS_ROOT,
+                    max_bytes=MAX_MB * 1024 * 1024,
+                )
+            except UploadTooLarge:
+                st.error(f"Conteúdo do ZIP demasiado grande (máx. {MAX_MB} MB).")
                 st.stop()
-
-        st.success(f"Concluído! Job: {jobid}")
         st.session_state["last_jobid"] = jobid
+        # jobid no URL: um refresh do browser não perde o job
+        st.query_params["job"] = jobid
 
 # Se já houve job processado nesta sessão, mostra resultados
-jobid = st.session_state.get("last_jobid")
+jobid = st.session_state.get("last_jobid") or st.query_params.get("job")
 if jobid:
+    jobid = parse_jobid(jobid)
+    if jobid is None:
+        st.warning("Job inválido.")
+        st.stop()
     out_dir = os.path.join(OUTPUTS_ROOT, jobid)
 
     st.divider()
@@ -118,39 +258,65 @@ if jobid:
         st.warning("Diretório de outputs não encontrado.")
         st.stop()
 
-    pdfs = [f for f in sorted(os.listdir(out_dir)) if f.endswith(".pdf")]
+    record = load_job(jobid, OUTPUTS_ROOT)
+    status = record["status"] if record else STATUS_DONE  # jobs anteriores à fila
+    if status in (STATUS_QUEUED, STATUS_RUNNING):
+        progress = record.get("progress")
+        if progress:
+            st.progress(
+                progress["page"] / progress["total"],
+                text=f"A processar: página {progress['page']} de {progress['total']} "
+                f"({progress['files']} PDFs gerados)",
+            )
+        else:
+            st.progress(0.0, text="Na fila..." if status == STATUS_QUEUED else "A processar...")
+        # PDFs já gravados: podem ser vistos e descarregados antes de o job terminar
+        partial = committed_files(jobid, OUTPUTS_ROOT)
+        if partial:
+            show_files(jobid, out_dir, partial)
+        time.sleep(JOB_POLL_SECONDS)
+        st.rerun()
+    if status == STATUS_FAILED:
+        st.error("Processamento falhou.")
+        st.code(record.get("error", ""))
+        st.stop()
 
-    if not pdfs:
-        st.info("Não foram gerados PDFs.")
-    else:
-        # botão ZIP (em memória)
-        zip_bytes = build_zip_bytes(out_dir)
-        st.download_button(
-            "Descarregar ZIP com todos os PDFs",
-            data=zip_bytes,
-            file_name=f"{jobid}.zip",
-            mime="application/zip",
-            use_container_width=True,
+    touch_job(jobid, OUTPUTS_ROOT)  # acesso aos resultados (retenção LRU)
+    if record and record.get("reused_from"):
+        st.caption("PDF idêntico a um já processado: resultados reutilizados.")
+
+    manifest = load_manifest(out_dir) or {}
+    for document in manifest.get("documents", []):
+        if document["error"]:
+            st.warning(f"{document['source']}: não foi processado ({document['error']}).")
+
+    output = manifest.get("output", {})
+    if output.get("optimized"):
+        st.caption(
+            f"Tamanho dos PDFs: {human_size(output['bytes_before'])} → {human_size(output['bytes_after'])}"
         )
 
-        st.markdown("### PDFs gerados")
-        for fs_name in pdfs:
-            logical_name = fs_name.replace("_", "/").replace(".pdf", "")
-            file_path = os.path.join(out_dir, sanitize_filename(fs_name))
-            file_size = os.path.getsize(file_path)
+    files = job_files(jobid)
 
-            col1, col2 = st.columns([3, 2])
-            with col1:
-                st.write(f"**{logical_name}**")
-                st.caption(f"{fs_name} • {file_size / 1024:.1f} KB")
+    if not files:
+        st.info("Não foram gerados PDFs.")
+    else:
+        # ZIP construído uma vez por job, em disco; só é lido quando pedido
+        zip_path = ensure_job_zip(out_dir)
+        if st.session_state.get("zip_ready") == jobid:
+            with open(zip_path, "rb") as f:
+                st.download_button(
+                    "Descarregar ZIP com todos os PDFs",
+                    data=f,
+                    file_name=f"{jobid}.zip",
+                    mime="application/zip",
+                    use_container_width=True,
+                )
+        elif st.button(
+            f"Preparar ZIP com todos os PDFs ({human_size(os.path.getsize(zip_path))})",
+            use_container_width=True,
+        ):
+            st.session_state["zip_ready"] = jobid
+            st.rerun()
 
-            with col2:
-                with open(file_path, "rb") as f:
-                    st.download_button(
-                        "Descarregar",
-                        data=f.read(),
-                        file_name=fs_name,
-                        mime="application/pdf",
-                        key=f"dl_{jobid}_{fs_name}",
-                        use_container_width=True,
-                    )
+        show_files(jobid, out_dir, files)
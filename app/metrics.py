@@ -0,0 +1,299 @@
+"""
+Tempos por etapa e contadores do processamento.
+
+Cada página leva em stats["timings"] os segundos gastos por etapa
+(classificação, extração pypdf/pdfplumber, consulta da cache de OCR,
+rasterização, pré-processamento, Tesseract); a escrita de cada PDF é medida por ficheiro. O
+processo que corre process_pdf_iter agrega tudo em REGISTRY, chama os hooks
+registados com add_hook e, no fim de cada job, publica um snapshot em
+METRICS_DIR (um ficheiro por processo, com um id próprio); collect() soma os
+snapshots de todos os processos (workers da fila, CLI) e
+render_prometheus() gera o formato de texto do Prometheus. Os snapshots de
+processos que já terminaram são acumulados em CUMULATIVE_NAME e apagados.
+
+A medição é só perf_counter() e somas em dicts, para poder ficar sempre
+ligada.
+"""
+import json
+import os
+import socket
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+from uuid import uuid4
+
+# Snapshots por processo (para /metrics e --metrics-file); vazio (omissão)
+# desliga. Os pontos de entrada usam <resultados>/.metrics (configure_storage)
+METRICS_DIR = os.getenv("METRICS_DIR", "")
+# Totais dos processos terminados, em METRICS_DIR
+CUMULATIVE_NAME = "cumulative.json"
+# lock do acumulado mais antigo do que isto é de um processo que morreu
+_LOCK_STALE = 30.0
+
+STAGE_CLASSIFY = "classify"
+STAGE_TEXT_PYPDF = "text_pypdf"
+STAGE_TEXT_PDFPLUMBER = "text_pdfplumber"
+STAGE_OCR_CACHE = "ocr_cache_lookup"
+STAGE_RASTERIZE = "rasterize"
+STAGE_PREPROCESS = "preprocess"
+STAGE_OCR = "ocr"
+STAGE_WRITE = "write"
+
+# hook(etapa, segundos, labels), chamado no processo que agrega (ver record_page)
+Hook = Callable[[str, float, dict], None]
+_hooks: List[Hook] = []
+
+
+def add_hook(hook: Hook) -> None:
+    """Regista um hook chamado por cada etapa medida (ex.: para um profiler)."""
+    _hooks.append(hook)
+
+
+def remove_hook(hook: Hook) -> None:
+    _hooks.remove(hook)
+
+
+@contextmanager
+def timed(stage: str, timings: Optional[Dict[str, float]]) -> Iterator[None]:
+    """Soma a duração do bloco em timings[stage] (não faz nada se timings for None)."""
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[stage] = timings.get(stage, 0.0) + time.perf_counter() - start
+
+
+class Metrics:
+    """Tempos acumulados por etapa e contadores; seguro entre threads."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.stage_seconds: Dict[str, float] = defaultdict(float)
+        self.stage_calls: Dict[str, int] = defaultdict(int)
+        self.counters: Dict[str, int] = defaultdict(int)
+
+    def observe(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            self.stage_seconds[stage] += seconds
+            self.stage_calls[stage] += 1
+
+    def inc(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            self.counters[name] += n
+
+    def record_page(self, stats: dict, call_hooks: bool = False) -> None:
+        """Agrega as stats de uma página (evento "page" de process_pdf_iter)."""
+        for stage, seconds in stats.get("timings", {}).items():
+            self.observe(stage, seconds)
+            if call_hooks:
+                for hook in _hooks:
+                    hook(stage, seconds, {"page": stats["page"], "source": stats["source"]})
+        self.inc("pages")
+        if stats["source"] == "ocr":
+            self.inc("ocr_pages")
+        elif stats["source"] == "ocr_cache":
+            self.inc("ocr_cache_hits")
+        if stats.get("escalated"):
+            self.inc("pages_escalated")
+        if stats.get("text_engine"):
+            self.inc(f"text_engine_{stats['text_engine']}")
+
+    def record_file(self, size: int, seconds: float, call_hooks: bool = False) -> None:
+        self.observe(STAGE_WRITE, seconds)
+        if call_hooks:
+            for hook in _hooks:
+                hook(STAGE_WRITE, seconds, {"bytes": size})
+        self.inc("files_written")
+        self.inc("bytes_written", size)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "stage_seconds": {k: round(v, 6) for k, v in self.stage_seconds.items()},
+                "stage_calls": dict(self.stage_calls),
+                "counters": dict(self.counters),
+            }
+
+    def merge(self, snapshot: dict) -> None:
+        with self._lock:
+            for stage, seconds in snapshot.get("stage_seconds", {}).items():
+                self.stage_seconds[stage] += seconds
+            for stage, calls in snapshot.get("stage_calls", {}).items():
+                self.stage_calls[stage] += calls
+            for name, value in snapshot.get("counters", {}).items():
+                self.counters[name] += value
+
+
+# Agregado deste processo
+REGISTRY = Metrics()
+
+
+# (pid, id) deste processo; um processo criado por fork gera o seu
+_process_id: Tuple[int, str] = (0, "")
+
+
+def _snapshot_path(metrics_dir: str) -> str:
+    """
+    Snapshot deste processo: hostname, pid e um id aleatório, para um pid
+    reutilizado não escrever por cima dos totais de um processo que morreu.
+    """
+    global _process_id
+    if _process_id[0] != os.getpid():
+        _process_id = (os.getpid(), uuid4().hex)
+    return os.path.join(metrics_dir, f"{socket.gethostname()}-{os.getpid()}-{_process_id[1]}.json")
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _finished(name: str, snapshot: dict) -> bool:
+    """O snapshot é de um processo desta máquina que já terminou."""
+    host, pid = snapshot.get("host"), snapshot.get("pid")
+    if host is None:  # formato antigo: <hostname>-<pid>.json
+        host, _sep, pid = name[: -len(".json")].rpartition("-")
+    try:
+        pid = int(pid)
+    except (TypeError, ValueError):
+        return False
+    return host == socket.gethostname() and pid != os.getpid() and not _pid_alive(pid)
+
+
+@contextmanager
+def _cumulative_lock(metrics_dir: str) -> Iterator[None]:
+    """Lock (ficheiro criado com O_EXCL) do acumulado, como jobs._index_lock."""
+    lock_path = os.path.join(metrics_dir, f"{CUMULATIVE_NAME}.lock")
+    while True:
+        try:
+            os.close(os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            break
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(lock_path) > _LOCK_STALE:
+                    os.remove(lock_path)
+                    continue
+            except OSError:
+                continue
+            time.sleep(0.01)
+    try:
+        yield
+    finally:
+        try:
+            os.remove(lock_path)
+        except OSError:
+            pass
+
+
+def _write_json(path: str, data: dict) -> None:
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+def configure(metrics_dir: str) -> None:
+    """Muda METRICS_DIR neste processo (vazio desliga os snapshots)."""
+    global METRICS_DIR
+    METRICS_DIR = metrics_dir
+
+
+def publish(metrics_dir: Optional[str] = None) -> None:
+    """Grava o snapshot de REGISTRY deste processo em metrics_dir (por omissão METRICS_DIR)."""
+    metrics_dir = METRICS_DIR if metrics_dir is None else metrics_dir
+    if not metrics_dir:
+        return
+    os.makedirs(metrics_dir, exist_ok=True)
+    snapshot = REGISTRY.snapshot()
+    snapshot.update(host=socket.gethostname(), pid=os.getpid())
+    _write_json(_snapshot_path(metrics_dir), snapshot)
+
+
+def collect(metrics_dir: Optional[str] = None) -> Metrics:
+    """
+    Soma REGISTRY deste processo com o acumulado e os snapshots dos outros
+    processos. Os snapshots de processos terminados passam para o acumulado
+    (os totais nunca descem e a pasta não cresce sem fim); os já somados ao
+    acumulado ficam listados em "rolled" até serem apagados, para uma falha
+    entre os dois passos não os contar duas vezes.
+    """
+    metrics_dir = METRICS_DIR if metrics_dir is None else metrics_dir
+    total = Metrics()
+    total.merge(REGISTRY.snapshot())
+    if not metrics_dir or not os.path.isdir(metrics_dir):
+        return total
+    cumulative_path = os.path.join(metrics_dir, CUMULATIVE_NAME)
+    own = os.path.basename(_snapshot_path(metrics_dir))
+    with _cumulative_lock(metrics_dir):
+        try:
+            with open(cumulative_path, "r", encoding="utf-8") as f:
+                cumulative = json.load(f)
+        except (OSError, ValueError):
+            cumulative = {}
+        acc = Metrics()
+        acc.merge(cumulative)
+        rolled = set(cumulative.get("rolled", []))
+        names = set(os.listdir(metrics_dir))
+        finished = []
+        for name in sorted(names):
+            if name in (own, CUMULATIVE_NAME) or name in rolled or not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(metrics_dir, name), "r", encoding="utf-8") as f:
+                    snapshot = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if _finished(name, snapshot):
+                acc.merge(snapshot)
+                finished.append(name)
+            else:
+                total.merge(snapshot)
+        rolled = (rolled & names) | set(finished)
+        if finished or rolled != set(cumulative.get("rolled", [])):
+            _write_json(cumulative_path, dict(acc.snapshot(), rolled=sorted(rolled)))
+        for name in rolled:
+            try:
+                os.remove(os.path.join(metrics_dir, name))
+            except OSError:
+                pass
+    total.merge(acc.snapshot())
+    return total
+
+
+def render_prometheus(metrics: Metrics) -> str:
+    """Formato de texto do Prometheus (exposition format 0.0.4)."""
+    snapshot = metrics.snapshot()
+    lines = [
+        "# HELP pdf_stage_seconds_total Tempo gasto por etapa do processamento.",
+        "# TYPE pdf_stage_seconds_total counter",
+    ]
+    for stage, seconds in sorted(snapshot["stage_seconds"].items()):
+        lines.append(f'pdf_stage_seconds_total{{stage="{stage}"}} {seconds}')
+    lines += [
+        "# HELP pdf_stage_calls_total Nº de medições por etapa.",
+        "# TYPE pdf_stage_calls_total counter",
+    ]
+    for stage, calls in sorted(snapshot["stage_calls"].items()):
+        lines.append(f'pdf_stage_calls_total{{stage="{stage}"}} {calls}')
+    for name, value in sorted(snapshot["counters"].items()):
+        lines.append(f"# TYPE pdf_{name}_total counter")
+        lines.append(f"pdf_{name}_total {value}")
+    return "\n".join(lines) + "\n"
+
+
+def write_prometheus(path: str, metrics_dir: Optional[str] = None) -> None:
+    """Grava collect() em formato Prometheus em path (ex.: textfile collector do node_exporter)."""
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(render_prometheus(collect(metrics_dir)))
+    os.replace(tmp, path)
@@ -0,0 +1,199 @@
+"""
+Índice persistente dos nºs de processo de todos os jobs: uma base SQLite em
+outputs/.numbers.sqlite3 que cada job atualiza ao terminar, com o nº
+normalizado, jobid, intervalo de páginas, ficheiro, tamanho e data. A
+pesquisa usa o índice B-tree sobre o nº (O(log n) no nº de páginas
+indexadas), em vez de percorrer os manifestos de outputs/<jobid>.
+
+Vários processos (workers da fila, API) podem escrever em simultâneo: a base
+está em modo WAL e as escritas de um job são uma só transação.
+
+    python -m app.number_index [--outputs outputs] [--rebuild] [NUM ...]
+"""
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import time
+from contextlib import closing
+from typing import List, Optional
+
+try:
+    from .process_pdf import load_manifest
+    from .utils import normalize
+except ImportError:  # executado a partir de app/
+    from process_pdf import load_manifest
+    from utils import normalize
+
+OUTPUTS_ROOT = "outputs"
+NUMBER_INDEX_NAME = ".numbers.sqlite3"
+# Espera máxima (s) por um lock de escrita de outro processo
+_BUSY_TIMEOUT = 30.0
+_NO_NUMBER_PREFIX = "SEM_PROCESSO_"
+# jobs.JOB_FILE / jobs.STATUS_DONE (jobs importa este módulo)
+_JOB_FILE = "job.json"
+_STATUS_DONE = "done"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS numbers (
+    number TEXT NOT NULL,       -- nº normalizado (number_key)
+    name TEXT NOT NULL,         -- nº como aparece no manifesto
+    jobid TEXT NOT NULL,
+    file TEXT NOT NULL,         -- PDF em outputs/<jobid>
+    first_page INTEGER NOT NULL,
+    last_page INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    source TEXT,                -- documento de origem (lotes)
+    indexed_at REAL NOT NULL,
+    PRIMARY KEY (jobid, file)
+);
+CREATE INDEX IF NOT EXISTS numbers_by_number ON numbers (number, indexed_at);
+"""
+
+
+def number_key(number: str) -> str:
+    """Forma normalizada do nº usada no índice (sem espaços, maiúsculas)."""
+    return normalize(number).upper()
+
+
+def index_path(outputs_root: str = OUTPUTS_ROOT) -> str:
+    return os.path.join(outputs_root, NUMBER_INDEX_NAME)
+
+
+def _connect(outputs_root: str) -> sqlite3.Connection:
+    os.makedirs(outputs_root, exist_ok=True)
+    conn = sqlite3.connect(index_path(outputs_root), timeout=_BUSY_TIMEOUT)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+def _rows(jobid: str, manifest: dict, indexed_at: float) -> List[tuple]:
+    rows = []
+    for entry in manifest.get("files", []):
+        if entry["name"].startswith(_NO_NUMBER_PREFIX) or not entry.get("pages"):
+            continue
+        rows.append((
+            number_key(entry["name"]),
+            entry["name"],
+            jobid,
+            entry["file"],
+            entry["pages"][0],
+            entry["pages"][1],
+            entry["size"],
+            entry.get("source"),
+            indexed_at,
+        ))
+    return rows
+
+
+def index_job(jobid: str, outputs_root: str = OUTPUTS_ROOT, indexed_at: Optional[float] = None) -> int:
+    """
+    (Re)indexa os PDFs de um job concluído a partir do seu manifesto;
+    devolve o nº de entradas. Jobs sem manifesto não são indexados.
+    """
+    manifest = load_manifest(os.path.join(outputs_root, jobid))
+    if manifest is None:
+        return 0
+    rows = _rows(jobid, manifest, indexed_at or time.time())
+    with closing(_connect(outputs_root)) as conn, conn:
+        conn.execute("DELETE FROM numbers WHERE jobid = ?", (jobid,))
+        conn.executemany("INSERT INTO numbers VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+    return len(rows)
+
+
+def remove_job(jobid: str, outputs_root: str = OUTPUTS_ROOT) -> None:
+    """Retira do índice as entradas de um job (ex.: job apagado)."""
+    if not os.path.exists(index_path(outputs_root)):
+        return
+    with closing(_connect(outputs_root)) as conn, conn:
+        conn.execute("DELETE FROM numbers WHERE jobid = ?", (jobid,))
+
+
+def lookup(number: str, outputs_root: str = OUTPUTS_ROOT, prefix: bool = False, limit: int = 100) -> List[dict]:
+    """
+    PDFs com o nº de processo dado (do mais recente para o mais antigo):
+    [{"number", "name", "jobid", "file", "path", "pages": [primeira, última],
+      "size", "source", "indexed_at"}]. prefix: todos os nºs que começam por
+    number (também pelo índice, como intervalo).
+    """
+    key = number_key(number)
+    if not key or not os.path.exists(index_path(outputs_root)):
+        return []
+    if prefix:
+        # [key, key + U+10FFFF): intervalo de nºs com este prefixo
+        where, params = "number >= ? AND number < ?", (key, key + "\U0010ffff")
+    else:
+        where, params = "number = ?", (key,)
+    with closing(_connect(outputs_root)) as conn:
+        rows = conn.execute(
+            f"SELECT * FROM numbers WHERE {where} ORDER BY indexed_at DESC LIMIT ?", (*params, limit)
+        ).fetchall()
+    return [
+        {
+            "number": row["number"],
+            "name": row["name"],
+            "jobid": row["jobid"],
+            "file": row["file"],
+            "path": os.path.join(outputs_root, row["jobid"], row["file"]),
+            "pages": [row["first_page"], row["last_page"]],
+            "size": row["size"],
+            "source": row["source"],
+            "indexed_at": row["indexed_at"],
+        }
+        for row in rows
+    ]
+
+
+def rebuild_index(outputs_root: str = OUTPUTS_ROOT) -> int:
+    """
+    Indexa todos os jobs concluídos em outputs_root (ex.: jobs anteriores ao
+    índice) e retira os que já não existem; devolve o nº de jobs indexados.
+    A data é a de fim do job.
+    """
+    jobs = 0
+    done = set()
+    for jobid in sorted(os.listdir(outputs_root)):
+        try:
+            with open(os.path.join(outputs_root, jobid, _JOB_FILE), "r", encoding="utf-8") as f:
+                record = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if record.get("status") != _STATUS_DONE:
+            continue
+        done.add(jobid)
+        if index_job(jobid, outputs_root, record.get("finished_at")):
+            jobs += 1
+    with closing(_connect(outputs_root)) as conn, conn:
+        indexed = [row["jobid"] for row in conn.execute("SELECT DISTINCT jobid FROM numbers")]
+        conn.executemany("DELETE FROM numbers WHERE jobid = ?", [(jobid,) for jobid in indexed if jobid not in done])
+    return jobs
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m app.number_index", description="Índice dos nºs de processo de todos os jobs."
+    )
+    parser.add_argument("numbers", nargs="*", help="nºs de processo a pesquisar")
+    parser.add_argument("--outputs", default=OUTPUTS_ROOT)
+    parser.add_argument("--prefix", action="store_true", help="pesquisa por prefixo")
+    parser.add_argument("--rebuild", action="store_true", help="indexa todos os jobs concluídos")
+    args = parser.parse_args(argv)
+
+    if args.rebuild:
+        print(f"{rebuild_index(args.outputs)} jobs indexados.")
+    missing = 0
+    for number in args.numbers:
+        matches = lookup(number, args.outputs, prefix=args.prefix)
+        missing += not matches
+        for match in matches:
+            print(f"{match['name']}\t{match['path']}\tpáginas {match['pages'][0]}-{match['pages'][1]}")
+        if not matches:
+            print(f"{number}: não encontrado", file=sys.stderr)
+    return 1 if missing else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,203 @@
+import hashlib
+import os
+import threading
+from typing import Optional
+
+from pypdf import PageObject
+from pypdf.generic import ArrayObject, DictionaryObject, IndirectObject, StreamObject
+
+# Cache persistente do OCR, partilhada entre jobs (e entre uploads repetidos);
+# vazio desliga. A UI, a API e a CLI ligam-na em <resultados>/.ocr_cache
+# (process_pdf.configure_storage); quem chama process_pdf diretamente não
+OCR_CACHE_DIR = os.getenv("OCR_CACHE_DIR", "")
+OCR_CACHE_MAX_MB = int(os.getenv("OCR_CACHE_MAX_MB", "256"))
+
+# ao exceder o limite, a limpeza desce até esta fração do máximo
+_EVICT_TARGET = 0.9
+
+
+def page_fingerprint(page: PageObject) -> str:
+    """
+    Hash do conteúdo da página: content stream, imagens/forms referenciados
+    (XObjects), fontes (dicionários e programas embutidos: o mesmo content
+    stream com outro subset de fonte desenha outro texto), caixa e rotação.
+    Não exige rasterizar a página.
+    """
+    h = hashlib.sha256()
+    h.update(repr([float(v) for v in page.mediabox]).encode())
+    h.update(str(page.get("/Rotate", 0)).encode())
+    try:
+        contents = page.get_contents()
+        if contents is not None:
+            h.update(contents.get_data())
+    except Exception:
+        pass
+    _hash_resources(page.get("/Resources"), h, depth=0)
+    return h.hexdigest()
+
+
+def _hash_fonts(resources, h) -> None:
+    fonts = resources.get("/Font")
+    if fonts is None:
+        return
+    fonts = fonts.get_object()
+    for name in sorted(fonts.keys()):
+        h.update(str(name).encode())
+        _hash_object(fonts.raw_get(name), h, set())
+
+
+def _hash_object(obj, h, visiting: set) -> None:
+    """Hash estrutural de um objeto PDF (dicionários, arrays, streams codificados), sem /Parent."""
+    if isinstance(obj, IndirectObject):
+        if obj.idnum in visiting:
+            h.update(b"cycle")
+            return
+        visiting.add(obj.idnum)
+        _hash_object(obj.get_object(), h, visiting)
+        visiting.discard(obj.idnum)
+    elif isinstance(obj, DictionaryObject):
+        h.update(b"<<")
+        for key in sorted(obj.keys()):
+            if key not in ("/Length", "/Parent"):
+                h.update(key.encode())
+                _hash_object(obj.raw_get(key), h, visiting)
+        if isinstance(obj, StreamObject):
+            h.update(getattr(obj, "_data", b"") or b"")
+        h.update(b">>")
+    elif isinstance(obj, ArrayObject):
+        h.update(b"[")
+        for item in obj:
+            _hash_object(item, h, visiting)
+        h.update(b"]")
+    else:
+        h.update(repr(obj).encode())
+
+
+def _hash_resources(resources, h, depth: int) -> None:
+    if resources is None or depth > 3:
+        return
+    resources = resources.get_object()
+    _hash_fonts(resources, h)
+    xobjects = resources.get("/XObject")
+    if xobjects is None:
+        return
+    xobjects = xobjects.get_object()
+    for name in sorted(xobjects.keys()):
+        obj = xobjects[name].get_object()
+        h.update(str(name).encode())
+        try:
+            h.update(obj.get_data())
+        except Exception:
+            # filtros não suportados pelo pypdf: usa os bytes codificados
+            h.update(getattr(obj, "_data", b"") or b"")
+        if obj.get("/Subtype") == "/Form":
+            _hash_resources(obj.get("/Resources"), h, depth + 1)
+
+
+class OcrCache:
+    """
+    Cache em disco dos textos de OCR, endereçada pelo hash do conteúdo da
+    página + definições do OCR. Um ficheiro por entrada; o mtime serve de
+    "último acesso" para a remoção LRU quando se excede max_bytes.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int = OCR_CACHE_MAX_MB * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        self._bytes = sum(size for _, size, _ in self._entries())
+
+    @staticmethod
+    def key(page: PageObject, *settings) -> str:
+        """Chave da página para as definições de OCR dadas (língua, DPI, ...)."""
+        parts = ":".join(repr(v) for v in settings)
+        return hashlib.sha256(f"{page_fingerprint(page)}:{parts}".encode()).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.txt")
+
+    def get(self, key: str) -> Optional[str]:
+        """Texto em cache (ou None); um hit renova o último acesso."""
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                text = f.read()
+            os.utime(path)
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return text
+
+    def put(self, key: str, text: str) -> None:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(text)
+        size = os.path.getsize(tmp)
+        try:
+            replaced = os.path.getsize(path)  # entrada já existente (ex.: outro worker)
+        except OSError:
+            replaced = 0
+        os.replace(tmp, path)
+        with self._lock:
+            self._bytes += size - replaced
+            over = self._bytes > self.max_bytes
+        if over:
+            self.evict()
+
+    def evict(self) -> None:
+        """Remove as entradas menos usadas até ficar abaixo do limite."""
+        with self._lock:
+            entries = sorted(self._entries(), key=lambda e: e[2])
+            total = sum(size for _, size, _ in entries)
+            target = self.max_bytes * _EVICT_TARGET
+            for path, size, _ in entries:
+                if total <= target:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                total -= size
+            self._bytes = total
+
+    def _entries(self):
+        """(caminho, tamanho, mtime) de cada entrada em disco."""
+        for root, _dirs, files in os.walk(self.cache_dir):
+            for name in files:
+                if not name.endswith(".txt"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                yield path, st.st_size, st.st_mtime
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "bytes": self._bytes, "max_bytes": self.max_bytes}
+
+
+_default_cache: Optional[OcrCache] = None
+
+
+def configure(cache_dir: str) -> None:
+    """Muda OCR_CACHE_DIR neste processo (vazio desliga a cache partilhada)."""
+    global OCR_CACHE_DIR, _default_cache
+    if cache_dir != OCR_CACHE_DIR:
+        OCR_CACHE_DIR, _default_cache = cache_dir, None
+
+
+def default_ocr_cache() -> Optional[OcrCache]:
+    """Cache partilhada do processo (None se OCR_CACHE_DIR estiver vazio)."""
+    global _default_cache
+    if _default_cache is None and OCR_CACHE_DIR:
+        _default_cache = OcrCache(OCR_CACHE_DIR)
+    return _default_cache
@@ -0,0 +1,210 @@
+import hashlib
+import os
+import re
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+from pypdf import PageObject, PdfWriter
+from pypdf.generic import ArrayObject, DictionaryObject, IndirectObject, NameObject, StreamObject
+
+# Categorias de /Resources referenciadas por nome nos content streams
+_NAMED_RESOURCES = ("/Font", "/XObject", "/ExtGState", "/ColorSpace", "/Pattern", "/Shading", "/Properties")
+# Categorias pesadas onde vale a pena deduplicar cópias idênticas
+_DEDUP_RESOURCES = ("/Font", "/XObject")
+
+_NAME_RE = re.compile(rb"/([^\s/\[\]()<>{}%]+)")
+# Bytes de um objeto indireto num PDF além do próprio objeto
+_OBJECT_OVERHEAD = 40
+
+
+class ResourceDeduper:
+    """
+    Tabela de recursos (fontes, imagens) de um PDF de origem: cópias idênticas
+    com ids diferentes passam a apontar para o mesmo objeto, para que cada
+    PDF de saída só leve uma cópia. Os hashes ficam em memória por idnum,
+    pelo que cada objeto é lido uma única vez por job.
+    """
+
+    def __init__(self) -> None:
+        self._hashes: dict[int, bytes] = {}
+        self._by_hash: dict[bytes, IndirectObject] = {}
+        self._sizes: dict[int, int] = {}
+
+    def canonical(self, ref: IndirectObject) -> IndirectObject:
+        return self._by_hash.setdefault(self._digest(ref, set()), ref)
+
+    def _digest(self, obj, visiting: Set[int]) -> bytes:
+        if isinstance(obj, IndirectObject):
+            cached = self._hashes.get(obj.idnum)
+            if cached is not None:
+                return cached
+            if obj.idnum in visiting:
+                return b"cycle"
+            visiting.add(obj.idnum)
+            digest = self._digest(obj.get_object(), visiting)
+            visiting.discard(obj.idnum)
+            self._hashes[obj.idnum] = digest
+            return digest
+
+        h = hashlib.sha256()
+        if isinstance(obj, DictionaryObject):
+            h.update(b"<<")
+            for key in sorted(obj.keys()):
+                if key in ("/Length", "/Parent"):
+                    continue
+                h.update(key.encode())
+                h.update(self._digest(obj.raw_get(key), visiting))
+            if isinstance(obj, StreamObject):
+                h.update(getattr(obj, "_data", b"") or b"")
+        elif isinstance(obj, ArrayObject):
+            h.update(b"[")
+            for item in obj:
+                h.update(self._digest(item, visiting))
+        else:
+            h.update(repr(obj).encode())
+        return h.digest()
+
+    def object_size(self, ref: IndirectObject) -> int:
+        """Bytes do objeto quando escrito num PDF (memorizado por idnum)."""
+        size = self._sizes.get(ref.idnum)
+        if size is None:
+            size = self._sizes[ref.idnum] = _object_size(ref)
+        return size
+
+
+def _content_names(data: bytes) -> Set[str]:
+    return {"/" + m.decode("latin-1") for m in _NAME_RE.findall(data)}
+
+
+def strip_unused_resources(page: PageObject, deduper: Optional[ResourceDeduper] = None) -> None:
+    """
+    Substitui os /Resources da página por uma cópia só com os recursos que o
+    content stream usa (e com fontes/imagens duplicadas deduplicadas). Não
+    altera o dicionário original, que pode ser partilhado por outras páginas.
+    """
+    resources = page.get("/Resources")
+    contents = page.get_contents()
+    if resources is None or contents is None:
+        return
+    try:
+        used = _content_names(contents.get_data())
+    except Exception:
+        return
+
+    resources = resources.get_object()
+    # Forms sem /Resources próprios usam os da página
+    xobjects = resources.get("/XObject")
+    if xobjects is not None:
+        for name, ref in xobjects.get_object().items():
+            form = ref.get_object()
+            if name in used and form.get("/Subtype") == "/Form" and "/Resources" not in form:
+                try:
+                    used |= _content_names(form.get_data())
+                except Exception:
+                    return
+
+    stripped = DictionaryObject()
+    for key, value in resources.items():
+        if key not in _NAMED_RESOURCES:
+            stripped[NameObject(key)] = value
+            continue
+        entries = DictionaryObject()
+        for name in value.get_object().keys():
+            if name not in used:
+                continue
+            ref = value.get_object().raw_get(name)
+            if deduper is not None and key in _DEDUP_RESOURCES and isinstance(ref, IndirectObject):
+                ref = deduper.canonical(ref)
+            entries[NameObject(name)] = ref
+        if entries:
+            stripped[NameObject(key)] = entries
+    page[NameObject("/Resources")] = stripped
+
+
+def _reachable(roots: Iterable, seen: Dict[int, IndirectObject]) -> None:
+    """Acrescenta a seen os objetos indiretos alcançáveis a partir de roots (sem seguir /Parent)."""
+    stack = list(roots)
+    while stack:
+        obj = stack.pop()
+        if isinstance(obj, IndirectObject):
+            if obj.idnum in seen:
+                continue
+            seen[obj.idnum] = obj
+            obj = obj.get_object()
+        if isinstance(obj, DictionaryObject):
+            stack.extend(obj.raw_get(key) for key in obj.keys() if key != "/Parent")
+        elif isinstance(obj, ArrayObject):
+            stack.extend(obj)
+
+
+def _object_size(ref: IndirectObject) -> int:
+    stream = _CountingStream()
+    try:
+        ref.get_object().write_to_stream(stream)
+    except Exception:
+        return 0
+    # "n 0 obj\n", "\nendobj\n" e a entrada na tabela xref
+    return stream.size + _OBJECT_OVERHEAD
+
+
+class _CountingStream:
+    """Destino de escrita que só conta bytes (para medir o tamanho sem I/O)."""
+
+    def __init__(self) -> None:
+        self.size = 0
+
+    def write(self, data: bytes) -> int:
+        self.size += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.size
+
+
+def write_pages(
+    pages: Iterable[PageObject],
+    outfile: str,
+    optimize: bool = False,
+    deduper: Optional[ResourceDeduper] = None,
+) -> Tuple[int, int]:
+    """
+    Escreve as páginas num PDF. Devolve (bytes sem otimização, bytes escritos).
+
+    optimize: remove recursos não usados, deduplica fontes/imagens e comprime
+        (Flate) os content streams ainda não comprimidos. O tamanho "antes" é
+        calculado sem escrever a versão original: bytes escritos + objetos
+        que deixaram de ser referenciados (recursos removidos ou duplicados)
+        - objetos que passaram a sê-lo + redução dos content streams.
+    """
+    pages = list(pages)
+    if not optimize:
+        writer = PdfWriter()
+        for page in pages:
+            writer.add_page(page)
+        with open(outfile, "wb") as f:
+            writer.write(f)
+        size = os.path.getsize(outfile)
+        return size, size
+
+    if deduper is None:
+        deduper = ResourceDeduper()
+    original: Dict[int, IndirectObject] = {}
+    kept: Dict[int, IndirectObject] = {}
+    compressed = 0
+    writer = PdfWriter()
+    for page in pages:
+        _reachable([page.raw_get("/Resources")] if "/Resources" in page else [], original)
+        strip_unused_resources(page, deduper)
+        if "/Resources" in page:
+            _reachable([page.raw_get("/Resources")], kept)
+        out_page = writer.add_page(page)
+        contents = out_page.get_contents()
+        if contents is not None and "/Filter" not in contents:
+            size = len(contents.get_data())
+            out_page.compress_content_streams()
+            compressed += size - len(getattr(out_page["/Contents"].get_object(), "_data", b"") or b"")
+    with open(outfile, "wb") as f:
+        writer.write(f)
+    size = os.path.getsize(outfile)
+    removed = sum(deduper.object_size(ref) for idnum, ref in original.items() if idnum not in kept)
+    added = sum(deduper.object_size(ref) for idnum, ref in kept.items() if idnum not in original)
+    return size + removed - added + compressed, size
@@ -1,47 +1,493 @@
+import itertools
+import json
 import os
 import re
-from typing import Tuple, List
+import tempfile
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from contextlib import nullcontext
+from typing import Iterator, List, Optional, Tuple, Union
 from uuid import uuid4
 
 import pdfplumber
-from pypdf import PdfWriter, PdfReader
+from pdfminer.pdfpage import PDFPage
+from pdfminer.pdftypes import dict_value
+from pypdf import PageObject, PdfReader
+from pypdf.generic import IndirectObject, NameObject
 from pdf2image import convert_from_path
+from PIL import Image
 import pytesseract
 
-# Pattern amplo baseado no Processos_Submeter.py
-PROCESS_NUMBER_PATTERN = re.compile(
-    r"(\d{7}-\d{2}\.\d{4}\.\d\.\d{2}\.\d{4})|(\b\d{4,}([.\-/]\d{2,}){0,3}\b)"
-)
+try:
+    from .checkpoint import Journal
+    from .ocr_cache import OcrCache, configure as configure_ocr_cache, default_ocr_cache
+    from .pdf_output import ResourceDeduper, write_pages
+    from .preprocess import preprocess_image
+    from .job_zip import JobZipWriter
+    from . import metrics
+    from .text_layer import PAGE_EMPTY, PAGE_IMAGE, classify_page
+    from .utils import ProcessNumberMatch, find_process_number
+except ImportError:  # executado a partir de app/ (ex.: streamlit run)
+    from checkpoint import Journal
+    from ocr_cache import OcrCache, configure as configure_ocr_cache, default_ocr_cache
+    from pdf_output import ResourceDeduper, write_pages
+    from preprocess import preprocess_image
+    from job_zip import JobZipWriter
+    import metrics
+    from text_layer import PAGE_EMPTY, PAGE_IMAGE, classify_page
+    from utils import ProcessNumberMatch, find_process_number
 
+# Confiança mínima do nº encontrado pelo pypdf (extração rápida) para não
+# repetir a página no pdfplumber, e de um nível da escada de OCR para não
+# subir ao seguinte; 0.3 aceita qualquer nº (ver utils.CONFIDENCE)
+FAST_TEXT_MIN_CONFIDENCE = float(os.getenv("FAST_TEXT_MIN_CONFIDENCE", "0.8"))
 
-def extract_text_from_page(pdf_path: str, page_num: int) -> str:
-    """Extrai texto da página; faz OCR se necessário."""
-    try:
-        with pdfplumber.open(pdf_path) as pdf:
-            page = pdf.pages[page_num]
-            text = page.extract_text() or ""
-    except Exception:
-        text = ""
+# Nº de processos para o OCR das páginas sem texto (1 = serial, sem pool)
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", "1"))
+
+# Definições do OCR (fazem parte da chave da cache de OCR)
+OCR_LANG = "por"
+OCR_DPI = int(os.getenv("OCR_DPI", "200"))
+# Pré-processamento das páginas antes do Tesseract (binarização, correção da
+# inclinação, corte das margens; ver preprocess)
+OCR_PREPROCESS = os.getenv("OCR_PREPROCESS", "0") == "1"
+
+
+def _ocr_ladder(dpi: int) -> Tuple[Tuple[float, int], ...]:
+    return ((0.2, min(150, dpi)), (0.5, min(150, dpi)), (1.0, dpi))
+
+
+# Escada de OCR: (fração do topo da página a ler, DPI). Começa pela faixa do
+# cabeçalho em DPI baixo e só sobe de nível se não houver nº de processo
+# fiável (FAST_TEXT_MIN_CONFIDENCE);
+# o último nível (página inteira a OCR_DPI) equivale ao OCR original.
+OCR_LADDER: Tuple[Tuple[float, int], ...] = _ocr_ladder(OCR_DPI)
+
+
+def configure_ocr(dpi: int, preprocess: Optional[bool] = None) -> None:
+    """Muda o DPI do OCR (último nível da escada) e, se dado, o pré-processamento neste processo."""
+    global OCR_DPI, OCR_LADDER, OCR_PREPROCESS
+    OCR_DPI = dpi
+    OCR_LADDER = _ocr_ladder(dpi)
+    if preprocess is not None:
+        OCR_PREPROCESS = preprocess
+
+
+def configure_storage(root: str) -> None:
+    """
+    Liga a cache de OCR e os snapshots de métricas partilhados em
+    root/.ocr_cache e root/.metrics (OCR_CACHE_DIR e METRICS_DIR, se
+    definidos, prevalecem; vazios desligam). Chamado pelos pontos de entrada
+    (UI, API, workers, CLI); o process_pdf usado como biblioteca não cria
+    pastas no diretório atual. Os valores ficam no ambiente, para os
+    processos filhos (workers, pools) usarem as mesmas pastas.
+    """
+    configure_ocr_cache(os.environ.setdefault("OCR_CACHE_DIR", os.path.join(root, ".ocr_cache")))
+    metrics.configure(os.environ.setdefault("METRICS_DIR", os.path.join(root, ".metrics")))
+
+
+# Rasterização em lote: nº máx. de páginas contíguas por invocação do poppler
+# e nº de processos pdftoppm em paralelo dentro de cada lote
+RASTER_BATCH_PAGES = 16
+RASTER_THREADS = int(os.getenv("RASTER_THREADS", "2"))
+
+_RASTER_PAGE_RE = re.compile(r"-(\d+)\.\w+$")
+
+# Janela de páginas: a cada PAGE_WINDOW páginas a sessão descarta os objetos
+# já lidos do PDF (conteúdos, imagens), para a memória não crescer com o nº
+# de páginas do documento
+PAGE_WINDOW = int(os.getenv("PAGE_WINDOW", "64"))
+
+# Manifesto do job (ficheiros gerados, intervalos de páginas, estatísticas)
+MANIFEST_NAME = "manifest.json"
+# Diário append-only do job (páginas processadas e PDFs gravados), para
+# retomar uma execução interrompida (process_pdf_iter(resume=True))
+PAGE_JOURNAL_NAME = ".pages.jsonl"
+# Sufixo dos PDFs a meio da escrita (renomeados no fim)
+_PART_SUFFIX = ".part"
+_NO_NUMBER_PREFIX = "SEM_PROCESSO_PAG_"
+
+
+class PdfSession:
+    """
+    Sessão sobre um PDF: abre o ficheiro uma única vez em vez de o reabrir
+    por cada página. O pypdf lê do ficheiro à medida do necessário (não o
+    carrega todo para memória) e os objetos lidos (pypdf e pdfminer) são
+    descartados por janelas de PAGE_WINDOW páginas; o pdfplumber só é aberto
+    quando é preciso e a cache de layout de cada página é libertada logo após
+    a extração do texto. As páginas são criadas uma a uma (page), sem o
+    reader.pages do pypdf, que guarda um PageObject por cada página do
+    documento.
+    """
+
+    def __init__(self, pdf_path: str):
+        self.pdf_path = pdf_path
+        self._file = open(pdf_path, "rb")
+        self.reader = PdfReader(self._file)
+        self._plumber: Optional[pdfplumber.PDF] = None
+        # referências das páginas (None: ainda por ler; [] sem referências: usa reader.pages)
+        self._page_refs: Optional[List[IndirectObject]] = None
+        self._last_page: Tuple[int, Optional[PageObject]] = (-1, None)
+
+    def __len__(self) -> int:
+        refs = self._refs()
+        return len(refs) if refs else len(self.reader.pages)
+
+    def _refs(self) -> List[IndirectObject]:
+        """
+        Referências das páginas pela ordem do documento (folhas da árvore
+        /Pages), lidas uma vez; os nós lidos na travessia são descartados.
+        Vazia se alguma página não for um objeto indireto (PDF danificado):
+        aí usa-se o reader.pages do pypdf.
+        """
+        if self._page_refs is None:
+            refs: List[IndirectObject] = []
+            stack = [self.reader.trailer["/Root"].raw_get("/Pages")]
+            visited = set()
+            while stack:
+                ref = stack.pop()
+                if not isinstance(ref, IndirectObject) or ref.idnum in visited:
+                    refs = []
+                    break
+                visited.add(ref.idnum)
+                node = ref.get_object()
+                if not node:
+                    continue  # filho inválido em /Kids (ignorado, como no pypdf)
+                # sem /Type: é uma página se não tiver /Kids (como no pypdf)
+                if node.get("/Type", "/Pages" if "/Kids" in node else "/Page") == "/Pages":
+                    stack.extend(reversed(node.raw_get("/Kids").get_object()))
+                else:
+                    refs.append(ref)
+                    # a página só é lida aqui para saber o tipo
+                    self.reader.resolved_objects.pop((ref.generation, ref.idnum), None)
+            self._page_refs = refs
+            self.reader.resolved_objects.clear()
+        return self._page_refs
+
+    def page(self, page_num: int) -> PageObject:
+        """
+        Página page_num (pypdf), com os atributos herdados dos nós /Pages (o
+        mais próximo prevalece), como em reader.pages, mas sem guardar as
+        páginas do documento todas.
+        """
+        if self._last_page[0] == page_num:
+            return self._last_page[1]
+        refs = self._refs()
+        if not refs:
+            return self.reader.pages[page_num]
+        ref = refs[page_num]
+        page = PageObject(self.reader, ref)
+        page.update(ref.get_object())
+        node, visited = page.raw_get("/Parent") if "/Parent" in page else None, set()
+        while isinstance(node, IndirectObject) and node.idnum not in visited:
+            visited.add(node.idnum)
+            parent = node.get_object()
+            for key in ("/Resources", "/MediaBox", "/CropBox", "/Rotate"):
+                if key not in page and key in parent:
+                    page[NameObject(key)] = parent.raw_get(key)
+            node = parent.raw_get("/Parent") if "/Parent" in parent else None
+        self._last_page = (page_num, page)
+        return page
+
+    def __enter__(self) -> "PdfSession":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        if self._plumber is not None:
+            # não usa PDF.close(): criaria as páginas todas só para as fechar
+            # (as de _plumber_page já foram fechadas a seguir à extração)
+            self._plumber.flush_cache()
+            self._plumber.stream.close()
+            self._plumber = None
+        self._file.close()
+
+    def iter_pages(self, start: int = 0) -> Iterator[Tuple[int, PageObject]]:
+        """Itera (índice, página pypdf) pela ordem do documento, por janelas, a partir de start."""
+        for i in range(start, len(self)):
+            if i > start and i % PAGE_WINDOW == 0:
+                self.release_objects()
+            yield i, self.page(i)
+
+    def release_objects(self) -> None:
+        """
+        Descarta as caches de objetos do pypdf e do pdfminer (voltam a ser
+        lidos do ficheiro se necessário). As páginas ainda em uso mantêm os
+        objetos que referenciam.
+        """
+        self.reader.resolved_objects.clear()
+        self._last_page = (-1, None)
+        if self._plumber is not None:
+            self._plumber.doc._cached_objs.clear()
+
+    def layer_text(self, page_num: int) -> Tuple[str, dict]:
+        """
+        Texto da camada de texto, sem OCR, e info {"page_kind", "text_engine",
+        "timings"} (segundos por etapa, ver metrics).
+        Classifica a página pelo content stream (text_layer.classify_page):
+        páginas só com imagens (ou vazias) não passam pela extração; as
+        restantes tentam primeiro o pypdf e só recorrem ao pdfplumber (análise
+        de layout, bem mais lenta) se o pypdf não der um nº de processo fiável.
+        """
+        timings: dict[str, float] = {}
+        with metrics.timed(metrics.STAGE_CLASSIFY, timings):
+            kind = classify_page(self.page(page_num))
+        if kind in (PAGE_IMAGE, PAGE_EMPTY):
+            return "", {"page_kind": kind, "text_engine": None, "timings": timings}
+        with metrics.timed(metrics.STAGE_TEXT_PYPDF, timings):
+            text = self.extract_text_fast(page_num)
+            match = find_process_number(text)
+        if match is not None and match.confidence >= FAST_TEXT_MIN_CONFIDENCE:
+            return text, {"page_kind": kind, "text_engine": "pypdf", "timings": timings}
+        with metrics.timed(metrics.STAGE_TEXT_PDFPLUMBER, timings):
+            text = self.extract_text(page_num)
+        return text, {"page_kind": kind, "text_engine": "pdfplumber", "timings": timings}
 
-    if text.strip():
+    def extract_text_fast(self, page_num: int) -> str:
+        """Texto da camada de texto pelo pypdf (sem análise de layout)."""
+        try:
+            return self.page(page_num).extract_text() or ""
+        except Exception:
+            return ""
+
+    def extract_text(self, page_num: int) -> str:
+        """Texto da camada de texto (pdfplumber), sem OCR."""
+        try:
+            page = self._plumber_page(page_num)
+        except Exception:
+            return ""
+        try:
+            return page.extract_text() or ""
+        except Exception:
+            return ""
+        finally:
+            # descarta objetos/layout em cache desta página (o close() do
+            # pdfplumber 0.11 não limpa a cache do textmap, que guarda os chars)
+            page.close()
+            cache_clear = getattr(page.get_textmap, "cache_clear", None)
+            if cache_clear is not None:
+                cache_clear()
+
+
+    def _plumber_page(self, page_num: int) -> pdfplumber.page.Page:
+        """
+        Página pdfplumber criada só para page_num, a partir do mesmo objeto
+        que o pypdf já localizou: PDF.pages percorre e guarda (até ao fim do
+        job) as páginas todas do documento no primeiro acesso, com custo
+        proporcional ao nº de páginas.
+        """
+        if self._plumber is None:
+            self._plumber = pdfplumber.open(self.pdf_path)
+        ref = self.page(page_num).indirect_reference
+        if ref is None:
+            return self._plumber.pages[page_num]
+        doc = self._plumber.doc
+        attrs = dict(dict_value(doc.getobj(ref.idnum)))
+        # atributos herdados dos nós /Pages (o mais próximo prevalece)
+        node, visited = attrs.get("Parent"), set()
+        while node is not None and getattr(node, "objid", None) not in visited:
+            visited.add(getattr(node, "objid", None))
+            parent = dict_value(node)
+            for key in PDFPage.INHERITABLE_ATTRS:
+                if key not in attrs and key in parent:
+                    attrs[key] = parent[key]
+            node = parent.get("Parent")
+        return pdfplumber.page.Page(self._plumber, PDFPage(doc, ref.idnum, attrs, None), page_number=page_num + 1)
+
+
+def extract_text_from_page(
+    pdf_path: str,
+    page_num: int,
+    session: Optional[PdfSession] = None,
+    ocr_cache: Optional[OcrCache] = None,
+) -> str:
+    """Extrai texto da página; faz OCR se necessário (consultando a cache)."""
+    if session is None:
+        with PdfSession(pdf_path) as own_session:
+            return extract_text_from_page(pdf_path, page_num, own_session, ocr_cache)
+
+    text, _info = session.layer_text(page_num)
+    if text.strip() and not _text_layer_rejected(text):
         return text
 
-    # Fallback - OCR (usa pdf2image + tesseract)
-    images = convert_from_path(pdf_path, first_page=page_num + 1, last_page=page_num + 1)
-    if images:
-        return pytesseract.image_to_string(images[0], lang="por")
-    return ""
+    key, cached = _ocr_cache_lookup(session, page_num, ocr_cache)
+    if cached is not None:
+        ocr_text = cached
+    else:
+        try:
+            ocr_text = ocr_page(pdf_path, page_num)
+        except Exception:
+            if not text.strip():
+                raise
+            return text  # OCR de recurso falhou: fica a camada de texto
+        if key is not None:
+            ocr_cache.put(key, ocr_text)
+    return ocr_text if _ocr_improves(ocr_text, text) else text
+
+
+def _text_layer_rejected(text: str) -> bool:
+    """
+    True se a camada de texto só tem nºs CNJ com dígitos verificadores
+    inválidos (e nenhum outro candidato estrito): a página vai para OCR.
+    """
+    rejected: List[ProcessNumberMatch] = []
+    match = find_process_number(text, rejected)
+    return bool(rejected) and (match is None or match.kind == "loose")
+
+
+def _ocr_improves(ocr_text: str, text: str) -> bool:
+    """True se o OCR deve substituir a camada de texto (vazia ou com um nº menos fiável)."""
+    if not text.strip():
+        return True
+    ocr_match, text_match = find_process_number(ocr_text), find_process_number(text)
+    return text_match is None or (ocr_match is not None and ocr_match.confidence > text_match.confidence)
+
+
+def _ocr_cache_lookup(
+    session: PdfSession, page_num: int, ocr_cache: Optional[OcrCache], timings: Optional[dict] = None
+) -> Tuple[Optional[str], Optional[str]]:
+    """(chave, texto em cache) da página; (None, None) sem cache."""
+    if ocr_cache is None:
+        return None, None
+    with metrics.timed(metrics.STAGE_OCR_CACHE, timings):
+        settings = (OCR_LANG, OCR_LADDER) + (("preprocess",) if OCR_PREPROCESS else ())
+        key = ocr_cache.key(session.page(page_num), *settings)
+        return key, ocr_cache.get(key)
+
+
+def ocr_page(pdf_path: str, page_num: int) -> str:
+    """Fallback - OCR de uma página (usa pdf2image + tesseract)."""
+    return ocr_with_ladder(pdf_path, page_num)[0]
+
+
+def ocr_with_ladder(
+    pdf_path: str, page_num: int, base_image: Optional[Image.Image] = None, timings: Optional[dict] = None
+) -> Tuple[str, int]:
+    """
+    OCR por níveis (OCR_LADDER): pára no primeiro nível em que encontra um
+    nº com confiança >= FAST_TEXT_MIN_CONFIDENCE (ex.: uma data no cabeçalho
+    é um nº "amplo" e não pára a escada). Sem nº fiável sobe até ao último
+    nível e fica com o texto do nível com o melhor nº (em empate, o mais
+    alto). Devolve (texto, nível que respondeu, 1-based; 0 se nenhum nível
+    encontrou nº, com o texto do último).
+
+    base_image: página já rasterizada ao DPI do primeiro nível (opcional).
+    timings: se dado, recebe os segundos de rasterização, pré-processamento
+        e OCR.
+    """
+    # imagem de cada DPI, já pré-processada (uma vez por DPI)
+    rendered: dict[int, Image.Image] = {}
+    if base_image is not None:
+        rendered[OCR_LADDER[0][1]] = _prepare_image(base_image, timings)
+
+    text = ""
+    best: Optional[Tuple[float, str, int]] = None  # (confiança, texto, nível)
+    for level, (band, dpi) in enumerate(OCR_LADDER, start=1):
+        image = rendered.get(dpi)
+        if image is None:
+            with metrics.timed(metrics.STAGE_RASTERIZE, timings):
+                images = convert_from_path(
+                    pdf_path, dpi=dpi, first_page=page_num + 1, last_page=page_num + 1, grayscale=True
+                )
+            if not images:
+                break
+            image = rendered[dpi] = _prepare_image(images[0], timings)
+        if band < 1:
+            image = image.crop((0, 0, image.width, max(1, int(image.height * band))))
+        with metrics.timed(metrics.STAGE_OCR, timings):
+            text = pytesseract.image_to_string(image, lang=OCR_LANG)
+        match = find_process_number(text)
+        if match is None:
+            continue
+        if match.confidence >= FAST_TEXT_MIN_CONFIDENCE:
+            return text, level
+        if best is None or match.confidence >= best[0]:
+            best = (match.confidence, text, level)
+    if best is not None:
+        return best[1], best[2]
+    return text, 0
+
+
+def _prepare_image(image: Image.Image, timings: Optional[dict] = None) -> Image.Image:
+    """Imagem a enviar ao Tesseract: pré-processada se OCR_PREPROCESS."""
+    if not OCR_PREPROCESS:
+        return image
+    with metrics.timed(metrics.STAGE_PREPROCESS, timings):
+        return preprocess_image(image)
+
+
+def rasterize_pages(
+    pdf_path: str, first: int, last: int, output_folder: str, dpi: Optional[int] = None
+) -> dict[int, str]:
+    """
+    Rasteriza as páginas first..last (índices 0-based, inclusive) numa só
+    invocação do poppler, em tons de cinzento, para ficheiros em
+    output_folder. Devolve {índice: caminho da imagem}.
+    dpi: por omissão o do primeiro nível da escada de OCR.
+    """
+    if dpi is None:
+        dpi = OCR_LADDER[0][1]
+    paths = convert_from_path(
+        pdf_path,
+        dpi=dpi,
+        first_page=first + 1,
+        last_page=last + 1,
+        grayscale=True,
+        thread_count=RASTER_THREADS,
+        output_folder=output_folder,
+        paths_only=True,
+    )
+    images: dict[int, str] = {}
+    for path in paths:
+        m = _RASTER_PAGE_RE.search(path)
+        if m:
+            images[int(m.group(1)) - 1] = path
+    return images
+
+
+def ocr_image_file(image_path: str, pdf_path: str, page_num: int) -> Tuple[str, int, dict]:
+    """
+    OCR (por níveis) de uma página já rasterizada em disco; apaga a imagem no
+    fim. Devolve (texto, nível, segundos por etapa) - corre noutro processo,
+    por isso os tempos voltam com o resultado.
+    """
+    timings: dict[str, float] = {}
+    try:
+        with Image.open(image_path) as image:
+            image.load()
+        text, level = ocr_with_ladder(pdf_path, page_num, base_image=image, timings=timings)
+        return text, level, timings
+    finally:
+        try:
+            os.remove(image_path)
+        except OSError:
+            pass
+
+
+class _InlineExecutor:
+    """Executor síncrono (ocr_workers <= 1): corre as tarefas no próprio processo."""
+
+    def __enter__(self) -> "_InlineExecutor":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        pass
+
+    def submit(self, fn, *args) -> Future:
+        future: Future = Future()
+        try:
+            future.set_result(fn(*args))
+        except Exception as e:
+            future.set_exception(e)
+        return future
 
 
 def extract_process_number(text: str) -> str | None:
-    """Extrai o número do processo do texto (primeira ocorrência válida)."""
-    if not text:
-        return None
-    match = PROCESS_NUMBER_PATTERN.search(text)
-    if not match:
-        return None
-    # primeira group não-vazia (ou fallback para o match completo)
-    return next((g for g in match.groups() if g), match.group(0))
+    """Extrai o número do processo do texto (melhor candidato, ver utils.find_process_number)."""
+    match = find_process_number(text)
+    return match.value if match else None
 
 
 def sanitize_filename(name: str) -> str:
@@ -49,41 +495,469 @@ def sanitize_filename(name: str) -> str:
     return re.sub(r"[^a-zA-Z0-9_.-]", "_", name)
 
 
-def process_pdf(input_pdf_path: str, outputs_dir: str) -> List[Tuple[str, str, int]]:
+def unique_fs_name(base_fs_name: str, seen: dict[str, int]) -> str:
+    """Garante unicidade: se o nome já foi usado (em seen), incrementa sufixo."""
+    c = seen.get(base_fs_name, 0)
+    seen[base_fs_name] = c + 1
+    return f"{base_fs_name}_{c+1}" if c > 0 else base_fs_name
+
+
+def iter_page_texts(
+    session: PdfSession, ocr_workers: int = 1, ocr_cache: Optional[OcrCache] = None, start: int = 0
+) -> Iterator[Tuple[int, PageObject, str, dict]]:
+    """
+    Itera (índice, página, texto, info) pela ordem do documento, a partir da
+    página (índice) start; info indica
+    a origem do texto ("text", "ocr" ou "ocr_cache"), o nível da escada de
+    OCR que respondeu e a classificação da página (PdfSession.layer_text).
+
+    As páginas com camada de texto seguem o caminho rápido (exceto se só
+    tiverem nºs CNJ inválidos: info["escalated"]); as restantes são
+    agrupadas em intervalos contíguos (até RASTER_BATCH_PAGES), rasterizadas
+    para disco com uma invocação do poppler por intervalo e enviadas uma a
+    uma para o OCR - num pool de processos se ocr_workers > 1. Os resultados
+    são devolvidos na ordem original das páginas; o nº de páginas em espera é
+    limitado, para que as imagens não se acumulem em disco/memória.
+    """
+    executor = ProcessPoolExecutor(max_workers=ocr_workers) if ocr_workers > 1 else _InlineExecutor()
+    max_pending = RASTER_BATCH_PAGES + 2 * ocr_workers
+
+    with executor, tempfile.TemporaryDirectory(prefix="raster_") as raster_dir:
+        # (índice, página, texto ou future do OCR, chave da cache, origem,
+        #  texto e info da camada de texto)
+        pending: deque[Tuple[int, PageObject, Union[str, Future], Optional[str], str, str, dict]] = deque()
+        run: List[Tuple[int, PageObject, Optional[str], str, dict]] = []
+
+        def flush_run() -> None:
+            raster_timings: dict[str, float] = {}
+            try:
+                with metrics.timed(metrics.STAGE_RASTERIZE, raster_timings):
+                    images = rasterize_pages(session.pdf_path, run[0][0], run[-1][0], raster_dir)
+            except Exception:
+                if not all(layer_text.strip() for _, _, _, layer_text, _ in run):
+                    raise
+                images = {}  # só páginas com camada de texto: OCR de recurso falhou, ficam com ela
+            # o lote é rasterizado de uma vez: o tempo é repartido pelas páginas
+            raster_share = raster_timings[metrics.STAGE_RASTERIZE] / len(run)
+            for i, page, key, layer_text, layer_info in run:
+                layer_info["timings"][metrics.STAGE_RASTERIZE] = raster_share
+                path = images.get(i)
+                if path:
+                    future = executor.submit(ocr_image_file, path, session.pdf_path, i)
+                    pending.append((i, page, future, key, "ocr", layer_text, layer_info))
+                elif layer_text.strip():
+                    pending.append((i, page, layer_text, None, "text", layer_text, layer_info))
+                else:
+                    pending.append((i, page, "", key, "ocr", layer_text, layer_info))
+            run.clear()
+
+        def ready() -> bool:
+            return bool(pending) and (not isinstance(pending[0][2], Future) or pending[0][2].done())
+
+        def pop() -> Tuple[int, PageObject, str, dict]:
+            j, pg, t, key, source, layer_text, layer_info = pending.popleft()
+            level = None
+            if isinstance(t, Future):
+                try:
+                    t, level, ocr_timings = t.result()
+                    for stage, seconds in ocr_timings.items():
+                        layer_info["timings"][stage] = layer_info["timings"].get(stage, 0.0) + seconds
+                except Exception:
+                    if not layer_text.strip():
+                        raise
+                    # OCR de recurso falhou: fica a camada de texto
+                    t, key, source = layer_text, None, "text"
+            if key is not None:
+                ocr_cache.put(key, t)
+            info = {
+                "source": source,
+                "ocr_level": level,
+                "escalated": source != "text" and bool(layer_text.strip()),
+                **layer_info,
+            }
+            if info["escalated"]:
+                if _ocr_improves(t, layer_text):
+                    # nºs rejeitados na camada de texto, que o OCR substituiu
+                    rejected: List[ProcessNumberMatch] = []
+                    find_process_number(layer_text, rejected)
+                    info["text_layer_rejected"] = [r.value for r in rejected]
+                else:
+                    t, info["source"] = layer_text, "text"
+            return j, pg, t, info
+
+        for i, page in session.iter_pages(start):
+            text, layer_info = session.layer_text(i)
+            needs_ocr = not text.strip() or _text_layer_rejected(text)
+            key, cached = (
+                _ocr_cache_lookup(session, i, ocr_cache, layer_info["timings"]) if needs_ocr else (None, None)
+            )
+            if needs_ocr and cached is None:
+                run.append((i, page, key, text, layer_info))
+                if len(run) >= RASTER_BATCH_PAGES:
+                    flush_run()
+            else:
+                if run:
+                    flush_run()
+                if cached is not None:
+                    pending.append((i, page, cached, None, "ocr_cache", text, layer_info))
+                else:
+                    pending.append((i, page, text, None, "text", text, layer_info))
+
+            # liberta já o que está resolvido à cabeça da fila
+            while ready() or len(pending) > max_pending:
+                yield pop()
+
+        if run:
+            flush_run()
+        while pending:
+            yield pop()
+
+
+def process_pdf(
+    input_pdf_path: str,
+    outputs_dir: str,
+    ocr_workers: Optional[int] = None,
+    ocr_cache: Optional[OcrCache] = None,
+    page_stats: Optional[List[dict]] = None,
+    group_pages: bool = False,
+    inherit_number: bool = False,
+    optimize_output: bool = False,
+) -> List[Tuple[str, str, int]]:
     """
     Divide o PDF em páginas, tenta extrair nº de processo (ou fallback),
     salva cada página como PDF, retorna:
         [(nome_logico, caminho_ficheiro, tamanho_bytes), ...]
+
+    ocr_workers: nº de processos para o OCR (por omissão OCR_WORKERS).
+    ocr_cache: cache de OCR (por omissão a cache partilhada em OCR_CACHE_DIR).
+    page_stats: se dada, recebe um dict por página (origem do texto, nível
+        da escada de OCR que respondeu).
+    group_pages: junta páginas consecutivas com o mesmo nº num só PDF.
+    inherit_number: páginas sem nº herdam o nº da página anterior.
+    optimize_output: remove recursos não usados, deduplica fontes/imagens e
+        comprime os PDFs de saída (ver pdf_output.write_pages).
     """
-    reader = PdfReader(input_pdf_path)
-    process_numbers_seen: dict[str, int] = {}
     page_files: List[Tuple[str, str, int]] = []
+    events = process_pdf_iter(
+        input_pdf_path,
+        outputs_dir,
+        ocr_workers,
+        ocr_cache,
+        group_pages=group_pages,
+        inherit_number=inherit_number,
+        optimize_output=optimize_output,
+    )
+    for event in events:
+        if event["event"] == "file":
+            page_files.append(event["result"])
+        elif page_stats is not None:
+            page_stats.append(event["stats"])
+    return page_files
 
-    for i, page in enumerate(reader.pages):
-        text = extract_text_from_page(input_pdf_path, i)
-        nproc = extract_process_number(text)
 
-        if nproc:
-            logical_name = nproc
-            base_fs_name = sanitize_filename(nproc)
+def process_pdf_iter(
+    input_pdf_path: str,
+    outputs_dir: str,
+    ocr_workers: Optional[int] = None,
+    ocr_cache: Optional[OcrCache] = None,
+    group_pages: bool = False,
+    inherit_number: bool = False,
+    optimize_output: bool = False,
+    build_zip: bool = False,
+    resume: bool = False,
+) -> Iterator[dict]:
+    """
+    Versão em streaming de process_pdf. Produz dois tipos de evento:
+        {"event": "page", "page": n, "total": N, "stats": {...}}
+            - progresso, uma vez por página processada;
+        {"event": "file", "result": (nome_logico, caminho, tamanho), "pages": [primeira, última],
+         "bytes_before": n, "seconds": s}
+            - assim que um PDF de saída é escrito em disco (bytes_before é o
+              tamanho que teria sem optimize_output, calculado sem o escrever -
+              ver pdf_output.write_pages; seconds, o tempo da escrita).
+    No fim grava o manifesto do job (MANIFEST_NAME) em outputs_dir, com os
+    tempos por etapa e contadores do job em "metrics"; estes são também
+    agregados em metrics.REGISTRY (hooks incluídos) e publicados.
+
+    Os PDFs são escritos de forma atómica (ficheiro temporário + rename) e
+    cada página/PDF fica registado no diário PAGE_JOURNAL_NAME em outputs_dir.
+
+    build_zip: escreve também o ZIP do job (job_zip.ZIP_NAME) em disco, à
+        medida que os PDFs são gerados.
+    resume: retoma uma execução interrompida do mesmo PDF com as mesmas
+        opções: as páginas já gravadas são repetidas a partir do diário (com
+        "resumed": True) e o processamento continua na primeira página em
+        falta, com os mesmos nomes de uma execução sem interrupção. Sem
+        diário compatível, processa tudo de novo.
+    """
+    if ocr_workers is None:
+        ocr_workers = OCR_WORKERS
+    if ocr_cache is None:
+        ocr_cache = default_ocr_cache()
+
+    manifest = {
+        "source": os.path.basename(input_pdf_path),
+        "total_pages": 0,
+        "files": [],
+        "output": {"optimized": optimize_output, "bytes_before": 0, "bytes_after": 0},
+        "page_stats": [],
+        # validação dos dígitos verificadores CNJ: nºs rejeitados, páginas
+        # enviadas para OCR por isso e quantas o OCR resolveu com nº válido
+        "validation": {"cnj_rejected": 0, "pages_escalated": 0, "escalations_resolved": 0},
+    }
+    job_metrics = metrics.Metrics()
+    st = os.stat(input_pdf_path)
+    journal = Journal(
+        os.path.join(outputs_dir, PAGE_JOURNAL_NAME),
+        {
+            "source": manifest["source"],
+            "size": st.st_size,
+            "mtime_ns": st.st_mtime_ns,
+            "options": journal_options(group_pages, inherit_number, optimize_output),
+        },
+        resume,
+    )
+    if resume:
+        discard_partial_outputs(outputs_dir, journal.stale)
+    committed, done_pages = _committed_records(journal.records)
+    journal.start(committed)
+
+    with journal, PdfSession(input_pdf_path) as session:
+        manifest["total_pages"] = len(session)
+        # o ZIP é refeito: os PDFs já gravados são acrescentados pela repetição
+        zip_writer: Union[JobZipWriter, nullcontext] = JobZipWriter(outputs_dir) if build_zip else nullcontext()
+        with zip_writer:
+            names_seen: dict[str, int] = {}
+            last_nproc: Optional[str] = None
+            for record in committed:
+                if record["type"] == "file":
+                    unique_fs_name(sanitize_filename(record["name"]), names_seen)
+                elif not record["stats"]["name"].startswith(_NO_NUMBER_PREFIX):
+                    last_nproc = record["stats"]["name"]
+            events = itertools.chain(
+                (_replay_event(record, outputs_dir, len(session)) for record in committed),
+                _split_pages(
+                    session, outputs_dir, ocr_workers, ocr_cache, group_pages, inherit_number, optimize_output,
+                    done_pages, names_seen, last_nproc,
+                ),
+            )
+            for event in events:
+                resumed = event.get("resumed", False)
+                if event["event"] == "file":
+                    logical_name, outfile, size = event["result"]
+                    manifest["files"].append(
+                        {"name": logical_name, "file": os.path.basename(outfile), "size": size, "pages": event["pages"]}
+                    )
+                    manifest["output"]["bytes_before"] += event["bytes_before"]
+                    manifest["output"]["bytes_after"] += size
+                    job_metrics.record_file(size, event["seconds"])
+                    if not resumed:
+                        metrics.REGISTRY.record_file(size, event["seconds"], call_hooks=True)
+                        journal.append({
+                            "type": "file",
+                            "name": logical_name,
+                            "file": os.path.basename(outfile),
+                            "size": size,
+                            "pages": event["pages"],
+                            "bytes_before": event["bytes_before"],
+                            "seconds": event["seconds"],
+                        })
+                    if build_zip:
+                        zip_writer.add(outfile)
+                else:
+                    stats = event["stats"]
+                    manifest["page_stats"].append(stats)
+                    job_metrics.record_page(stats)
+                    if not resumed:
+                        metrics.REGISTRY.record_page(stats, call_hooks=True)
+                        # só conta quando o PDF da página for registado (que faz o flush)
+                        journal.append({"type": "page", "stats": stats}, flush=False)
+                    validation = manifest["validation"]
+                    validation["cnj_rejected"] += len(stats["cnj_rejected"]) + len(stats.get("text_layer_rejected", ()))
+                    if stats["escalated"]:
+                        validation["pages_escalated"] += 1
+                        if stats["source"] != "text" and stats["match"] in ("cnj", "slash"):
+                            validation["escalations_resolved"] += 1
+                yield event
+            if build_zip:
+                manifest["zip"] = os.path.basename(zip_writer.path)
+    manifest["metrics"] = job_metrics.snapshot()
+    write_manifest(outputs_dir, manifest)
+    metrics.REGISTRY.inc("jobs")
+    metrics.publish()
+
+
+def journal_options(group_pages: bool, inherit_number: bool, optimize_output: bool) -> dict:
+    """Opções que mudam os resultados, no cabeçalho do diário (uma retoma exige as mesmas)."""
+    return {
+        "group_pages": group_pages,
+        "inherit_number": inherit_number,
+        "optimize_output": optimize_output,
+        "ocr_dpi": OCR_DPI,
+        "ocr_preprocess": OCR_PREPROCESS,
+    }
+
+
+def _committed_records(records: List[dict]) -> Tuple[List[dict], int]:
+    """
+    Registos do diário a manter: os PDFs gravados cujas páginas estão todas
+    registadas (pela ordem do documento, sem falhas) e essas páginas; e o nº
+    de páginas que cobrem. O resto é refeito.
+    """
+    pages = {record["stats"]["page"] for record in records if record["type"] == "page"}
+    done = 0
+    for record in records:
+        if record["type"] != "file":
+            continue
+        first, last = record["pages"]
+        if first != done + 1 or not all(p in pages for p in range(first, last + 1)):
+            break
+        done = last
+    committed = [
+        record
+        for record in records
+        if (record["pages"][1] if record["type"] == "file" else record["stats"]["page"]) <= done
+    ]
+    return committed, done
+
+
+def _replay_event(record: dict, outputs_dir: str, total: int) -> dict:
+    """Evento de process_pdf_iter de um registo do diário (execução anterior)."""
+    if record["type"] == "file":
+        return {
+            "event": "file",
+            "result": (record["name"], os.path.join(outputs_dir, record["file"]), record["size"]),
+            "pages": record["pages"],
+            "bytes_before": record["bytes_before"],
+            "seconds": record["seconds"],
+            "resumed": True,
+        }
+    stats = record["stats"]
+    return {"event": "page", "page": stats["page"], "total": total, "stats": stats, "resumed": True}
+
+
+def discard_partial_outputs(outputs_dir: str, stale: List[dict]) -> None:
+    """
+    Antes de retomar: apaga os temporários de escritas interrompidas e os PDFs
+    de um diário de outro trabalho (ex.: opções diferentes).
+    """
+    names = [record["file"] for record in stale if record.get("type") == "file"]
+    names += [name for name in os.listdir(outputs_dir) if name.endswith(_PART_SUFFIX)]
+    for name in names:
+        try:
+            os.remove(os.path.join(outputs_dir, name))
+        except OSError:
+            pass
+
+
+def _split_pages(
+    session: PdfSession,
+    outputs_dir: str,
+    ocr_workers: int,
+    ocr_cache: Optional[OcrCache],
+    group_pages: bool,
+    inherit_number: bool,
+    optimize_output: bool,
+    start: int = 0,
+    process_numbers_seen: Optional[dict[str, int]] = None,
+    last_nproc: Optional[str] = None,
+) -> Iterator[dict]:
+    # start, process_numbers_seen e last_nproc: estado de uma execução
+    # retomada (páginas já gravadas, nomes usados, último nº encontrado)
+    total = len(session)
+    if process_numbers_seen is None:
+        process_numbers_seen = {}
+    deduper = ResourceDeduper() if optimize_output else None
+    # segmento em curso: nº de processo (ou None) e [(índice, página), ...]
+    segment_nproc: Optional[str] = None
+    segment: List[Tuple[int, PageObject]] = []
+
+    def flush() -> dict:
+        first = segment[0][0]
+        if segment_nproc:
+            logical_name = segment_nproc
+            base_fs_name = sanitize_filename(segment_nproc)
         else:
-            logical_name = f"SEM_PROCESSO_PAG_{i+1}"
+            logical_name = f"{_NO_NUMBER_PREFIX}{first+1}"
             base_fs_name = logical_name
 
-        # Garante unicidade: se já existir, incrementa sufixo
-        c = process_numbers_seen.get(base_fs_name, 0)
-        fs_name = f"{base_fs_name}_{c+1}" if c > 0 else base_fs_name
-        process_numbers_seen[base_fs_name] = c + 1
-
+        fs_name = unique_fs_name(base_fs_name, process_numbers_seen)
         outfile = os.path.join(outputs_dir, f"{fs_name}.pdf")
-        writer = PdfWriter()
-        writer.add_page(page)
-        with open(outfile, "wb") as f:
-            writer.write(f)
+        # escrita atómica: quem lê (ou uma retoma) nunca vê um PDF incompleto
+        tmp = f"{outfile}.{os.getpid()}{_PART_SUFFIX}"
+        write_timings: dict[str, float] = {}
+        with metrics.timed(metrics.STAGE_WRITE, write_timings):
+            bytes_before, size = write_pages((page for _, page in segment), tmp, optimize_output, deduper)
+            os.replace(tmp, outfile)
 
-        page_files.append((logical_name, outfile, os.path.getsize(outfile)))
+        pages = [first + 1, segment[-1][0] + 1]
+        segment.clear()
+        return {
+            "event": "file",
+            "result": (logical_name, outfile, size),
+            "pages": pages,
+            "bytes_before": bytes_before,
+            "seconds": write_timings[metrics.STAGE_WRITE],
+        }
 
-    return page_files
+    for i, page, text, info in iter_page_texts(session, ocr_workers, ocr_cache, start):
+        rejected: List[ProcessNumberMatch] = []
+        match: Optional[ProcessNumberMatch] = find_process_number(text, rejected)
+        nproc = match.value if match else None
+        inherited = False
+        if nproc is None and inherit_number and last_nproc:
+            nproc, inherited = last_nproc, True
+        if nproc:
+            last_nproc = nproc
+
+        # páginas sem nº ficam sempre isoladas; com group_pages, as restantes
+        # juntam-se ao segmento anterior se o nº for o mesmo
+        if segment and not (group_pages and nproc and nproc == segment_nproc):
+            yield flush()
+        segment_nproc = nproc
+        segment.append((i, page))
+        if not group_pages:
+            yield flush()
+
+        name = nproc or f"{_NO_NUMBER_PREFIX}{i+1}"
+        yield {
+            "event": "page",
+            "page": i + 1,
+            "total": total,
+            "stats": {
+                "page": i + 1,
+                "name": name,
+                "inherited": inherited,
+                "match": match.kind if match else None,
+                "confidence": match.confidence if match else None,
+                "offset": match.offset if match else None,
+                "cnj_rejected": [r.value for r in rejected],
+                **info,
+                "timings": {stage: round(seconds, 6) for stage, seconds in info["timings"].items()},
+            },
+        }
+
+    if segment:
+        yield flush()
+
+
+def write_manifest(outputs_dir: str, manifest: dict) -> str:
+    """Grava o manifesto do job (JSON) em outputs_dir, de forma atómica; devolve o caminho."""
+    path = os.path.join(outputs_dir, MANIFEST_NAME)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1)
+    os.replace(tmp, path)
+    return path
+
+
+def load_manifest(outputs_dir: str) -> Optional[dict]:
+    """Manifesto do job, ou None se não existir (jobs antigos)."""
+    try:
+        with open(os.path.join(outputs_dir, MANIFEST_NAME), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
 
 
 def make_job_dirs(base_dir: str = "uploads", out_base: str = "outputs") -> Tuple[str, str, str]:
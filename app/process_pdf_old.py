@@ -3,20 +3,23 @@ import shutil
 from typing import Tuple, List
 from uuid import uuid4
 
-import pdfplumber
-from pypdf import PdfWriter, PdfReader
+from pypdf import PdfWriter
 from pdf2image import convert_from_path
 import pytesseract
 import re
 
-def extract_text_from_page(pdf_path, page_num):
+try:
+    from .process_pdf import PdfSession
+except ImportError:  # executado a partir de app/ (ex.: streamlit run)
+    from process_pdf import PdfSession
+
+def extract_text_from_page(pdf_path, page_num, session=None):
     """Extrai texto da página, faz OCR se necessário."""
-    try:
-        with pdfplumber.open(pdf_path) as pdf:
-            page = pdf.pages[page_num]
-            text = page.extract_text() or ""
-    except Exception:
-        text = ""
+    if session is not None:
+        text = session.extract_text(page_num)
+    else:
+        with PdfSession(pdf_path) as own_session:
+            text = own_session.extract_text(page_num)
     if text.strip():
         return text
     # Fallback - OCR
@@ -47,12 +50,15 @@ def process_pdf(input_pdf_path: str, outputs_dir: str) -> List[Tuple[str, str, i
     """
     Split PDF, extrai nº processo (ou fallback), salva cada página como PDF, retorna [(nome_logico, caminho, tamanho)]
     """
-    reader = PdfReader(input_pdf_path)
+    with PdfSession(input_pdf_path) as session:
+        return _split_pages(session, outputs_dir)
+
+def _split_pages(session, outputs_dir):
     process_numbers_seen = {}
     page_files = []
 
-    for i, page in enumerate(reader.pages):
-        text = extract_text_from_page(input_pdf_path, i)
+    for i, page in session.iter_pages():
+        text = extract_text_from_page(session.pdf_path, i, session=session)
         nproc = extract_process_number(text)
 
         if nproc:
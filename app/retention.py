@@ -0,0 +1,235 @@
+"""
+Retenção do disco de uploads/ e outputs/: apaga jobs inteiros terminados
+(done/failed) mais antigos do que RETENTION_MAX_AGE_DAYS sem acesso e, se o
+total ainda exceder RETENTION_MAX_MB, os de acesso menos recente (LRU) até
+caber. Jobs na fila ou a correr nunca são apagados, nem pastas que não
+sejam de jobs (nome que não é um UUID). O "último acesso" é a
+marca jobs.ACCESS_FILE, atualizada quando os resultados são vistos ou
+descarregados (ou reutilizados por um upload idêntico).
+
+Corre como thread em segundo plano (start_sweeper, arrancada pela UI e pela
+API) ou pela linha de comandos:
+
+    python -m app.retention [--max-age-days D] [--max-mb M] [--dry-run] [--loop SEGUNDOS]
+"""
+import argparse
+import os
+import shutil
+import sys
+import threading
+import time
+from typing import Dict, List, Optional, Set, Tuple
+from uuid import UUID
+
+try:
+    from .jobs import (
+        OUTPUTS_ROOT,
+        STATUS_DONE,
+        STATUS_FAILED,
+        UPLOADS_ROOT,
+        delete_job,
+        last_access,
+        load_job,
+        prune_upload_index,
+    )
+except ImportError:  # executado a partir de app/
+    from jobs import (
+        OUTPUTS_ROOT,
+        STATUS_DONE,
+        STATUS_FAILED,
+        UPLOADS_ROOT,
+        delete_job,
+        last_access,
+        load_job,
+        prune_upload_index,
+    )
+
+# Idade máxima (dias sem acesso) de um job terminado; 0 desliga
+RETENTION_MAX_AGE_DAYS = float(os.getenv("RETENTION_MAX_AGE_DAYS", "0"))
+# Espaço máximo de uploads/ + outputs/ (MB); 0 desliga
+RETENTION_MAX_MB = int(os.getenv("RETENTION_MAX_MB", "0"))
+# Intervalo entre varrimentos da thread em segundo plano (segundos)
+RETENTION_SWEEP_SECONDS = float(os.getenv("RETENTION_SWEEP_SECONDS", "3600"))
+
+# pastas de uploads sem registo do job mais antigas do que isto são lixo
+# (create_job cria a pasta e o registo quase ao mesmo tempo)
+_ORPHAN_GRACE = 3600.0
+
+
+def _is_job_id(name: str) -> bool:
+    """
+    As pastas dos jobs têm um UUID como nome (make_job_dirs); outras pastas
+    em uploads/ e outputs/ (ex.: resultados do python -m app) não são jobs e
+    a retenção não lhes toca.
+    """
+    try:
+        return str(UUID(name)) == name
+    except ValueError:
+        return False
+
+
+def _scan(path: str, inodes: Dict[Tuple[int, int], int]) -> Set[Tuple[int, int]]:
+    """Ficheiros (inodes) em path, recursivamente; inodes recebe o tamanho de cada um."""
+    found: Set[Tuple[int, int]] = set()
+    for root, _dirs, files in os.walk(path):
+        for name in files:
+            try:
+                st = os.lstat(os.path.join(root, name))
+            except OSError:
+                continue
+            # hard links (uploads idênticos) contam uma só vez
+            key = (st.st_dev, st.st_ino)
+            inodes[key] = st.st_size
+            found.add(key)
+    return found
+
+
+def sweep(
+    uploads_root: str = UPLOADS_ROOT,
+    outputs_root: str = OUTPUTS_ROOT,
+    max_age_days: float = RETENTION_MAX_AGE_DAYS,
+    max_bytes: Optional[int] = None,
+    dry_run: bool = False,
+    now: Optional[float] = None,
+) -> dict:
+    """
+    Um varrimento; devolve {"evicted": [jobids], "expired": n, "orphans": n,
+    "index_pruned": n, "bytes_before", "bytes_after"}.
+    max_bytes: por omissão RETENTION_MAX_MB (None/0 desliga a quota).
+    """
+    if max_bytes is None:
+        max_bytes = RETENTION_MAX_MB * 1024 * 1024
+    now = time.time() if now is None else now
+    inodes: Dict[Tuple[int, int], int] = {}
+    # jobs que podem ser apagados: (último acesso, jobid, inodes)
+    candidates: List[Tuple[float, str, Set[Tuple[int, int]]]] = []
+    owners: Dict[Tuple[int, int], int] = {}
+    orphans: List[str] = []
+    orphan_bytes = 0
+
+    job_ids = set()
+    if os.path.isdir(outputs_root):
+        for name in os.listdir(outputs_root):
+            if _is_job_id(name) and os.path.isdir(os.path.join(outputs_root, name)):
+                job_ids.add(name)
+    for jobid in sorted(job_ids):
+        files = _scan(os.path.join(outputs_root, jobid), inodes) | _scan(os.path.join(uploads_root, jobid), inodes)
+        record = load_job(jobid, outputs_root)
+        # sem registo: job anterior à fila (terminado) ou pasta a ser criada
+        status = record.get("status") if record else STATUS_DONE
+        if status not in (STATUS_DONE, STATUS_FAILED):
+            continue
+        if record is None and now - last_access(jobid, outputs_root, {}) < _ORPHAN_GRACE:
+            continue
+        candidates.append((last_access(jobid, outputs_root, record), jobid, files))
+        for key in files:
+            owners[key] = owners.get(key, 0) + 1
+
+    if os.path.isdir(uploads_root):
+        for name in os.listdir(uploads_root):
+            path = os.path.join(uploads_root, name)
+            if not _is_job_id(name) or name in job_ids or not os.path.isdir(path):
+                continue
+            files = _scan(path, inodes)
+            if now - os.path.getmtime(path) > _ORPHAN_GRACE:
+                orphans.append(name)
+                orphan_bytes += sum(inodes[key] for key in files)
+
+    bytes_before = sum(inodes.values())
+    total = bytes_before - orphan_bytes
+    evict: List[str] = []
+    expired = 0
+
+    def free(files: Set[Tuple[int, int]]) -> None:
+        nonlocal total
+        for key in files:
+            owners[key] -= 1
+            if owners[key] == 0:  # último link apagado
+                total -= inodes[key]
+
+    candidates.sort()
+    for accessed, jobid, files in candidates:
+        if max_age_days and now - accessed > max_age_days * 86400:
+            evict.append(jobid)
+            expired += 1
+        elif max_bytes and total > max_bytes:
+            evict.append(jobid)
+        else:
+            continue
+        free(files)
+
+    if not dry_run:
+        for jobid in evict:
+            delete_job(jobid, uploads_root, outputs_root)
+        for name in orphans:
+            shutil.rmtree(os.path.join(uploads_root, name), ignore_errors=True)
+        index_pruned = prune_upload_index(outputs_root)
+    else:
+        index_pruned = 0
+    return {
+        "evicted": evict,
+        "expired": expired,
+        "orphans": len(orphans),
+        "index_pruned": index_pruned,
+        "bytes_before": bytes_before,
+        "bytes_after": total,
+    }
+
+
+def sweeper_loop(
+    uploads_root: str = UPLOADS_ROOT,
+    outputs_root: str = OUTPUTS_ROOT,
+    interval: float = RETENTION_SWEEP_SECONDS,
+    stop_event: Optional[threading.Event] = None,
+) -> None:
+    """Varre a cada interval segundos até stop_event; um erro não pára a thread."""
+    stop_event = stop_event or threading.Event()
+    while not stop_event.is_set():
+        try:
+            sweep(uploads_root, outputs_root)
+        except Exception:
+            pass  # tenta de novo no próximo varrimento
+        stop_event.wait(interval)
+
+
+def start_sweeper(
+    uploads_root: str = UPLOADS_ROOT, outputs_root: str = OUTPUTS_ROOT, interval: float = RETENTION_SWEEP_SECONDS
+) -> Optional[threading.Event]:
+    """
+    Arranca a thread (daemon) do varrimento; devolve o evento que a pára, ou
+    None se a retenção estiver desligada (sem idade nem quota).
+    """
+    if not RETENTION_MAX_AGE_DAYS and not RETENTION_MAX_MB:
+        return None
+    stop_event = threading.Event()
+    threading.Thread(
+        target=sweeper_loop, args=(uploads_root, outputs_root, interval, stop_event), name="retention", daemon=True
+    ).start()
+    return stop_event
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.retention", description="Retenção de uploads/ e outputs/.")
+    parser.add_argument("--uploads", default=UPLOADS_ROOT)
+    parser.add_argument("--outputs", default=OUTPUTS_ROOT)
+    parser.add_argument("--max-age-days", type=float, default=RETENTION_MAX_AGE_DAYS, help="0 desliga")
+    parser.add_argument("--max-mb", type=int, default=RETENTION_MAX_MB, help="0 desliga")
+    parser.add_argument("--dry-run", action="store_true", help="só mostra o que seria apagado")
+    parser.add_argument("--loop", type=float, metavar="SEGUNDOS", help="repete o varrimento a cada SEGUNDOS")
+    args = parser.parse_args(argv)
+
+    while True:
+        report = sweep(args.uploads, args.outputs, args.max_age_days, args.max_mb * 1024 * 1024, args.dry_run)
+        verb = "a apagar" if args.dry_run else "apagados"
+        print(
+            f"{len(report['evicted'])} jobs {verb} ({report['expired']} por idade), "
+            f"{report['orphans']} uploads órfãos, {report['index_pruned']} entradas do índice; "
+            f"{report['bytes_before'] / 1e6:.1f} MB -> {report['bytes_after'] / 1e6:.1f} MB"
+        )
+        if not args.loop:
+            return 0
+        time.sleep(args.loop)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,58 @@
+import re
+from typing import Tuple
+
+from pypdf import PageObject
+
+# Classificação rápida da página a partir dos objetos pypdf já carregados,
+# sem análise de layout: operadores de texto no content stream e imagens.
+PAGE_TEXT = "text"  # só texto
+PAGE_IMAGE = "image"  # só imagens (digitalização sem camada de texto)
+PAGE_MIXED = "mixed"  # texto e imagens (ex.: digitalização com OCR embebido)
+PAGE_EMPTY = "empty"  # nem texto nem imagens (ex.: só vetores)
+
+# Tj/TJ/'/" mostram texto; só contam dentro de um bloco BT ... ET
+_BT_RE = re.compile(rb"(?<![A-Za-z0-9])BT(?![A-Za-z0-9])")
+_SHOW_TEXT_RE = re.compile(rb"(?<![A-Za-z0-9])(?:Tj|TJ)(?![A-Za-z0-9])|[)>\]]\s*['\"]")
+# imagens inline (BI ... ID ... EI) e chamadas a XObjects (/Nome Do)
+_INLINE_IMAGE_RE = re.compile(rb"(?<![A-Za-z0-9])BI(?![A-Za-z0-9])")
+_DO_RE = re.compile(rb"/([^\s/\[\]()<>{}%]+)\s+Do(?![A-Za-z0-9])")
+
+
+def classify_page(page: PageObject) -> str:
+    """PAGE_TEXT, PAGE_IMAGE, PAGE_MIXED ou PAGE_EMPTY."""
+    try:
+        contents = page.get_contents()
+        data = contents.get_data() if contents is not None else b""
+        has_text, has_image = _scan(data, page.get("/Resources"), depth=0)
+    except Exception:
+        # na dúvida, segue o caminho completo (texto + OCR se vazio)
+        return PAGE_MIXED
+    if has_text:
+        return PAGE_MIXED if has_image else PAGE_TEXT
+    return PAGE_IMAGE if has_image else PAGE_EMPTY
+
+
+def _scan(data: bytes, resources, depth: int) -> Tuple[bool, bool]:
+    """(tem texto, tem imagens) de um content stream e dos forms que invoca."""
+    has_text = bool(_BT_RE.search(data)) and bool(_SHOW_TEXT_RE.search(data))
+    has_image = bool(_INLINE_IMAGE_RE.search(data))
+    if resources is None or depth > 3:
+        return has_text, has_image
+    xobjects = resources.get_object().get("/XObject")
+    if xobjects is None:
+        return has_text, has_image
+    xobjects = xobjects.get_object()
+    for name in set(_DO_RE.findall(data)):
+        ref = xobjects.get("/" + name.decode("latin-1"))
+        if ref is None:
+            continue
+        obj = ref.get_object()
+        subtype = obj.get("/Subtype")
+        if subtype == "/Image":
+            has_image = True
+        elif subtype == "/Form" and not (has_text and has_image):
+            form_text, form_image = _scan(obj.get_data(), obj.get("/Resources") or resources, depth + 1)
+            has_text, has_image = has_text or form_text, has_image or form_image
+        if has_text and has_image:
+            break
+    return has_text, has_image
@@ -1,40 +1,108 @@
 import re
-from typing import Optional
+from typing import Iterator, List, NamedTuple, Optional
 
-LABELLED_REGEX = re.compile(
+# Todos os formatos numa só regex, para uma única passagem pelo texto:
+# rótulo opcional ("Processo nº", "nº do processo", ...) seguido do número
+# num dos formatos, do mais estrito para o mais amplo (na mesma posição
+# ganha a primeira alternativa).
+PROCESS_NUMBER_REGEX = re.compile(
     r"""
-    (?:
-        (?:n[ºo\.-]*\s*)?          # variantes de "nº" opcionais
-        (?:de|do)?\s*
-        processo[:\-\s]*            # variantes de "processo"
-        |                           # ou só "processo" isolado
+    (?P<label>
+        (?:n[ºo\.-]*\s*)?(?:d[eo]\s+)?
         processo[:\-\s]*
+        (?:n[ºo\.-]*\s*)?
+    )?
+    (?:
+        (?<!\d)(?P<cnj>\d{7}-\d{2}\.\d{4}\.\d\.\d{2}\.\d{4})       # CNJ
+        |
+        (?<!\d)(?P<slash>(?-i:[0-9]{4,8}\/[0-9]{2}\.[0-9A-Z\-\.]{1,}))  # 1234/22.0T8LSB (sufixo só em maiúsculas)
+        |
+        (?P<loose>\b\d{4,}(?:[.\-/]\d{2,}){0,3}\b)                # amplo (Processos_Submeter.py)
     )
-    ([0-9]{4,8}\/[0-9]{2}\.[0-9A-Z\-\.]{1,})  # formato núm. proceso
     """,
     re.IGNORECASE | re.VERBOSE
 )
 
-LOOSE_REGEX = re.compile(
-    r'([0-9]{4,8}\/[0-9]{2}\.[0-9A-Z\-\.]{1,})'
-)
+# Confiança por (formato, com rótulo)
+CONFIDENCE = {
+    ("cnj", True): 1.0,
+    ("slash", True): 0.95,
+    ("cnj", False): 0.9,
+    ("slash", False): 0.8,
+    ("loose", True): 0.6,
+    ("loose", False): 0.3,
+}
+# A partir desta confiança o primeiro candidato é aceite sem ler o resto do texto
+EARLY_STOP_CONFIDENCE = 0.95
+
+
+class ProcessNumberMatch(NamedTuple):
+    value: str
+    kind: str  # "cnj" | "slash" | "loose"
+    labelled: bool
+    confidence: float
+    offset: int  # posição do número no texto
+    valid: bool = True  # False: nº CNJ com dígitos verificadores errados
+
 
-def extract_process_number(page_text: str) -> Optional[str]:
+def cnj_check_digits_valid(number: str) -> bool:
+    """
+    Valida os dígitos verificadores (mod 97, ISO 7064) de um nº CNJ
+    NNNNNNN-DD.AAAA.J.TR.OOOO.
+    """
+    digits = re.sub(r"\D", "", number)
+    if len(digits) != 20:
+        return False
+    # NNNNNNN AAAA J TR OOOO DD  ≡ 1 (mod 97)
+    return int(digits[:7] + digits[9:] + digits[7:9]) % 97 == 1
+
+
+def iter_process_numbers(page_text: str) -> Iterator[ProcessNumberMatch]:
+    """Candidatos a nº de processo, pela ordem em que aparecem no texto."""
+    for m in PROCESS_NUMBER_REGEX.finditer(page_text):
+        kind = m.lastgroup
+        labelled = m.group("label") is not None
+        value = normalize(m.group(kind))
+        valid = kind != "cnj" or cnj_check_digits_valid(value)
+        yield ProcessNumberMatch(value, kind, labelled, CONFIDENCE[(kind, labelled)], m.start(kind), valid)
+
+
+def find_process_number(
+    page_text: str, rejected: Optional[List[ProcessNumberMatch]] = None
+) -> Optional[ProcessNumberMatch]:
+    """
+    Melhor candidato a nº de processo (maior confiança; em empate, o
+    primeiro), numa só passagem. Pára no primeiro candidato rotulado em
+    formato estrito. Os nºs CNJ com dígitos verificadores inválidos são
+    ignorados (e acrescentados a rejected, se dada).
+    """
     if not page_text:
         return None
+    best = None
+    for candidate in iter_process_numbers(page_text):
+        if not candidate.valid:
+            if rejected is not None:
+                rejected.append(candidate)
+            continue
+        if candidate.confidence >= EARLY_STOP_CONFIDENCE:
+            return candidate
+        if best is None or candidate.confidence > best.confidence:
+            best = candidate
+    return best
 
-    # Labelled first
-    match = LABELLED_REGEX.search(page_text)
-    if match:
-        return normalize(match.group(1))
-    # Then loose/strict
-    match = LOOSE_REGEX.search(page_text)
-    if match:
-        return normalize(match.group(1))
-    return None
 
 def normalize(proc: str) -> str:
     """Remove espaços em branco e normaliza o número do processo."""
     proc = proc.strip()
     proc = re.sub(r'\s+', '', proc)
-    return proc
+    return proc.rstrip(".-")
+
+
+def human_size(n: int) -> str:
+    """Tamanho legível para a UI (1024 bytes = 1 KB): "512 B", "147.00 KB", "1.50 MB"."""
+    size = float(n)
+    for unit in ["B", "KB", "MB"]:
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.2f} {unit}"
+        size /= 1024
+    return f"{size:.2f} GB"
@@ -0,0 +1,91 @@
+"""
+Benchmarks (python -m bench, a partir da raiz do repositório):
+
+    python -m bench corpus [--corpus DIR] [--scale S]
+    python -m bench run [--scenario NOME ...] [--repeat N] [--output resultados.json]
+                        [--compare baseline.json] [--threshold 0.1]
+    python -m bench compare baseline.json resultados.json [--threshold 0.1]
+
+run e compare terminam com código 1 se houver regressões face ao baseline ou
+problemas de escala (pág/s que caem ou pico de RSS que sobe com o nº de
+páginas, ver check_scaling).
+"""
+import argparse
+import sys
+from typing import List, Optional
+
+from .corpus import build_corpus
+from .runner import (
+    DEFAULT_THRESHOLD,
+    SCENARIOS,
+    check_scaling,
+    compare,
+    format_result,
+    load_results,
+    run_benchmarks,
+    save_results,
+)
+
+CORPUS_DIR = "bench_corpus"
+RESULTS_FILE = "bench_results.json"
+
+
+def _report(regressions: List[str]) -> int:
+    if not regressions:
+        print("Sem regressões.")
+        return 0
+    print("Regressões:")
+    for line in regressions:
+        print(f"  - {line}")
+    return 1
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m bench", description="Benchmarks do processamento de PDFs.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    corpus_cmd = commands.add_parser("corpus", help="gera o corpus sintético")
+    run_cmd = commands.add_parser("run", help="corre os cenários e grava os resultados")
+    for cmd in (corpus_cmd, run_cmd):
+        cmd.add_argument("--corpus", default=CORPUS_DIR, help=f"pasta do corpus (por omissão {CORPUS_DIR})")
+        cmd.add_argument("--scale", type=float, default=1.0, help="fator do nº de páginas dos PDFs gerados")
+    run_cmd.add_argument("--scenario", action="append", choices=list(SCENARIOS), help="só este cenário (repetível)")
+    run_cmd.add_argument("--repeat", type=int, default=1, help="execuções por cenário (fica a mediana)")
+    run_cmd.add_argument("--output", default=RESULTS_FILE, help=f"ficheiro de resultados (por omissão {RESULTS_FILE})")
+    run_cmd.add_argument("--compare", metavar="BASELINE", help="compara os resultados com este baseline")
+
+    compare_cmd = commands.add_parser("compare", help="compara resultados com um baseline")
+    compare_cmd.add_argument("baseline")
+    compare_cmd.add_argument("results")
+    for cmd in (run_cmd, compare_cmd):
+        cmd.add_argument(
+            "--threshold", type=float, default=DEFAULT_THRESHOLD,
+            help=f"variação tolerada (por omissão {DEFAULT_THRESHOLD})",
+        )
+    args = parser.parse_args(argv)
+
+    if args.command == "corpus":
+        corpus = build_corpus(args.corpus, args.scale)
+        for name, entry in corpus["files"].items():
+            print(f"{name}: {entry['pages']} páginas")
+        return 0
+
+    if args.command == "compare":
+        results = load_results(args.results)
+        return _report(
+            compare(load_results(args.baseline), results, args.threshold) + check_scaling(results, args.threshold)
+        )
+
+    results = run_benchmarks(
+        args.corpus, args.scale, args.scenario, args.repeat, progress=lambda n, r: print(format_result(n, r))
+    )
+    save_results(args.output, results)
+    print(f"Resultados em {args.output}")
+    regressions = check_scaling(results, args.threshold)
+    if args.compare:
+        regressions = compare(load_results(args.compare), results, args.threshold) + regressions
+    return _report(regressions)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,264 @@
+"""
+Corpus sintético de peças processuais, determinístico (mesma escala, mesmos
+PDFs): páginas com camada de texto e nº de processo em vários formatos
+(também com fontes embutidas pesadas), páginas digitalizadas (só imagem,
+geradas com Pillow), cadernos mistos e cadernos grandes. O nº esperado de
+cada página fica em corpus.json, para os benchmarks medirem também a taxa
+de acerto.
+"""
+import json
+import os
+import random
+from typing import List, Optional, Tuple
+
+from PIL import Image, ImageDraw, ImageFont
+from pypdf import PdfReader, PdfWriter
+from pypdf.generic import ArrayObject, DecodedStreamObject, DictionaryObject, NameObject, NumberObject
+
+CORPUS_FILE = "corpus.json"
+# Versão do gerador: muda quando os PDFs gerados mudam (invalida corpus antigos)
+CORPUS_VERSION = 4
+
+A4 = (595, 842)
+SCAN_DPI = 150
+SEED = 1234
+
+
+def cnj_number(seq: int, valid: bool = True) -> str:
+    """Nº CNJ NNNNNNN-DD.AAAA.J.TR.OOOO com dígitos verificadores certos (ou errados)."""
+    n, year, j, tr, origin = f"{seq:07d}", "2023", "8", "26", "0100"
+    dd = 98 - int(n + year + j + tr + origin + "00") % 97
+    if not valid:
+        dd = (dd + 1) % 100
+    return f"{n}-{dd:02d}.{year}.{j}.{tr}.{origin}"
+
+
+# Formatos dos nºs, em ciclo: (linha do cabeçalho, nº esperado)
+def _header(seq: int) -> Tuple[str, Optional[str]]:
+    kind = seq % 6
+    if kind == 0:
+        number = cnj_number(seq)
+        return f"Processo n. {number}", number
+    if kind == 1:
+        number = cnj_number(seq)
+        return f"Autos {number}", number
+    if kind == 2:
+        number = f"{1000 + seq}/23.{seq % 9}T8LSB"
+        return f"Processo: {number}", number
+    if kind == 3:
+        # CNJ inválido com rótulo: rejeitado, a página fica sem nº
+        return f"Processo n. {cnj_number(seq, valid=False)}", None
+    if kind == 4:
+        number = f"{20000 + seq}-{seq % 90 + 10}"
+        return f"Processo {number}", number
+    return "Termo de juntada", None
+
+
+def _text_lines(seq: int, page: int) -> Tuple[List[str], Optional[str]]:
+    header, number = _header(seq)
+    # folha com separador de milhares (fls. 1.234), como nos autos
+    folio = f"{page + 1:,}".replace(",", ".")
+    lines = [header, "Tribunal de Justica - Peca processual", f"fls. {folio}"]
+    lines += [f"Paragrafo {k}: texto corrido da peca para dar volume a camada de texto." for k in range(20)]
+    return lines, number
+
+
+def _page_numbers(pages: int, run: int, first_seq: int) -> List[int]:
+    """Sequência (nº de ordem do processo) de cada página: blocos de run páginas."""
+    return [first_seq + p // run for p in range(pages)]
+
+
+def _font_resources(writer: PdfWriter) -> DictionaryObject:
+    font = DictionaryObject({
+        NameObject("/Type"): NameObject("/Font"),
+        NameObject("/Subtype"): NameObject("/Type1"),
+        NameObject("/BaseFont"): NameObject("/Helvetica"),
+    })
+    return DictionaryObject({NameObject("/F1"): writer._add_object(font)})
+
+
+def _font_program(rng: random.Random) -> bytes:
+    """Programa TrueType embutido no Pillow (>= 10.1); sem ele, bytes aleatórios de tamanho parecido."""
+    program = getattr(_font(10), "font_bytes", None)
+    return program if program else rng.randbytes(12_000)
+
+
+def _embedded_font_resources(writer: PdfWriter, count: int, program: bytes) -> DictionaryObject:
+    """
+    count fontes TrueType embutidas (F1, F2, ...), cada uma com a sua cópia
+    do programa, como nos cadernos juntos a partir de peças de origens
+    diferentes; só a F1 é usada no texto.
+    """
+    widths = ArrayObject(NumberObject(round(_font(1000).getlength(chr(c)))) for c in range(32, 127))
+    fonts = DictionaryObject()
+    for k in range(1, count + 1):
+        name = NameObject(f"/AAAAA{chr(64 + k)}+Aileron")
+        font_file = DecodedStreamObject()
+        font_file.set_data(program)
+        font_file[NameObject("/Length1")] = NumberObject(len(program))
+        descriptor = DictionaryObject({
+            NameObject("/Type"): NameObject("/FontDescriptor"),
+            NameObject("/FontName"): name,
+            NameObject("/Flags"): NumberObject(32),
+            NameObject("/FontBBox"): ArrayObject(NumberObject(v) for v in (-200, -250, 1100, 950)),
+            NameObject("/ItalicAngle"): NumberObject(0),
+            NameObject("/Ascent"): NumberObject(900),
+            NameObject("/Descent"): NumberObject(-250),
+            NameObject("/CapHeight"): NumberObject(700),
+            NameObject("/StemV"): NumberObject(80),
+            NameObject("/FontFile2"): writer._add_object(font_file),
+        })
+        font = DictionaryObject({
+            NameObject("/Type"): NameObject("/Font"),
+            NameObject("/Subtype"): NameObject("/TrueType"),
+            NameObject("/BaseFont"): name,
+            NameObject("/FirstChar"): NumberObject(32),
+            NameObject("/LastChar"): NumberObject(126),
+            NameObject("/Widths"): widths,
+            NameObject("/Encoding"): NameObject("/WinAnsiEncoding"),
+            NameObject("/FontDescriptor"): writer._add_object(descriptor),
+        })
+        fonts[NameObject(f"/F{k}")] = writer._add_object(font)
+    return fonts
+
+
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def _add_text_page(writer: PdfWriter, fonts: DictionaryObject, lines: List[str], image_bytes: int = 0,
+                   rng: Optional[random.Random] = None) -> None:
+    page = writer.add_blank_page(*A4)
+    ops = [f"BT /F1 11 Tf 50 {790 - 16 * k} Td ({_escape(line)}) Tj ET" for k, line in enumerate(lines)]
+    resources = DictionaryObject({NameObject("/Font"): fonts})
+    if image_bytes:
+        # imagem "pesada" (ex.: carimbo digitalizado), para os cadernos grandes
+        side = int(image_bytes ** 0.5)
+        image = DecodedStreamObject()
+        image.set_data(rng.randbytes(side * side))
+        image.update({
+            NameObject("/Type"): NameObject("/XObject"),
+            NameObject("/Subtype"): NameObject("/Image"),
+            NameObject("/Width"): NumberObject(side),
+            NameObject("/Height"): NumberObject(side),
+            NameObject("/ColorSpace"): NameObject("/DeviceGray"),
+            NameObject("/BitsPerComponent"): NumberObject(8),
+        })
+        resources[NameObject("/XObject")] = DictionaryObject({NameObject("/Im0"): writer._add_object(image)})
+        ops.insert(0, "q 120 0 0 120 420 40 cm /Im0 Do Q")
+    contents = DecodedStreamObject()
+    contents.set_data("\n".join(ops).encode("latin-1"))
+    page[NameObject("/Contents")] = writer._add_object(contents)
+    page[NameObject("/Resources")] = resources
+
+
+def _font(size: int):
+    try:
+        return ImageFont.load_default(size=size)
+    except TypeError:  # Pillow < 10.1 (fonte bitmap fixa)
+        return ImageFont.load_default()
+
+
+def scanned_image(lines: List[str], rng: random.Random, dpi: int = SCAN_DPI) -> Image.Image:
+    """Página A4 digitalizada: texto em cinzento, fundo irregular, manchas e inclinação ligeira."""
+    width, height = int(A4[0] / 72 * dpi), int(A4[1] / 72 * dpi)
+    image = Image.new("L", (width, height), 235)
+    draw = ImageDraw.Draw(image)
+    # fundo irregular (papel amarelado / iluminação desigual)
+    for _ in range(40):
+        x, y, r = rng.randrange(width), rng.randrange(height), rng.randrange(50, 300)
+        draw.ellipse((x - r, y - r, x + r, y + r), fill=rng.randrange(215, 245))
+    font = _font(int(dpi / 72 * 11))
+    margin, step = int(dpi * 0.7), int(dpi / 72 * 16)
+    for k, line in enumerate(lines):
+        draw.text((margin, margin + k * step), line, fill=rng.randrange(20, 70), font=font)
+    for _ in range(400):
+        x, y = rng.randrange(width), rng.randrange(height)
+        draw.point((x, y), fill=rng.randrange(0, 120))
+    # moldura escura do scanner e inclinação
+    draw.rectangle((0, 0, width - 1, height - 1), outline=30, width=int(dpi * 0.1))
+    return image.rotate(rng.uniform(-2.0, 2.0), resample=Image.BICUBIC, fillcolor=255)
+
+
+def _add_scanned_page(writer: PdfWriter, lines: List[str], rng: random.Random, tmp_path: str) -> None:
+    scanned_image(lines, rng).save(tmp_path, "PDF", resolution=SCAN_DPI)
+    writer.append(PdfReader(tmp_path))
+
+
+def make_bundle(path: str, pages: int, scanned_every: int = 0, run: int = 3, image_bytes: int = 0,
+                first_seq: int = 0, embedded_fonts: int = 0, seed: int = SEED) -> List[Optional[str]]:
+    """
+    Caderno de pages páginas (blocos de run páginas por processo, nºs a
+    partir de first_seq); uma página em cada scanned_every é digitalizada
+    (0 = nenhuma). Com embedded_fonts, cada página de texto leva as suas
+    cópias dessas fontes embutidas em vez da Helvetica partilhada. Devolve o
+    nº esperado de cada página.
+    """
+    rng = random.Random(seed)
+    writer = PdfWriter()
+    fonts = _font_resources(writer)
+    program = _font_program(rng) if embedded_fonts else b""
+    expected: List[Optional[str]] = []
+    tmp_path = f"{path}.scan.tmp"
+    try:
+        for p, seq in enumerate(_page_numbers(pages, run, first_seq)):
+            lines, number = _text_lines(seq, p)
+            if scanned_every and p % scanned_every == 0:
+                _add_scanned_page(writer, lines, rng, tmp_path)
+            else:
+                if embedded_fonts:
+                    fonts = _embedded_font_resources(writer, embedded_fonts, program)
+                _add_text_page(writer, fonts, lines, image_bytes, rng)
+            expected.append(number)
+        writer.add_metadata({"/Producer": "bench.corpus"})
+        with open(path, "wb") as f:
+            writer.write(f)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return expected
+
+
+def _specs(scale: float) -> List[Tuple[str, dict]]:
+    def n(pages: int) -> int:
+        return max(1, int(pages * scale))
+
+    specs = [
+        ("born_digital.pdf", {"pages": n(200)}),
+        # peças com fontes TrueType embutidas (cópias por página, várias sem uso)
+        ("fonts.pdf", {"pages": n(200), "embedded_fonts": 4}),
+        ("scanned.pdf", {"pages": n(20), "scanned_every": 1}),
+        ("mixed.pdf", {"pages": n(60), "scanned_every": 3}),
+        ("large.pdf", {"pages": n(2000), "image_bytes": 20_000}),
+        # o mesmo tipo de caderno, curto: referência para large.pdf (escalabilidade);
+        # sempre com 50 páginas, para --scale não a reduzir a poucas páginas
+        ("large_50.pdf", {"pages": 50, "image_bytes": 20_000}),
+    ]
+    specs += [(f"batch/doc_{k}.pdf", {"pages": n(50), "first_seq": 1000 * (k + 1)}) for k in range(4)]
+    return specs
+
+
+def build_corpus(corpus_dir: str, scale: float = 1.0) -> dict:
+    """
+    Gera o corpus em corpus_dir (reaproveita-o se já foi gerado com a mesma
+    escala e versão). Devolve o conteúdo de corpus.json:
+    {"version", "scale", "files": {nome: {"pages", "expected": [...]}}}.
+    """
+    index_path = os.path.join(corpus_dir, CORPUS_FILE)
+    try:
+        with open(index_path, "r", encoding="utf-8") as f:
+            corpus = json.load(f)
+        if corpus["version"] == CORPUS_VERSION and corpus["scale"] == scale:
+            return corpus
+    except (OSError, ValueError, KeyError):
+        pass
+
+    corpus = {"version": CORPUS_VERSION, "scale": scale, "files": {}}
+    for name, spec in _specs(scale):
+        path = os.path.join(corpus_dir, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        expected = make_bundle(path, **spec)
+        corpus["files"][name] = {"pages": len(expected), "expected": expected}
+    with open(index_path, "w", encoding="utf-8") as f:
+        json.dump(corpus, f, indent=1)
+    return corpus
@@ -0,0 +1,461 @@
+"""
+Cenários de benchmark sobre o corpus sintético (bench.corpus). Cada execução
+de um cenário corre num processo novo (spawn), para o pico de RSS ser só
+dele; os tempos por etapa vêm de app.metrics.
+
+Resultado (JSON):
+    {"created_at", "python", "platform", "cpu_count", "scale", "repeat",
+     "ocr_available", "scenarios": {nome: {"pages", "seconds", "pages_per_sec",
+     "peak_rss_mb", "stages": {etapa: segundos}, ...} ou {"skipped": motivo}}}
+
+process_large_50 e process_large processam o mesmo tipo de caderno com 50 e
+2000 páginas: check_scaling() verifica que as pág/s não caem e que o pico de
+RSS não sobe quando o nº de páginas cresce.
+
+process_fonts e process_optimized processam o mesmo caderno com fontes
+embutidas pesadas (fonts.pdf) sem e com optimize_output (bytes_before/after).
+
+rasterize_per_page e rasterize_batched rasterizam as mesmas páginas com uma
+invocação do poppler por página ou por lote de RASTER_BATCH_PAGES.
+
+Os cenários *_preprocessed repetem os de OCR com o pré-processamento ligado
+(OCR_PREPROCESS): comparar com os originais dá o tempo de OCR por página
+(ocr_seconds_per_page) e a taxa de acerto antes/depois.
+"""
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from typing import Callable, Dict, List, Optional
+
+try:
+    import resource
+except ImportError:  # Windows: sem pico de RSS
+    resource = None
+
+from .corpus import CORPUS_VERSION, build_corpus
+
+# Variação (fração) a partir da qual compare() assinala uma regressão
+DEFAULT_THRESHOLD = 0.10
+# Descida máxima aceite na taxa de acerto (absoluta)
+ACCURACY_TOLERANCE = 0.01
+
+
+def ocr_available() -> bool:
+    """poppler (pdftoppm) e Tesseract instalados."""
+    return bool(shutil.which("pdftoppm") and shutil.which("tesseract"))
+
+
+def _accuracy(page_stats: List[dict], expected: List[Optional[str]]) -> float:
+    hits = 0
+    for stats in page_stats:
+        number = expected[stats["page"] - 1]
+        hits += stats["name"] == number if number else stats["name"].startswith("SEM_PROCESSO")
+    return round(hits / max(1, len(expected)), 4)
+
+
+def _process(corpus_dir: str, corpus: dict, work_dir: str, name: str, preprocess: bool = False, **options) -> dict:
+    from app import process_pdf
+    from app.process_pdf import load_manifest, process_pdf_iter
+
+    # pré-processamento do OCR explícito (antes/depois), também para os
+    # processos do OCR; o cenário corre num processo só dele
+    os.environ["OCR_PREPROCESS"] = "1" if preprocess else "0"
+    process_pdf.configure_ocr(process_pdf.OCR_DPI, preprocess)
+    out_dir = os.path.join(work_dir, "out")
+    os.makedirs(out_dir)
+    for _event in process_pdf_iter(os.path.join(corpus_dir, name), out_dir, **options):
+        pass
+    manifest = load_manifest(out_dir)
+    result = {
+        "pages": manifest["total_pages"],
+        "accuracy": _accuracy(manifest["page_stats"], corpus["files"][name]["expected"]),
+        "files": len(manifest["files"]),
+        "bytes_before": manifest["output"]["bytes_before"],
+        "bytes_after": manifest["output"]["bytes_after"],
+    }
+    ocr_pages = manifest["metrics"]["counters"].get("ocr_pages", 0)
+    if ocr_pages:
+        stages = manifest["metrics"]["stage_seconds"]
+        result["ocr_seconds_per_page"] = round(stages.get("ocr", 0.0) / ocr_pages, 4)
+        result["preprocess_seconds_per_page"] = round(stages.get("preprocess", 0.0) / ocr_pages, 4)
+    return result
+
+
+def bench_regex(corpus_dir: str, corpus: dict, work_dir: str) -> dict:
+    """utils.find_process_number sobre o texto das páginas (extraído antes da medição)."""
+    from app.process_pdf import PdfSession
+    from app.utils import find_process_number
+
+    with PdfSession(os.path.join(corpus_dir, "born_digital.pdf")) as session:
+        texts = [session.extract_text_fast(i) for i in range(len(session))]
+    rounds = 50
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for text in texts:
+            find_process_number(text)
+    return {"pages": len(texts) * rounds, "seconds": time.perf_counter() - start}
+
+
+def _bench_extractor(corpus_dir: str, method: str) -> dict:
+    from app.process_pdf import PdfSession
+
+    with PdfSession(os.path.join(corpus_dir, "born_digital.pdf")) as session:
+        extract = getattr(session, method)
+        for i in range(len(session)):
+            extract(i)
+        return {"pages": len(session)}
+
+
+def bench_extract_pypdf(corpus_dir: str, corpus: dict, work_dir: str) -> dict:
+    return _bench_extractor(corpus_dir, "extract_text_fast")
+
+
+def bench_extract_pdfplumber(corpus_dir: str, corpus: dict, work_dir: str) -> dict:
+    return _bench_extractor(corpus_dir, "extract_text")
+
+
+def bench_text_layer(corpus_dir: str, corpus: dict, work_dir: str) -> dict:
+    """PdfSession.layer_text (classificação + pypdf, pdfplumber só se preciso)."""
+    from app.metrics import Metrics
+    from app.process_pdf import PdfSession
+
+    stages = Metrics()
+    with PdfSession(os.path.join(corpus_dir, "born_digital.pdf")) as session:
+        for i, _page in session.iter_pages():
+            _text, info = session.layer_text(i)
+            for stage, seconds in info["timings"].items():
+                stages.observe(stage, seconds)
+        return {"pages": len(session), "stages": stages.snapshot()["stage_seconds"]}
+
+
+def bench_process_born_digital(corpus_dir: str, corpus: dict, work_dir: str) -> dict:
+    return _process(corpus_dir, corpus, work_dir, "born_digital.pdf")
+
+
+def bench_process_fonts(corpus_dir: str, corpus: dict, work_dir: str) -> dict:
+    return _process(corpus_dir, corpus, work_dir, "fonts.pdf", group_pages=True)
+
+
+def bench_process_optimized(corpus_dir: str, corpus: dict, work_dir: str) -> dict:
+    return _process(corpus_dir, corpus, work_dir, "fonts.pdf", group_pages=True, optimize_output=True)
+
+
+def bench_process_large(corpus_dir: str, corpus: dict, work_dir: str) -> dict:
+    return _process(corpus_dir, corpus, work_dir, "large.pdf")
+
+
+def bench_process_large_50(corpus_dir: str, corpus: dict, work_dir: str) -> dict:
+    return _process(corpus_dir, corpus, work_dir, "large_50.pdf")
+
+
+def bench_process_scanned(corpus_dir: str, corpus: dict, work_dir: str) -> dict:
+    return _process(corpus_dir, corpus, work_dir, "scanned.pdf")
+
+
+def bench_process_mixed(corpus_dir: str, corpus: dict, work_dir: str) -> dict:
+    return _process(corpus_dir, corpus, work_dir, "mixed.pdf")
+
+
+def bench_process_scanned_preprocessed(corpus_dir: str, corpus: dict, work_dir: str) -> dict:
+    return _process(corpus_dir, corpus, work_dir, "scanned.pdf", preprocess=True)
+
+
+def bench_process_mixed_preprocessed(corpus_dir: str, corpus: dict, work_dir: str) -> dict:
+    return _process(corpus_dir, corpus, work_dir, "mixed.pdf", preprocess=True)
+
+
+def _bench_rasterize(corpus_dir: str, corpus: dict, work_dir: str, batch_pages: int) -> dict:
+    """process_pdf.rasterize_pages sobre scanned.pdf, batch_pages páginas por invocação do poppler."""
+    from app.process_pdf import rasterize_pages
+
+    name = "scanned.pdf"
+    pages = corpus["files"][name]["pages"]
+    raster_dir = os.path.join(work_dir, "raster")
+    os.makedirs(raster_dir)
+    for first in range(0, pages, batch_pages):
+        for path in rasterize_pages(os.path.join(corpus_dir, name), first, min(first + batch_pages, pages) - 1,
+                                    raster_dir).values():
+            os.remove(path)
+    return {"pages": pages}
+
+
+def bench_rasterize_per_page(corpus_dir: str, corpus: dict, work_dir: str) -> dict:
+    return _bench_rasterize(corpus_dir, corpus, work_dir, 1)
+
+
+def bench_rasterize_batched(corpus_dir: str, corpus: dict, work_dir: str) -> dict:
+    from app.process_pdf import RASTER_BATCH_PAGES
+
+    return _bench_rasterize(corpus_dir, corpus, work_dir, RASTER_BATCH_PAGES)
+
+
+def bench_preprocess(corpus_dir: str, corpus: dict, work_dir: str) -> dict:
+    """
+    preprocess.preprocess_image sobre as imagens das páginas de scanned.pdf
+    (extraídas do PDF antes da medição, sem poppler); area_ratio é a fração
+    da área que chega ao Tesseract depois do corte das margens.
+    """
+    from pypdf import PdfReader
+
+    from app.preprocess import preprocess_image
+
+    images = [page.images[0].image for page in PdfReader(os.path.join(corpus_dir, "scanned.pdf")).pages]
+    start = time.perf_counter()
+    outputs = [preprocess_image(image) for image in images]
+    seconds = time.perf_counter() - start
+    area_in = sum(image.width * image.height for image in images)
+    area_out = sum(image.width * image.height for image in outputs)
+    return {
+        "pages": len(images),
+        "seconds": seconds,
+        "stages": {"preprocess": round(seconds, 4)},
+        "area_ratio": round(area_out / area_in, 3),
+    }
+
+
+def bench_zip(corpus_dir: str, corpus: dict, work_dir: str) -> dict:
+    """ZIP do job (job_zip.ensure_job_zip) dos PDFs gerados do caderno born-digital."""
+    from app.job_zip import ensure_job_zip
+    from app.process_pdf import process_pdf
+
+    out_dir = os.path.join(work_dir, "out")
+    os.makedirs(out_dir)
+    files = process_pdf(os.path.join(corpus_dir, "born_digital.pdf"), out_dir)
+    start = time.perf_counter()
+    zip_path = ensure_job_zip(out_dir)
+    return {
+        "pages": corpus["files"]["born_digital.pdf"]["pages"],
+        "seconds": time.perf_counter() - start,
+        "files": len(files),
+        "bytes_after": os.path.getsize(zip_path),
+    }
+
+
+def bench_batch(corpus_dir: str, corpus: dict, work_dir: str) -> dict:
+    """Lote (batch.process_batch_iter) com os documentos de batch/, um processo por documento."""
+    from app.batch import process_batch_iter
+    from app.process_pdf import load_manifest
+
+    names = sorted(name for name in corpus["files"] if name.startswith("batch/"))
+    out_dir = os.path.join(work_dir, "out")
+    os.makedirs(out_dir)
+    inputs = [(name, os.path.join(corpus_dir, name)) for name in names]
+    for _event in process_batch_iter(inputs, out_dir, build_zip=True):
+        pass
+    manifest = load_manifest(out_dir)
+    expected = [number for name in names for number in corpus["files"][name]["expected"]]
+    offsets = {}
+    for k, name in enumerate(names):
+        offsets[k] = sum(corpus["files"][n]["pages"] for n in names[:k])
+    page_stats = [{**stats, "page": stats["page"] + offsets[stats["document"]]} for stats in manifest["page_stats"]]
+    return {
+        "pages": manifest["total_pages"],
+        "accuracy": _accuracy(page_stats, expected),
+        "files": len(manifest["files"]),
+        "stages": manifest["metrics"]["stage_seconds"],
+    }
+
+
+# nome: (função, precisa de OCR)
+SCENARIOS: Dict[str, tuple] = {
+    "regex": (bench_regex, False),
+    "extract_pypdf": (bench_extract_pypdf, False),
+    "extract_pdfplumber": (bench_extract_pdfplumber, False),
+    "text_layer": (bench_text_layer, False),
+    "process_born_digital": (bench_process_born_digital, False),
+    "process_fonts": (bench_process_fonts, False),
+    "process_optimized": (bench_process_optimized, False),
+    "process_large": (bench_process_large, False),
+    "process_large_50": (bench_process_large_50, False),
+    "process_scanned": (bench_process_scanned, True),
+    "process_mixed": (bench_process_mixed, True),
+    "process_scanned_preprocessed": (bench_process_scanned_preprocessed, True),
+    "process_mixed_preprocessed": (bench_process_mixed_preprocessed, True),
+    "rasterize_per_page": (bench_rasterize_per_page, True),
+    "rasterize_batched": (bench_rasterize_batched, True),
+    "preprocess": (bench_preprocess, False),
+    "zip": (bench_zip, False),
+    "batch": (bench_batch, False),
+}
+
+
+# (cenário curto, cenário longo) com o mesmo tipo de documento
+SCALING_PAIRS = [("process_large_50", "process_large")]
+
+
+def _peak_rss_mb() -> Optional[float]:
+    if resource is None:
+        return None
+    peak = max(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    )
+    # Linux: KB; macOS: bytes
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def _run_once(name: str, corpus_dir: str, corpus: dict, work_dir: str) -> dict:
+    """Corre um cenário (no processo do pool) e mede-o."""
+    # importados antes da medição: o arranque não conta nas pág/s (nem
+    # penaliza os cenários curtos face aos longos)
+    from app import batch, metrics, process_pdf  # noqa: F401
+
+    fn = SCENARIOS[name][0]
+    start = time.perf_counter()
+    result = fn(corpus_dir, corpus, work_dir)
+    result.setdefault("seconds", time.perf_counter() - start)
+    result.setdefault("stages", metrics.REGISTRY.snapshot()["stage_seconds"])
+    result["seconds"] = round(result["seconds"], 4)
+    result["pages_per_sec"] = round(result["pages"] / result["seconds"], 2) if result["seconds"] else None
+    result["peak_rss_mb"] = _peak_rss_mb()
+    return result
+
+
+def run_scenario(name: str, corpus_dir: str, corpus: dict, repeat: int = 1) -> dict:
+    """
+    Corre o cenário repeat vezes, cada uma num processo novo e com cache de
+    OCR vazia; devolve a execução mediana (em segundos), com o maior pico de RSS.
+    """
+    runs = []
+    for _ in range(repeat):
+        with tempfile.TemporaryDirectory(prefix=f"bench_{name}_") as work_dir:
+            # lidos no arranque do processo do cenário (e dos que ele criar)
+            os.environ["OCR_CACHE_DIR"] = os.path.join(work_dir, "ocr_cache")
+            os.environ["METRICS_DIR"] = ""
+            with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as executor:
+                runs.append(executor.submit(_run_once, name, corpus_dir, corpus, work_dir).result())
+    runs.sort(key=lambda r: r["seconds"])
+    result = runs[len(runs) // 2]
+    if result["peak_rss_mb"] is not None:
+        result["peak_rss_mb"] = max(r["peak_rss_mb"] for r in runs)
+    if repeat > 1:
+        result["seconds_stdev"] = round(statistics.stdev(r["seconds"] for r in runs), 4)
+    return result
+
+
+def run_benchmarks(
+    corpus_dir: str,
+    scale: float = 1.0,
+    names: Optional[List[str]] = None,
+    repeat: int = 1,
+    progress: Optional[Callable[[str, dict], None]] = None,
+) -> dict:
+    """Gera (ou reaproveita) o corpus e corre os cenários; devolve os resultados."""
+    corpus = build_corpus(corpus_dir, scale)
+    has_ocr = ocr_available()
+    results = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "scale": scale,
+        "corpus_version": CORPUS_VERSION,
+        "repeat": repeat,
+        "ocr_available": has_ocr,
+        "scenarios": {},
+    }
+    saved_env = {key: os.environ.get(key) for key in ("OCR_CACHE_DIR", "METRICS_DIR")}
+    try:
+        for name in names or list(SCENARIOS):
+            if SCENARIOS[name][1] and not has_ocr:
+                result = {"skipped": "poppler/tesseract não instalados"}
+            else:
+                result = run_scenario(name, os.path.abspath(corpus_dir), corpus, repeat)
+            results["scenarios"][name] = result
+            if progress is not None:
+                progress(name, result)
+    finally:
+        for key, value in saved_env.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+    return results
+
+
+def compare(baseline: dict, results: dict, threshold: float = DEFAULT_THRESHOLD) -> List[str]:
+    """
+    Regressões de results face a baseline: pages/s abaixo de (1 - threshold)
+    do baseline, pico de RSS acima de (1 + threshold), taxa de acerto mais
+    de ACCURACY_TOLERANCE abaixo. Cenários saltados em qualquer um são ignorados.
+    """
+    regressions = []
+    if baseline.get("scale") != results.get("scale"):
+        regressions.append(f"escala diferente: {baseline.get('scale')} vs {results.get('scale')}")
+    for name, new in results["scenarios"].items():
+        old = baseline["scenarios"].get(name)
+        if old is None or "skipped" in old or "skipped" in new:
+            continue
+        if old.get("pages_per_sec") and new.get("pages_per_sec") is not None:
+            if new["pages_per_sec"] < old["pages_per_sec"] * (1 - threshold):
+                regressions.append(f"{name}: pages/s {old['pages_per_sec']} -> {new['pages_per_sec']}")
+        if old.get("peak_rss_mb") and new.get("peak_rss_mb") is not None:
+            if new["peak_rss_mb"] > old["peak_rss_mb"] * (1 + threshold):
+                regressions.append(f"{name}: pico de RSS {old['peak_rss_mb']} MB -> {new['peak_rss_mb']} MB")
+        if "accuracy" in old and new.get("accuracy", 0) < old["accuracy"] - ACCURACY_TOLERANCE:
+            regressions.append(f"{name}: acerto {old['accuracy']} -> {new.get('accuracy')}")
+    return regressions
+
+
+def check_scaling(results: dict, threshold: float = DEFAULT_THRESHOLD) -> List[str]:
+    """
+    Problemas de escala em results (SCALING_PAIRS): pág/s do cenário longo
+    abaixo de (1 - threshold) das do curto, ou pico de RSS acima de
+    (1 + threshold) do do curto (a memória não deve crescer com o nº de
+    páginas). Pares com um cenário em falta ou saltado, ou em que o longo
+    não tem mais páginas do que o curto (--scale pequeno), são ignorados.
+    """
+    problems = []
+    scenarios = results["scenarios"]
+    for short_name, long_name in SCALING_PAIRS:
+        short, long = scenarios.get(short_name), scenarios.get(long_name)
+        if short is None or long is None or "skipped" in short or "skipped" in long:
+            continue
+        if long["pages"] <= short["pages"]:
+            continue
+        if short.get("pages_per_sec") and long.get("pages_per_sec") is not None:
+            if long["pages_per_sec"] < short["pages_per_sec"] * (1 - threshold):
+                problems.append(
+                    f"{long_name}: pages/s {long['pages_per_sec']} com {long['pages']} páginas "
+                    f"vs {short['pages_per_sec']} com {short['pages']} ({short_name})"
+                )
+        if short.get("peak_rss_mb") and long.get("peak_rss_mb") is not None:
+            if long["peak_rss_mb"] > short["peak_rss_mb"] * (1 + threshold):
+                problems.append(
+                    f"{long_name}: pico de RSS {long['peak_rss_mb']} MB com {long['pages']} páginas "
+                    f"vs {short['peak_rss_mb']} MB com {short['pages']} ({short_name})"
+                )
+    return problems
+
+
+def format_result(name: str, result: dict) -> str:
+    if "skipped" in result:
+        return f"{name:<30} saltado ({result['skipped']})"
+    line = (
+        f"{name:<30} {result['pages_per_sec']:>10} pág/s  {result['seconds']:>8} s  "
+        f"{result['peak_rss_mb']} MB"
+    )
+    if "accuracy" in result:
+        line += f"  acerto {result['accuracy']:.2%}"
+    if result.get("bytes_after") and result.get("bytes_before", 0) > result["bytes_after"]:
+        line += f"  saída {result['bytes_before'] / 1e6:.1f} -> {result['bytes_after'] / 1e6:.1f} MB"
+    if "ocr_seconds_per_page" in result:
+        line += f"  OCR {result['ocr_seconds_per_page']} s/pág"
+    return line
+
+
+def load_results(path: str) -> dict:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_results(path: str, results: dict) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=1)
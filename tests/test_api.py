@@ -0,0 +1,76 @@
+"""Upload pela API (/upload): passa pela fila de jobs e respeita o limite de tamanho."""
+import os
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import api
+from app.jobs import STATUS_QUEUED, load_job
+
+
+@pytest.fixture
+def client(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(api, "API_JOB_WORKERS", 0)  # os jobs ficam na fila
+    monkeypatch.setattr(api, "MAX_MB", 1)
+    # o lifespan chama configure_storage: vazios, a cache de OCR e as métricas ficam desligadas
+    monkeypatch.setenv("OCR_CACHE_DIR", "")
+    monkeypatch.setenv("METRICS_DIR", "")
+    with TestClient(api.app) as client:
+        yield client
+
+
+def _jobs(tmp_path) -> list:
+    return sorted(os.listdir(tmp_path / "outputs")) if (tmp_path / "outputs").is_dir() else []
+
+
+def test_upload_is_queued(client, tmp_path):
+    body = b"%PDF-1.4\n" + b"0" * 2000
+    r = client.post("/upload", files={"file": ("doc.pdf", body, "application/pdf")}, follow_redirects=False)
+    assert r.status_code == 303
+    jobid = r.headers["location"].rsplit("/", 1)[1]
+    assert load_job(jobid, "outputs")["status"] == STATUS_QUEUED
+    assert os.listdir(tmp_path / "uploads" / ".queue") != []
+    with open(tmp_path / "uploads" / jobid / "input.pdf", "rb") as f:
+        assert f.read() == body
+
+
+def test_upload_too_large(client, tmp_path):
+    body = b"%PDF-1.4\n" + b"0" * (1024 * 1024)
+    r = client.post("/upload", files={"file": ("doc.pdf", body, "application/pdf")}, follow_redirects=False)
+    assert r.status_code == 413
+    assert _jobs(tmp_path) == []
+
+
+def test_upload_rejects_non_pdf(client, tmp_path):
+    r = client.post("/upload", files={"file": ("doc.txt", b"texto", "text/plain")}, follow_redirects=False)
+    assert r.status_code == 400
+    assert _jobs(tmp_path) == []
+
+
+@pytest.fixture
+def stored_file(client, tmp_path):
+    jobid = str(uuid.uuid4())
+    os.makedirs(tmp_path / "outputs" / jobid)
+    with open(tmp_path / "outputs" / jobid / "a.pdf", "wb") as f:
+        f.write(b"0123456789")
+    return f"/download/{jobid}/a.pdf"
+
+
+@pytest.mark.parametrize("header, status, body", [
+    ("bytes=2-4", 206, b"234"),
+    ("bytes=-3", 206, b"789"),
+    ("bytes=0-1,5-6", 200, b"0123456789"),  # vários intervalos: ignorado
+    ("items=0-1", 200, b"0123456789"),
+    ("bytes=20-", 416, b""),
+])
+def test_download_range(client, stored_file, header, status, body):
+    r = client.get(stored_file, headers={"Range": header})
+    assert r.status_code == status
+    assert r.content == body
+
+
+def test_number_search_limit_is_bounded(client):
+    assert client.get("/api/numbers", params={"q": "1", "limit": -1}).status_code == 422
+    assert client.get("/api/numbers", params={"q": "1", "limit": 5000}).status_code == 422
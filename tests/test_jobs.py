@@ -0,0 +1,95 @@
+"""Fila de jobs: devolução à fila de jobs interrompidos e supervisão dos workers."""
+import os
+import signal
+import time
+
+import pytest
+
+from app import jobs
+from app.checkpoint import Journal
+from app.process_pdf import PAGE_JOURNAL_NAME
+
+
+def _claimed_job(uploads: str, outputs: str) -> str:
+    jobid, _input_path = jobs.create_job(uploads_root=uploads, outputs_root=outputs)
+    jobs.enqueue_job(jobid, uploads)
+    assert jobs.claim_next_job(uploads) == jobid
+    return jobid
+
+
+def _age_markers(uploads: str, seconds: float) -> None:
+    running_dir = os.path.join(uploads, ".running")
+    for marker in os.listdir(running_dir):
+        old = time.time() - seconds
+        os.utime(os.path.join(running_dir, marker), (old, old))
+
+
+def test_requeue_skips_job_being_claimed(tmp_path):
+    uploads, outputs = str(tmp_path / "uploads"), str(tmp_path / "outputs")
+    jobid = _claimed_job(uploads, outputs)
+    assert jobs.requeue_stale_jobs(uploads, outputs) == []
+    _age_markers(uploads, 2 * jobs._CLAIM_GRACE)  # o worker morreu antes de o marcar como "running"
+    assert jobs.requeue_stale_jobs(uploads, outputs) == [jobid]
+
+
+def test_requeue_gives_up_after_max_requeues(tmp_path, monkeypatch):
+    monkeypatch.setattr(jobs, "JOB_MAX_REQUEUES", 2)
+    uploads, outputs = str(tmp_path / "uploads"), str(tmp_path / "outputs")
+    jobid = _claimed_job(uploads, outputs)
+    for _ in range(2):
+        jobs._update_job(jobid, outputs, status=jobs.STATUS_RUNNING, worker_pid=None)  # worker morto
+        assert jobs.requeue_stale_jobs(uploads, outputs) == [jobid]
+        assert jobs.claim_next_job(uploads) == jobid
+    jobs._update_job(jobid, outputs, status=jobs.STATUS_RUNNING, worker_pid=None)
+    assert jobs.requeue_stale_jobs(uploads, outputs) == []
+    assert jobs.load_job(jobid, outputs)["status"] == jobs.STATUS_FAILED
+    assert os.listdir(os.path.join(uploads, ".running")) == []
+
+
+def test_supervisor_replaces_dead_worker(tmp_path, monkeypatch):
+    monkeypatch.setattr(jobs, "SUPERVISE_INTERVAL", 0.1)
+    stops: list = []
+    monkeypatch.setattr(jobs.atexit, "register", stops.append)  # recebe stop_event.set
+    workers = jobs.start_workers(1, str(tmp_path / "uploads"), str(tmp_path / "outputs"))
+    try:
+        dead = workers[0]
+        os.kill(dead.pid, signal.SIGKILL)
+        deadline = time.monotonic() + 30
+        while workers[0] is dead and time.monotonic() < deadline:
+            time.sleep(0.1)
+        assert workers[0] is not dead and workers[0].is_alive()
+    finally:
+        stops[0]()  # pára o supervisor e os workers
+        for worker in list(workers):
+            worker.join()
+
+
+def test_committed_files_reads_the_journal(tmp_path):
+    uploads, outputs = str(tmp_path / "uploads"), str(tmp_path / "outputs")
+    jobid = _claimed_job(uploads, outputs)
+    out_dir = os.path.join(outputs, jobid)
+    journal = Journal(os.path.join(out_dir, PAGE_JOURNAL_NAME), {"input": "x"})
+    journal.start()
+    with journal:
+        for page, name in ((1, "0001"), (2, "0002")):
+            with open(os.path.join(out_dir, f"{name}.pdf"), "wb") as f:
+                f.write(b"%PDF")
+            journal.append({"type": "page", "stats": {"page": page}})
+            journal.append({"type": "file", "name": name, "file": f"{name}.pdf", "size": 4, "pages": [page, page]})
+    os.remove(os.path.join(out_dir, "0002.pdf"))  # apagado entretanto (ex.: retoma com outras opções)
+    assert jobs.committed_files(jobid, outputs) == [{"name": "0001", "file": "0001.pdf", "size": 4, "pages": [1, 1]}]
+
+
+def test_interrupted_job_goes_back_to_the_queue(tmp_path, monkeypatch):
+    uploads, outputs = str(tmp_path / "uploads"), str(tmp_path / "outputs")
+    jobid = _claimed_job(uploads, outputs)
+
+    def interrupted(*args, **kwargs):
+        raise KeyboardInterrupt
+        yield
+
+    monkeypatch.setattr(jobs, "process_pdf_iter", interrupted)
+    with pytest.raises(KeyboardInterrupt):
+        jobs.run_job(jobid, uploads, outputs)
+    assert jobs.load_job(jobid, outputs)["status"] == jobs.STATUS_QUEUED
+    assert jobs.claim_next_job(uploads) == jobid
@@ -0,0 +1,39 @@
+import json
+import os
+import socket
+import subprocess
+import sys
+
+from app import metrics
+
+
+def _dead_pid() -> int:
+    child = subprocess.Popen([sys.executable, "-c", "pass"])
+    child.wait()
+    return child.pid
+
+
+def _snapshot(metrics_dir: str, name: str, pid: int, pages: int) -> None:
+    with open(os.path.join(metrics_dir, name), "w", encoding="utf-8") as f:
+        json.dump({"counters": {"pages": pages}, "host": socket.gethostname(), "pid": pid}, f)
+
+
+def test_finished_snapshots_roll_into_cumulative(tmp_path, monkeypatch):
+    monkeypatch.setattr(metrics, "REGISTRY", metrics.Metrics())
+    metrics_dir = str(tmp_path)
+    pid = _dead_pid()
+    # o mesmo pid reutilizado por dois processos: ficheiros diferentes
+    _snapshot(metrics_dir, f"{socket.gethostname()}-{pid}-a.json", pid, 3)
+    _snapshot(metrics_dir, f"{socket.gethostname()}-{pid}-b.json", pid, 4)
+    _snapshot(metrics_dir, "outra-maquina-1-c.json", 1, 5)
+    _snapshot(metrics_dir, f"{socket.gethostname()}-{os.getppid()}-d.json", os.getppid(), 6)  # processo vivo
+
+    assert metrics.collect(metrics_dir).counters["pages"] == 18
+    assert sorted(os.listdir(metrics_dir)) == sorted([
+        metrics.CUMULATIVE_NAME, "outra-maquina-1-c.json", f"{socket.gethostname()}-{os.getppid()}-d.json"
+    ])
+    assert metrics.collect(metrics_dir).counters["pages"] == 18
+
+    metrics.REGISTRY.inc("pages", 2)
+    metrics.publish(metrics_dir)
+    assert metrics.collect(metrics_dir).counters["pages"] == 20
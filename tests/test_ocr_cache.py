@@ -0,0 +1,46 @@
+from pypdf import PdfWriter
+from pypdf.generic import DecodedStreamObject, DictionaryObject, NameObject
+
+from app.ocr_cache import OcrCache, page_fingerprint
+
+
+def _page(writer: PdfWriter, font_program: bytes):
+    """Página com o mesmo texto e uma fonte TrueType embutida com font_program."""
+    font_file = DecodedStreamObject()
+    font_file.set_data(font_program)
+    descriptor = DictionaryObject({
+        NameObject("/Type"): NameObject("/FontDescriptor"),
+        NameObject("/FontName"): NameObject("/ABCDEF+Subset"),
+        NameObject("/FontFile2"): writer._add_object(font_file),
+    })
+    font = DictionaryObject({
+        NameObject("/Type"): NameObject("/Font"),
+        NameObject("/Subtype"): NameObject("/TrueType"),
+        NameObject("/BaseFont"): NameObject("/ABCDEF+Subset"),
+        NameObject("/FontDescriptor"): writer._add_object(descriptor),
+    })
+    page = writer.add_blank_page(595, 842)
+    contents = DecodedStreamObject()
+    contents.set_data(b"BT /F1 11 Tf 50 790 Td <0102> Tj ET")
+    page[NameObject("/Contents")] = writer._add_object(contents)
+    page[NameObject("/Resources")] = DictionaryObject({
+        NameObject("/Font"): DictionaryObject({NameObject("/F1"): writer._add_object(font)}),
+    })
+    return page
+
+
+def test_fingerprint_covers_fonts():
+    writer = PdfWriter()
+    a = _page(writer, b"glyphs A")
+    a_copy = _page(writer, b"glyphs A")  # objetos diferentes, conteúdo igual
+    b = _page(writer, b"glyphs B")
+    assert page_fingerprint(a) == page_fingerprint(a_copy)
+    assert page_fingerprint(a) != page_fingerprint(b)
+
+
+def test_put_overwrite_counts_bytes_once(tmp_path):
+    cache = OcrCache(str(tmp_path))
+    cache.put("ab" * 32, "texto")
+    cache.put("ab" * 32, "texto maior")
+    assert cache.stats()["bytes"] == len("texto maior")
+    assert OcrCache(str(tmp_path)).stats()["bytes"] == len("texto maior")
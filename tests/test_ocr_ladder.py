@@ -0,0 +1,58 @@
+"""Escada de OCR (process_pdf.ocr_with_ladder) com o poppler e o Tesseract substituídos por stubs."""
+import pytest
+from PIL import Image
+
+from app import process_pdf as pp
+
+CNJ = "0000100-43.2023.8.26.0100"
+
+
+@pytest.fixture
+def ocr_answers(monkeypatch):
+    """Lista com o texto do "OCR" de cada nível, por ordem; recebe as chamadas feitas."""
+    answers: list = []
+    calls: list = []
+
+    def image_to_string(image, lang=None):
+        calls.append(image.size)
+        return answers[len(calls) - 1]
+
+    monkeypatch.setattr(pp, "convert_from_path", lambda *a, **k: [Image.new("L", (100, 100), 255)])
+    monkeypatch.setattr(pp.pytesseract, "image_to_string", image_to_string)
+    monkeypatch.setattr(pp, "OCR_PREPROCESS", False)
+    return answers, calls
+
+
+def test_stops_on_confident_number(ocr_answers):
+    answers, calls = ocr_answers
+    answers[:] = [f"Processo n. {CNJ}", "", ""]
+    assert pp.ocr_with_ladder("x.pdf", 0) == (answers[0], 1)
+    assert len(calls) == 1
+
+
+def test_loose_match_does_not_stop_the_ladder(ocr_answers):
+    # uma data no cabeçalho é um nº "amplo" (0.3): sobe até encontrar o CNJ
+    answers, calls = ocr_answers
+    answers[:] = ["Lisboa, 12/03/2023", "Lisboa, 12/03/2023", f"Lisboa, 12/03/2023\nProcesso n. {CNJ}"]
+    assert pp.ocr_with_ladder("x.pdf", 0) == (answers[2], 3)
+    assert len(calls) == 3
+
+
+def test_keeps_best_match_across_levels(ocr_answers):
+    answers, _calls = ocr_answers
+    answers[:] = ["12/03/2023", "Processo 123456", "sem numero"]
+    assert pp.ocr_with_ladder("x.pdf", 0) == (answers[1], 2)
+
+
+def test_no_number_returns_last_level(ocr_answers):
+    answers, _calls = ocr_answers
+    answers[:] = ["", "termo", "termo de juntada"]
+    assert pp.ocr_with_ladder("x.pdf", 0) == (answers[2], 0)
+
+
+def test_invalid_cnj_escalates_to_next_level(ocr_answers):
+    # dígitos verificadores errados (erro de OCR): o nº é rejeitado e o nível seguinte corre
+    answers, calls = ocr_answers
+    answers[:] = ["Processo n. 0000100-44.2023.8.26.0100", f"Processo n. {CNJ}", ""]
+    assert pp.ocr_with_ladder("x.pdf", 0) == (answers[1], 2)
+    assert len(calls) == 2
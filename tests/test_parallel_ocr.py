@@ -0,0 +1,113 @@
+"""
+O OCR num pool de processos (ocr_workers > 1) dá exatamente os mesmos PDFs
+que o OCR em série. O poppler e o Tesseract são substituídos por stubs: cada
+página "rasterizada" leva o seu índice na largura da imagem e o "OCR" devolve
+um texto que depende dele (com tempos diferentes, para os resultados do pool
+chegarem fora de ordem).
+"""
+import os
+import time
+
+import pytest
+from PIL import Image
+from pypdf import PdfWriter
+from pypdf.generic import DecodedStreamObject, NameObject
+
+from app import metrics, ocr_cache
+from app import process_pdf as pp
+from app.ocr_cache import OcrCache
+
+PAGES = 40
+# largura da imagem da página i: _WIDTH0 + i
+_WIDTH0 = 10
+
+
+def _cnj(seq: int) -> str:
+    """Nº CNJ com dígitos verificadores válidos."""
+    n = f"{seq:07d}"
+    dd = 98 - int(n + "2023" + "8" + "26" + "0100" + "00") % 97
+    return f"{n}-{dd:02d}.2023.8.26.0100"
+
+
+def _make_pdf(path: str) -> None:
+    """Páginas sem camada de texto, cada uma com um desenho diferente (chaves de cache distintas)."""
+    writer = PdfWriter()
+    for i in range(PAGES):
+        page = writer.add_blank_page(595, 842)
+        contents = DecodedStreamObject()
+        contents.set_data(f"q 0 0 {i + 1} 1 re f Q".encode())
+        page[NameObject("/Contents")] = writer._add_object(contents)
+    with open(path, "wb") as f:
+        writer.write(f)
+
+
+def fake_convert_from_path(pdf_path, dpi=200, first_page=1, last_page=1, output_folder=None,
+                           paths_only=False, **kwargs):
+    images = [Image.new("L", (_WIDTH0 + n - 1, 20), 255) for n in range(first_page, last_page + 1)]
+    if not paths_only:
+        return images
+    paths = []
+    for n, image in zip(range(first_page, last_page + 1), images):
+        path = os.path.join(output_folder, f"stub-{n:04d}.png")
+        image.save(path)
+        paths.append(path)
+    return paths
+
+
+def fake_image_to_string(image, lang=None):
+    i = image.width - _WIDTH0
+    time.sleep(0.002 * (i % 5))
+    if i % 7 == 3:
+        return "Termo de juntada"  # sem nº
+    # blocos de 3 páginas com o mesmo nº (agrupamento/herança)
+    return f"Processo n. {_cnj(100 + i // 3)}"
+
+
+@pytest.fixture
+def stub_ocr(monkeypatch, tmp_path):
+    # os workers do pool são criados por fork e herdam os stubs
+    monkeypatch.setattr(pp, "convert_from_path", fake_convert_from_path)
+    monkeypatch.setattr(pp.pytesseract, "image_to_string", fake_image_to_string)
+    monkeypatch.chdir(tmp_path)
+    pdf_path = str(tmp_path / "in.pdf")
+    _make_pdf(pdf_path)
+    return pdf_path
+
+
+def _run(pdf_path: str, out_dir: str, workers: int, **options):
+    os.makedirs(out_dir)
+    files = pp.process_pdf(pdf_path, out_dir, ocr_workers=workers, ocr_cache=OcrCache(f"{out_dir}_cache"), **options)
+    return [(name, os.path.relpath(path, out_dir), size) for name, path, size in files]
+
+
+@pytest.mark.parametrize("options", [{}, {"group_pages": True}, {"inherit_number": True}])
+def test_parallel_matches_serial(stub_ocr, tmp_path, options):
+    serial = _run(stub_ocr, str(tmp_path / "serial"), 1, **options)
+    parallel = _run(stub_ocr, str(tmp_path / "parallel"), 3, **options)
+    assert serial == parallel
+    assert any(name.startswith("SEM_PROCESSO") for name, _, _ in serial) != options.get("inherit_number", False)
+    assert len({name for name, _, _ in serial}) > 1
+
+
+@pytest.fixture
+def no_storage_env(monkeypatch):
+    """Sem OCR_CACHE_DIR/METRICS_DIR no ambiente nem nos módulos (tudo reposto no fim)."""
+    monkeypatch.setattr(os, "environ", {k: v for k, v in os.environ.items() if k not in ("OCR_CACHE_DIR", "METRICS_DIR")})
+    monkeypatch.setattr(ocr_cache, "OCR_CACHE_DIR", "")
+    monkeypatch.setattr(ocr_cache, "_default_cache", None)
+    monkeypatch.setattr(metrics, "METRICS_DIR", "")
+
+
+def test_library_use_creates_no_folders(stub_ocr, tmp_path, no_storage_env):
+    os.makedirs("out")
+    pp.process_pdf(stub_ocr, "out")
+    assert sorted(os.listdir(tmp_path)) == ["in.pdf", "out"]
+
+
+def test_configure_storage_keeps_cache_and_metrics_under_root(stub_ocr, tmp_path, no_storage_env):
+    pp.configure_storage("outputs")
+    os.makedirs("out")
+    pp.process_pdf(stub_ocr, "out")
+    assert sorted(os.listdir(tmp_path)) == ["in.pdf", "out", "outputs"]
+    assert sorted(os.listdir(tmp_path / "outputs")) == [".metrics", ".ocr_cache"]
+    assert os.environ["OCR_CACHE_DIR"] == os.path.join("outputs", ".ocr_cache")  # herdado pelos workers
@@ -0,0 +1,60 @@
+import random
+
+from pypdf import PdfReader, PdfWriter
+from pypdf.generic import DecodedStreamObject, DictionaryObject, NameObject
+
+from app.pdf_output import ResourceDeduper, _CountingStream, write_pages
+
+PAGES = 6
+FONTS = 4
+
+
+def _make_pdf(path: str) -> None:
+    """Páginas com um /Resources partilhado: FONTS fontes com cópias idênticas do mesmo programa embutido."""
+    writer = PdfWriter()
+    program = random.Random(1).randbytes(30_000)
+    fonts = DictionaryObject()
+    for k in range(FONTS):
+        font_file = DecodedStreamObject()
+        font_file.set_data(program)
+        descriptor = DictionaryObject({
+            NameObject("/Type"): NameObject("/FontDescriptor"),
+            NameObject("/FontFile2"): writer._add_object(font_file),
+        })
+        fonts[NameObject(f"/F{k}")] = writer._add_object(DictionaryObject({
+            NameObject("/Type"): NameObject("/Font"),
+            NameObject("/Subtype"): NameObject("/TrueType"),
+            NameObject("/BaseFont"): NameObject("/Embedded"),
+            NameObject("/FontDescriptor"): writer._add_object(descriptor),
+        }))
+    resources = writer._add_object(DictionaryObject({NameObject("/Font"): fonts}))
+    for i in range(PAGES):
+        page = writer.add_blank_page(595, 842)
+        contents = DecodedStreamObject()
+        contents.set_data(f"BT /F{i % FONTS} 11 Tf 50 790 Td (pagina {i}) Tj ET\n".encode() * 30)
+        page[NameObject("/Contents")] = writer._add_object(contents)
+        page[NameObject("/Resources")] = resources
+    with open(path, "wb") as f:
+        writer.write(f)
+
+
+def _serialized_size(pages) -> int:
+    writer = PdfWriter()
+    for page in pages:
+        writer.add_page(page)
+    stream = _CountingStream()
+    writer.write(stream)
+    return stream.size
+
+
+def test_optimized_bytes_before_matches_original_size(tmp_path):
+    source = str(tmp_path / "in.pdf")
+    _make_pdf(source)
+    deduper = ResourceDeduper()
+    for first, last in ((0, 1), (1, 3), (3, PAGES)):
+        expected = _serialized_size(PdfReader(source).pages[first:last])
+        before, after = write_pages(
+            PdfReader(source).pages[first:last], str(tmp_path / f"out_{first}.pdf"), optimize=True, deduper=deduper
+        )
+        assert abs(before - expected) <= 0.02 * expected
+        assert after < before / 2
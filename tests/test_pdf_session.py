@@ -0,0 +1,47 @@
+from pypdf import PdfReader, PdfWriter
+from pypdf.generic import ArrayObject, DictionaryObject, NameObject, NumberObject, RectangleObject
+
+from app.process_pdf import PdfSession
+
+
+def _make_pdf(path: str) -> None:
+    """Árvore /Pages com dois níveis; a /MediaBox e a /Rotate do nó intermédio são herdadas."""
+    writer = PdfWriter()
+    for i in range(5):
+        writer.add_blank_page(100 + i, 200)
+    root = writer._root_object["/Pages"].get_object()
+    kids = list(root["/Kids"])
+    middle = DictionaryObject({
+        NameObject("/Type"): NameObject("/Pages"),
+        NameObject("/Kids"): ArrayObject(kids[1:4]),
+        NameObject("/Count"): NumberObject(3),
+        NameObject("/Parent"): root.indirect_reference,
+        NameObject("/MediaBox"): RectangleObject([0, 0, 300, 400]),
+        NameObject("/Rotate"): NumberObject(90),
+    })
+    middle_ref = writer._add_object(middle)
+    for kid in kids[1:4]:
+        page = kid.get_object()
+        page[NameObject("/Parent")] = middle_ref
+        if kid is kids[2]:
+            continue  # mantém a sua /MediaBox
+        del page["/MediaBox"]
+    root[NameObject("/Kids")] = ArrayObject([kids[0], middle_ref, kids[4]])
+    with open(path, "wb") as f:
+        writer.write(f)
+
+
+def test_pages_match_pypdf_without_flattening(tmp_path):
+    path = str(tmp_path / "tree.pdf")
+    _make_pdf(path)
+    expected = PdfReader(path).pages
+    with PdfSession(path) as session:
+        assert len(session) == len(expected) == 5
+        for i, page in session.iter_pages():
+            assert page.indirect_reference.idnum == expected[i].indirect_reference.idnum
+            assert list(page.mediabox) == list(expected[i].mediabox)
+        # só as páginas do nó intermédio herdam a /Rotate (o reader.pages do
+        # pypdf 3.x passa-a também às páginas seguintes fora desse nó)
+        assert [session.page(i).get("/Rotate", 0) for i in range(5)] == [0, 90, 90, 90, 0]
+        assert session.reader.flattened_pages is None
+    assert [list(p.mediabox)[2] for p in expected] == [100, 300, 102, 300, 104]
@@ -0,0 +1,26 @@
+import os
+import time
+import uuid
+
+from app.retention import sweep
+
+
+def _folder(path, age: float) -> None:
+    os.makedirs(path)
+    with open(os.path.join(path, "doc.pdf"), "wb") as f:
+        f.write(b"0" * 1000)
+    old = time.time() - age
+    os.utime(path, (old, old))
+
+
+def test_sweep_skips_non_job_folders(tmp_path):
+    uploads, outputs = str(tmp_path / "uploads"), str(tmp_path / "outputs")
+    legacy = str(uuid.uuid4())  # job anterior à fila, sem job.json
+    _folder(os.path.join(outputs, legacy), 10 * 86400)
+    _folder(os.path.join(outputs, "meu_caderno"), 10 * 86400)  # resultados do python -m app
+    _folder(os.path.join(uploads, "outra_pasta"), 10 * 86400)
+    result = sweep(uploads, outputs, max_age_days=1)
+    assert result["evicted"] == [legacy]
+    assert result["orphans"] == 0
+    assert sorted(os.listdir(outputs)) == ["meu_caderno"]
+    assert os.listdir(uploads) == ["outra_pasta"]
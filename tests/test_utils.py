@@ -0,0 +1,65 @@
+import pytest
+
+from app.utils import cnj_check_digits_valid, find_process_number, human_size
+
+CNJ = "0000100-43.2023.8.26.0100"
+CNJ_BAD_DIGITS = "0000100-44.2023.8.26.0100"
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("Processo nº 1234/22.0T8LSB", "1234/22.0T8LSB"),
+    ("Processo nº 1234/22.0T8LSBfoo", "1234/22.0T8LSB"),
+    ("proc. 1234/22.0T8LSB-A.L1.", "1234/22.0T8LSB-A.L1"),
+    ("1234/22.0t8lsbfoo", "1234/22.0"),
+])
+def test_slash_suffix_is_uppercase_only(text, expected):
+    assert find_process_number(text).value == expected
+
+
+@pytest.mark.parametrize("n, expected", [
+    (0, "0 B"),
+    (1023, "1023 B"),
+    (2817, "2.75 KB"),
+    (147 * 1024, "147.00 KB"),
+    (int(1.5 * 1024 ** 2), "1.50 MB"),
+    (3 * 1024 ** 3, "3.00 GB"),
+    (2048 * 1024 ** 3, "2048.00 GB"),
+])
+def test_human_size(n, expected):
+    assert human_size(n) == expected
+
+
+def test_cnj_check_digits():
+    assert cnj_check_digits_valid(CNJ)
+    assert not cnj_check_digits_valid(CNJ_BAD_DIGITS)
+    assert not cnj_check_digits_valid("0000100-43.2023.8.26")  # dígitos a menos
+
+
+def test_valid_cnj_is_accepted():
+    rejected: list = []
+    match = find_process_number(f"Processo nº {CNJ}", rejected)
+    assert (match.value, match.kind, match.valid) == (CNJ, "cnj", True)
+    assert rejected == []
+
+
+def test_invalid_cnj_is_rejected_for_the_next_candidate():
+    rejected: list = []
+    match = find_process_number(f"Processo nº {CNJ_BAD_DIGITS}, apenso 1234/22.0T8LSB", rejected)
+    assert (match.value, match.kind) == ("1234/22.0T8LSB", "slash")
+    assert [(r.value, r.valid) for r in rejected] == [(CNJ_BAD_DIGITS, False)]
+
+
+@pytest.mark.parametrize("text, kind, value", [
+    ("Proc. 1234/22.0T8LSB", "slash", "1234/22.0T8LSB"),
+    ("Processo 123456", "loose", "123456"),
+    ("autos 2023.001234", "loose", "2023.001234"),
+])
+def test_formats_without_checksum(text, kind, value):
+    match = find_process_number(text)
+    assert (match.kind, match.value, match.valid) == (kind, value, True)
+
+
+def test_only_invalid_cnj_gives_no_number():
+    rejected: list = []
+    assert find_process_number(f"Processo nº {CNJ_BAD_DIGITS}", rejected) is None
+    assert len(rejected) == 1